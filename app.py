@@ -1,54 +1,54 @@
 """
 app.py - FastAPI backend for Logistics RAG system
 Run: uvicorn app:app --reload
+
+A thin HTTP frontend over the logistics_rag package, which holds the
+ingestion pipeline, retrieval and answering shared with the CLI. This module
+adds what only the API needs: tenant resolution from headers, admission
+control, request coalescing, conversation sessions and the directory watcher.
 """
-import os
 import sys
-import shutil
+import hmac
 import json
-import re
+import threading
+import weakref
+from dataclasses import asdict
 from pathlib import Path
-from typing import List
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Query, Response, Header, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from dotenv import load_dotenv
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
 PROJECT_ROOT = Path(__file__).parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
+from logistics_rag.admission import AdmissionController, Overloaded, QuotaExhausted
+from logistics_rag.answering import answer_planned, condense_question, get_answer, summarize_session
+from logistics_rag.batch_qa import normalize_question, plan_batch, run_batch
+from logistics_rag.clients import get_llm, get_query_embeddings
+from logistics_rag import config
+from logistics_rag.config import (
+    ADMIN_TOKEN, CHAT_CONCURRENCY, CHAT_QUEUE, CLIENT_CONCURRENCY, MAX_SESSIONS, QUEUE_TIMEOUT, SESSION_ID_RE,
+    SESSION_TTL, SYNC_DEBOUNCE, SYNC_WATCH_INTERVAL,
+)
+from logistics_rag.dir_sync import DirectoryWatcher
+from logistics_rag.ingest import ingest_upload, prepare_tenant, rebuild_vectorstore, remove_document, sync_tenant
+from logistics_rag.retrieval import NoDocuments, require_vectorstore, retrieval_params
+from logistics_rag.sessions import SessionStore
+from logistics_rag.single_flight import SingleFlight
+from logistics_rag.store import IndexBusy, current_vectorstore, index_writer, tenants
+from logistics_rag.tenants import DEFAULT_TENANT, TENANT_HEADER, TENANT_ID_RE, Tenant
 
-# ─────────────────────────────────────────────
-# CONFIG
-# ─────────────────────────────────────────────
-load_dotenv()
-
-RAW_DATA_DIR  = PROJECT_ROOT / "data" / "raw"
-CHROMA_DB_DIR = PROJECT_ROOT / "chroma_db"
-STATIC_DIR    = PROJECT_ROOT / "static"
-COLLECTION    = "logistics_docs"
-CHUNK_SIZE    = 1000
-CHUNK_OVERLAP = 200
-TOP_K         = 5
-GEMINI_MODEL  = "models/gemini-2.5-flash"
-
-RAW_DATA_DIR.mkdir(parents=True, exist_ok=True)
-STATIC_DIR.mkdir(exist_ok=True)
+ADMIN_HEADER = "X-Admin-Token"
+
+# langchain, Chroma and the Google GenAI SDK are imported inside the helpers
+# that use them: importing them here costs seconds of cold start per worker.
 
-LOGISTICS_KEYWORDS = [
-    "shipment", "freight", "cargo", "transport", "delivery", "logistics",
-    "warehouse", "inventory", "supply chain", "shipping", "dispatch",
-    "consignment", "bill of lading", "customs", "import", "export",
-    "carrier", "route", "fleet", "tracking", "order fulfillment",
-    "distribution", "container", "pallets", "last mile", "3pl", "forwarder"
-]
+STATIC_DIR = PROJECT_ROOT / "static"
+STATIC_DIR.mkdir(exist_ok=True)
 
 # ─────────────────────────────────────────────
 # FASTAPI APP
@@ -65,215 +65,79 @@ app.add_middleware(
 
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
+
+@app.exception_handler(IndexBusy)
+async def index_busy(request: Request, e: IndexBusy):
+    return JSONResponse({"detail": str(e)}, status_code=503, headers={"Retry-After": "5"})
+
+
+@app.exception_handler(NoDocuments)
+async def no_documents(request: Request, e: NoDocuments):
+    return JSONResponse({"detail": str(e)}, status_code=400)
+
+
 # ─────────────────────────────────────────────
 # GLOBAL STATE
 # ─────────────────────────────────────────────
-vectorstore = None
-embeddings  = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+ready        = threading.Event()   # set once the default tenant's vector store is warm
+admission    = AdmissionController(CHAT_CONCURRENCY, CHAT_QUEUE, CLIENT_CONCURRENCY, QUEUE_TIMEOUT)
+chat_flights = SingleFlight()      # identical concurrent /chat questions share one answer
+sessions     = SessionStore(SESSION_TTL, MAX_SESSIONS)
 
 
 # ─────────────────────────────────────────────
-# HELPERS
+# WARM-UP
 # ─────────────────────────────────────────────
-def safe_delete_chromadb(path: Path):
-    if path.exists():
-        try:
-            shutil.rmtree(path)
-        except Exception as e:
-            print(f"Warning: Could not delete {path}: {e}")
-
-
-def is_logistics_document(pdf_path: Path):
-    """
-    Classify whether a PDF is logistics/transport related.
-    Returns (is_logistics: bool, reason: str).
-    """
+def warm_up():
+    """Open the default tenant's persisted store and touch it once, then flip readiness."""
+    tenant = tenants.get(DEFAULT_TENANT)
     try:
-        loader = PyPDFLoader(str(pdf_path))
-        pages  = loader.load()
-
-        sample_text = "\n\n".join(
-            p.page_content for p in pages[:3] if p.page_content.strip()
-        )[:3000]
-
-        if not sample_text.strip():
-            return False, "The PDF appears to be empty or unreadable."
-
-        lowered = sample_text.lower()
-        keyword_hits = [kw for kw in LOGISTICS_KEYWORDS if kw in lowered]
-
-        llm = ChatGoogleGenerativeAI(
-            model=GEMINI_MODEL,
-            temperature=0,
-            convert_system_message_to_human=True
-        )
-
-        classification_prompt = f"""You are a document classifier. Analyze the following text from a PDF and determine if it is related to logistics, transportation, supply chain, shipping, freight, or related domains.
-
-Text sample:
-\"\"\"
-{sample_text}
-\"\"\"
-
-Keyword hints found: {keyword_hits if keyword_hits else 'none'}
-
-Respond with ONLY a JSON object in this exact format (no markdown, no explanation):
-{{"is_logistics": true, "confidence": "high", "reason": "one sentence explanation"}}
-
-Be strict: only return true if the document is genuinely about logistics/transport/supply chain operations."""
-
-        response = llm.invoke([("human", classification_prompt)])
-        content  = response.content.strip()
-
-        json_match = re.search(r'\{.*\}', content, re.DOTALL)
-        if json_match:
-            result = json.loads(json_match.group())
-            return result.get("is_logistics", False), result.get("reason", "Classification complete.")
-
-        return len(keyword_hits) >= 2, f"Keyword-based detection: {keyword_hits}"
-
+        prepare_tenant(tenant)
     except Exception as e:
-        print(f"Classification error: {e}")
-        return True, "Classification service unavailable, document accepted."
-
-
-def load_pdf_chunks(pdf_path: Path):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        separators=["\n\n", "\n", ".", " ", ""]
-    )
-    loader = PyPDFLoader(str(pdf_path))
-    pages  = loader.load()
-    chunks = splitter.split_documents(pages)
-    for chunk in chunks:
-        chunk.metadata["source"] = pdf_path.name
-    print(f"  ✓ {pdf_path.name}: {len(pages)} pages -> {len(chunks)} chunks")
-    return chunks
-
-
-def rebuild_vectorstore():
-    global vectorstore
-    pdf_files = list(RAW_DATA_DIR.glob("*.pdf"))
-    if not pdf_files:
-        raise ValueError("No PDFs found in data/raw")
-
-    print("\nRebuilding vector store from all PDFs...")
-    safe_delete_chromadb(CHROMA_DB_DIR)
-
-    all_chunks = []
-    for pdf_path in pdf_files:
-        all_chunks.extend(load_pdf_chunks(pdf_path))
-
-    vectorstore = Chroma.from_documents(
-        documents=all_chunks,
-        embedding=embeddings,
-        collection_name=COLLECTION,
-        persist_directory=str(CHROMA_DB_DIR)
-    )
-    print(f"Vector store built with {len(all_chunks)} chunks from {len(pdf_files)} file(s)")
-    return len(all_chunks)
-
-
-def add_pdf_to_vectorstore(pdf_path: Path):
-    global vectorstore
-    chunks = load_pdf_chunks(pdf_path)
-
-    if vectorstore is None:
-        vectorstore = Chroma.from_documents(
-            documents=chunks,
-            embedding=embeddings,
-            collection_name=COLLECTION,
-            persist_directory=str(CHROMA_DB_DIR)
-        )
-    else:
-        vectorstore.add_documents(chunks)
-
-    print(f"Added {len(chunks)} chunks from {pdf_path.name}")
-    return len(chunks)
-
-
-def get_answer(question: str, include_sources: bool = True):
-    global vectorstore
-
-    if vectorstore is None:
-        if CHROMA_DB_DIR.exists():
-            vectorstore = Chroma(
-                collection_name=COLLECTION,
-                embedding_function=embeddings,
-                persist_directory=str(CHROMA_DB_DIR)
-            )
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="No documents uploaded yet. Please upload a logistics PDF first."
-            )
-
-    docs = vectorstore.similarity_search(question, k=TOP_K)
-
-    if not docs:
-        return {
-            "answer": "I couldn't find any relevant information in the uploaded documents.",
-            "sources": []
-        }
-
-    context_parts = []
-    sources = []
-    for i, doc in enumerate(docs, 1):
-        src  = doc.metadata.get("source", "unknown")
-        page = doc.metadata.get("page", "?")
-        context_parts.append(f"[Excerpt {i} | {src} | page {page}]\n{doc.page_content}")
-        if include_sources:
-            sources.append({
-                "filename": src,
-                "page": page,
-                "content": doc.page_content[:200] + "..."
-            })
-
-    context = "\n\n".join(context_parts)
-
-    llm = ChatGoogleGenerativeAI(
-        model=GEMINI_MODEL,
-        temperature=0,
-        convert_system_message_to_human=True
-    )
-
-    prompt_template = """You are a helpful logistics assistant. Use ONLY the document excerpts below to answer the question.
+        print(f"Warning: Could not prepare index: {e}")
+    try:
+        vs = current_vectorstore(tenant)
+        if vs is not None:
+            print(f"Loaded vector store with {tenant.stats.vector_count} vectors")
+    except Exception as e:
+        print(f"Warning: Could not load vector store: {e}")
+    try:
+        get_llm()
+    except Exception as e:
+        print(f"Warning: Could not create Gemini client: {e}")
+    ready.set()
 
-Rules:
-- Answer using ONLY the information in the excerpts.
-- Quote exact numbers, names, codes, and dates where possible.
-- If the excerpts do not contain the answer, say exactly: "I could not find that information in the provided documents."
-- Be concise and clear.
 
-Document excerpts:
-----------------
-{context}
-----------------
+# ─────────────────────────────────────────────
+# API MODELS
+# ─────────────────────────────────────────────
+class RetrievalOverrides(BaseModel):
+    # Per-request overrides of the top_k, candidates, context_tokens and compression settings
+    k: Optional[int] = Field(None, ge=1, le=50)
+    candidates: Optional[int] = Field(None, ge=1, le=500)
+    context_tokens: Optional[int] = Field(None, ge=0, le=200000)   # 0 = no budget
+    compression: Optional[float] = Field(None, gt=0, le=1)          # 1 = excerpts whole
 
-Question: {question}"""
+    def retrieval(self):
+        return retrieval_params(self.k, self.candidates, self.context_tokens, self.compression)
 
-    prompt   = ChatPromptTemplate.from_messages([("human", prompt_template)])
-    messages = prompt.format_messages(context=context, question=question)
-    response = llm.invoke(messages)
 
-    return {
-        "answer": response.content,
-        "sources": sources if include_sources else []
-    }
+class ChatRequest(RetrievalOverrides):
+    question: str
+    include_sources: bool = True
+    session_id: Optional[str] = None   # opt in to server-side history for follow-up questions
 
 
-# ─────────────────────────────────────────────
-# API MODELS
-# ─────────────────────────────────────────────
-class ChatRequest(BaseModel):
-    question: str
+class BatchChatRequest(RetrievalOverrides):
+    questions: List[str]
     include_sources: bool = True
 
 
 class ChatResponse(BaseModel):
     answer: str
     sources: list
+    session_id: Optional[str] = None
+    standalone_question: Optional[str] = None   # what was searched, when a follow-up was rewritten
 
 
 class UploadResponse(BaseModel):
@@ -286,13 +150,46 @@ class UploadResponse(BaseModel):
 # ─────────────────────────────────────────────
 # ENDPOINTS
 # ─────────────────────────────────────────────
+def resolve_tenant(tenant_id: Optional[str] = Header(None, alias=TENANT_HEADER)) -> Tenant:
+    """Dependency: the tenant named by the X-Tenant-ID header, after its rate limit."""
+    tenant_id = tenant_id or DEFAULT_TENANT
+    if not TENANT_ID_RE.match(tenant_id):
+        raise HTTPException(status_code=400, detail=f"Invalid {TENANT_HEADER} header.")
+    tenant = tenants.get(tenant_id)
+    wait = tenant.bucket.take()
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded for tenant {tenant_id}.",
+            headers={"Retry-After": str(max(1, round(wait)))}
+        )
+    return tenant
+
+
+def client_key(request: Request, tenant: Tenant) -> str:
+    client = request.headers.get("x-client-id") or (request.client.host if request.client else "unknown")
+    return f"{tenant.id}/{client}"
+
+
+def overloaded(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def over_quota() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="The language model is over quota. Please retry shortly.",
+        headers={"Retry-After": str(int(config.current().llm_backoff_cap))}
+    )
+
+
 @app.get("/")
 async def root():
     return FileResponse(STATIC_DIR / "index.html")
 
 
 @app.post("/upload", response_model=UploadResponse)
-async def upload_pdfs(files: List[UploadFile] = File(...)):
+async def upload_pdfs(files: List[UploadFile] = File(...), tenant: Tenant = Depends(resolve_tenant)):
     """Upload one or multiple PDFs. Each is validated as logistics content before ingestion."""
     if not files:
         raise HTTPException(status_code=400, detail="No files provided.")
@@ -306,31 +203,13 @@ async def upload_pdfs(files: List[UploadFile] = File(...)):
             rejected.append({"filename": file.filename, "reason": "Only PDF files are allowed."})
             continue
 
-        file_path = RAW_DATA_DIR / file.filename
-        content   = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
-
-        print(f"\nClassifying: {file.filename}")
-        is_logistics, reason = is_logistics_document(file_path)
-
-        if not is_logistics:
-            print(f"  Rejected: {reason}")
-            file_path.unlink(missing_ok=True)
-            rejected.append({
-                "filename": file.filename,
-                "reason": f"Not a logistics document: {reason}"
-            })
-            continue
-
-        print(f"  Accepted: {reason}")
-        try:
-            chunks = add_pdf_to_vectorstore(file_path)
-            total_chunks += chunks
-            accepted.append({"filename": file.filename, "chunks": chunks})
-        except Exception as e:
-            file_path.unlink(missing_ok=True)
-            rejected.append({"filename": file.filename, "reason": f"Processing error: {str(e)}"})
+        content = await file.read()
+        ok, failed = await run_in_threadpool(ingest_upload, tenant, file.filename, content)
+        if ok:
+            total_chunks += ok["chunks"]
+            accepted.append(ok)
+        else:
+            rejected.append(failed)
 
     if not accepted and rejected:
         raise HTTPException(
@@ -350,76 +229,241 @@ async def upload_pdfs(files: List[UploadFile] = File(...)):
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+def chat(request: ChatRequest, http_request: Request, tenant: Tenant = Depends(resolve_tenant)):
+    # Sync endpoint: waiting for a slot and the Gemini call run in the threadpool, not the event loop.
+    # Concurrent identical questions against the same index generation share one
+    # retrieval + Gemini call; only that leader takes an admission slot. A leader
+    # refused admission keeps its 429 to itself and a follower asks in its place.
+    if request.session_id is not None and not SESSION_ID_RE.match(request.session_id):
+        raise HTTPException(status_code=400, detail="Invalid session_id.")
+
+    params = request.retrieval()   # read once: a settings reload does not change this request
+    key = (
+        tenant.id, tenant.catalog.generation(), normalize_question(request.question), request.include_sources, params
+    )
+
+    def answer():
+        with admission.admit(client_key(http_request, tenant)):
+            return get_answer(tenant, request.question, request.include_sources, params)
+
+    def answer_in_session():
+        # Turns of one session are answered in order, each against the history before it.
+        session = sessions.get(tenant.id, request.session_id)
+        with session.lock, admission.admit(client_key(http_request, tenant)):
+            standalone = condense_question(session, request.question)
+            result = get_answer(tenant, standalone, request.include_sources, params)
+            session.add_turn(request.question, result["answer"])
+            summarize_session(session)
+        return {**result, "session_id": request.session_id, "standalone_question": standalone}
+
     try:
-        result = get_answer(request.question, request.include_sources)
-        return ChatResponse(**result)
-    except HTTPException:
+        if request.session_id:
+            return ChatResponse(**answer_in_session())
+        return ChatResponse(**chat_flights.do(key, answer, retry_on=(Overloaded,)))
+    except Overloaded as e:
+        raise overloaded(e)
+    except QuotaExhausted:
+        raise over_quota()
+    except (HTTPException, IndexBusy, NoDocuments):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
+@app.delete("/sessions/{session_id}")
+def delete_session(session_id: str, tenant: Tenant = Depends(resolve_tenant)):
+    """Forget a conversation; the next /chat with this session_id starts fresh."""
+    if not sessions.drop(tenant.id, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"message": "Session cleared."}
+
+
+@app.post("/chat/batch")
+def chat_batch(request: BatchChatRequest, http_request: Request, tenant: Tenant = Depends(resolve_tenant)):
+    """
+    Answer many questions in one call. Duplicates are answered once, questions
+    are embedded and searched in batches, and LLM calls run on a bounded pool.
+    Results stream back as NDJSON in completion order, keyed by input index.
+    The batch holds one admission slot until its stream ends.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="No questions provided.")
+    settings = config.current()
+    if len(request.questions) > settings.max_batch:
+        raise HTTPException(status_code=413, detail=f"At most {settings.max_batch} questions per batch.")
+    params = request.retrieval()
+
+    try:
+        ticket = admission.acquire(client_key(http_request, tenant))
+    except Overloaded as e:
+        raise overloaded(e)
+    try:
+        plan = plan_batch(request.questions, require_vectorstore(tenant), get_query_embeddings(), params.candidates)
+    except Exception as e:
+        admission.release(ticket)
+        if isinstance(e, (HTTPException, NoDocuments)):
+            raise
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+    def answer(question, docs):
+        return answer_planned(tenant, question, docs, request.include_sources, params)
+
+    def lines():
+        try:
+            for result in run_batch(plan, answer, settings.batch_workers):
+                yield json.dumps(result) + "\n"
+        finally:
+            admission.release(ticket)
+
+    stream = lines()
+    weakref.finalize(stream, admission.release, ticket)   # also if the stream is never started
+    return StreamingResponse(stream, media_type="application/x-ndjson")
+
+
 @app.get("/documents")
-async def list_documents():
-    pdf_files = list(RAW_DATA_DIR.glob("*.pdf"))
-    return {
-        "documents": [
-            {"filename": f.name, "size_kb": round(f.stat().st_size / 1024, 2)}
-            for f in pdf_files
-        ]
-    }
+async def list_documents(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    tenant: Tenant = Depends(resolve_tenant),
+):
+    """Paginated catalog listing. Clients send If-None-Match to get a cheap 304."""
+    etag = f'"{tenant.id}-{tenant.catalog.version()}-{offset}-{limit}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    total, records = tenant.catalog.page(offset, limit)
+    return JSONResponse(
+        {
+            "documents": [r.summary() for r in records],
+            "total": total,
+            "offset": offset,
+            "limit": limit
+        },
+        headers={"ETag": etag}
+    )
 
 
 @app.delete("/documents/{filename}")
-async def delete_document(filename: str):
-    file_path = RAW_DATA_DIR / filename
-    if not file_path.exists():
+def delete_document(filename: str, tenant: Tenant = Depends(resolve_tenant)):
+    # Sync endpoint: FastAPI runs it in the threadpool while it waits for the write lock.
+    # The store directory is never removed here, other workers may hold it open.
+    if tenant.catalog.get(filename) is None:
         raise HTTPException(status_code=404, detail="File not found")
 
-    file_path.unlink()
-    pdf_files = list(RAW_DATA_DIR.glob("*.pdf"))
+    with index_writer(tenant):
+        record = tenant.catalog.get(filename)
+        if record is None:
+            raise HTTPException(status_code=404, detail="File not found")
 
-    if pdf_files:
-        chunks_created = rebuild_vectorstore()
+        removed = remove_document(tenant, record)
+        (tenant.raw_dir / filename).unlink(missing_ok=True)
+        remaining = tenant.catalog.count()
+
+    if remaining:
         return {
-            "message": f"Deleted {filename} and rebuilt vector store.",
-            "remaining_documents": len(pdf_files),
-            "chunks_created": chunks_created
+            "message": f"Deleted {filename} and removed {removed} vectors.",
+            "remaining_documents": remaining,
+            "chunks_removed": removed
         }
     else:
-        safe_delete_chromadb(CHROMA_DB_DIR)
-        global vectorstore
-        vectorstore = None
         return {
             "message": f"Deleted {filename}. No documents remaining.",
             "remaining_documents": 0,
-            "chunks_created": 0
+            "chunks_removed": removed
         }
 
 
+@app.post("/rebuild")
+def rebuild(tenant: Tenant = Depends(resolve_tenant)):
+    """Re-embed every catalogued PDF into a fresh index; /chat keeps serving the old one meanwhile."""
+    try:
+        chunks = rebuild_vectorstore(tenant)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Rebuilt vector store.", "chunks_created": chunks}
+
+
+@app.post("/sync")
+def sync(tenant: Tenant = Depends(resolve_tenant)):
+    """Index PDFs added to or changed in the tenant's raw folder and drop deleted ones."""
+    result = sync_tenant(tenant)
+    changes = len(result["added"]) + len(result["updated"]) + len(result["removed"])
+    return {"message": f"Synced {changes} change(s), {len(result['failed'])} failed.", **result}
+
+
+def require_admin(token: Optional[str] = Header(None, alias=ADMIN_HEADER)):
+    """Dependency: the admin endpoints exist only when ADMIN_TOKEN is set, and need it in X-Admin-Token."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+
+@app.get("/admin/settings", dependencies=[Depends(require_admin)])
+def get_settings():
+    return {"settings": config.current().public(), "tunable": list(config.TUNABLE)}
+
+
+@app.patch("/admin/settings", dependencies=[Depends(require_admin)])
+def patch_settings(values: Dict[str, Any]):
+    """
+    Change tunable settings. They are stored in settings.json, which every
+    worker re-reads within a second; requests already running keep the
+    values they started with.
+    """
+    try:
+        return config.update(values)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/admin/settings/reload", dependencies=[Depends(require_admin)])
+def reload_settings():
+    """Apply an edited settings.json now; structural changes are listed and wait for a restart."""
+    try:
+        return config.reload()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Settings not reloaded: {e}")
+
+
 @app.get("/health")
 async def health():
+    default = tenants.get(DEFAULT_TENANT)
     return {
         "status": "healthy",
-        "vectorstore_initialized": vectorstore is not None
+        "ready": ready.is_set(),
+        "vectorstore_initialized": default.vectorstore is not None,
+        "tenants_loaded": len(tenants.loaded()),
+        "admission": admission.snapshot(),
+        "chat_coalescing": chat_flights.snapshot(),
+        "sessions": len(sessions),
+        **asdict(default.stats)
     }
 
 
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and serving. Never touches the index."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: 503 until warm-up finishes, then the default tenant's cached index stats."""
+    body = {"ready": ready.is_set(), **asdict(tenants.get(DEFAULT_TENANT).stats)}
+    return JSONResponse(body, status_code=200 if ready.is_set() else 503)
+
+
 @app.on_event("startup")
 async def startup_event():
-    global vectorstore
-    if CHROMA_DB_DIR.exists():
-        try:
-            vectorstore = Chroma(
-                collection_name=COLLECTION,
-                embedding_function=embeddings,
-                persist_directory=str(CHROMA_DB_DIR)
-            )
-            count = vectorstore._collection.count()
-            print(f"Loaded vector store with {count} vectors")
-        except Exception as e:
-            print(f"Warning: Could not load vector store: {e}")
+    # Warm the store in the background so the worker starts serving at once;
+    # /health reports "ready" once it is done.
+    threading.Thread(target=warm_up, name="vectorstore-warmup", daemon=True).start()
+    if SYNC_WATCH_INTERVAL > 0:
+        default = tenants.get(DEFAULT_TENANT)
+        DirectoryWatcher(default.raw_dir, SYNC_WATCH_INTERVAL, SYNC_DEBOUNCE, lambda: sync_tenant(default)).start()
+        print(f"Watching {default.raw_dir} for PDFs (every {SYNC_WATCH_INTERVAL:g}s, {SYNC_DEBOUNCE:g}s debounce)")
 
 
 if __name__ == "__main__":
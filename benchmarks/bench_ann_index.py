@@ -0,0 +1,122 @@
+"""
+bench_ann_index.py - HNSW recall vs. latency sweep on our own chunk vectors
+Run from project root: python benchmarks/bench_ann_index.py [--ef 16,32,64,128,256]
+
+Vectors come from the active index version under chroma_db/ (whichever
+backend built it), so the sweep reflects the real corpus; --synthetic N uses
+random vectors instead. Queries are --queries chunk vectors with a little
+noise added, or real questions embedded with Gemini via --questions FILE.
+Each ef_search setting is scored against exact brute-force top-k.
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from logistics_rag.ann_index import HnswVectorStore
+from logistics_rag.index_versions import IndexVersions
+from logistics_rag.vector_search import normalize_rows, top_k
+
+CHROMA_DB_DIR = Path(__file__).parent.parent / "chroma_db"
+COLLECTION    = "logistics_docs"
+BATCH         = 5000
+
+
+def load_chunk_vectors(path: Path) -> np.ndarray:
+    from logistics_rag.flat_index import FlatVectorStore
+    if FlatVectorStore.exists(path):
+        store = FlatVectorStore(path, embedding=None)
+        return np.asarray(store._matrix[store._alive], dtype=np.float32)
+    if HnswVectorStore.exists(path):
+        store = HnswVectorStore(path, embedding=None)
+        return np.asarray(store._index.get_items(sorted(store._row_of.values())), dtype=np.float32)
+
+    import chromadb
+    collection = chromadb.PersistentClient(path=str(path)).get_collection(COLLECTION)
+    vectors = []
+    for start in range(0, collection.count(), BATCH):
+        vectors.extend(collection.get(include=["embeddings"], offset=start, limit=BATCH)["embeddings"])
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def embed_questions_file(path: str) -> np.ndarray:
+    from dotenv import load_dotenv
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from logistics_rag.batch_qa import embed_questions
+
+    load_dotenv()
+    questions = [line.strip() for line in open(path, encoding="utf-8") if line.strip()]
+    embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+    return np.asarray(embed_questions(embeddings, questions), dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--synthetic", type=int, metavar="N", help="use N random vectors instead of the index")
+    parser.add_argument("--dim", type=int, default=768, help="dimension for --synthetic")
+    parser.add_argument("--questions", help="file of questions (one per line) to embed as queries")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef", default="16,32,64,128,256", help="comma-separated ef_search values")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        vectors = rng.standard_normal((args.synthetic, args.dim)).astype(np.float32)
+        source = "synthetic"
+    else:
+        active = IndexVersions(CHROMA_DB_DIR).active_dir()
+        if active is None:
+            sys.exit("No active index under chroma_db/; upload documents or pass --synthetic N")
+        vectors = load_chunk_vectors(active)
+        source = active.name
+    vectors = normalize_rows(vectors)
+    k = min(args.k, len(vectors))
+
+    if args.questions:
+        queries = normalize_rows(embed_questions_file(args.questions))
+    else:
+        picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+        queries = normalize_rows(vectors[picks] + 0.05 * rng.standard_normal(vectors[picks].shape))
+    print(f"{len(vectors)} chunks x {vectors.shape[1]} dims from {source}, "
+          f"{len(queries)} queries, k={k}, M={args.m}, ef_construction={args.ef_construction}\n")
+
+    start = time.perf_counter()
+    exact = [set(row) for row in top_k(queries, vectors, k)[0].tolist()]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HnswVectorStore(tmp, embedding=None, m=args.m, ef_construction=args.ef_construction)
+        ids = [str(i) for i in range(len(vectors))]
+        start = time.perf_counter()
+        for s in range(0, len(vectors), BATCH):
+            store.add_vectors(ids[s:s + BATCH], vectors[s:s + BATCH], [""] * len(ids[s:s + BATCH]),
+                              [{} for _ in ids[s:s + BATCH]])
+        store.save()
+        print(f"build {time.perf_counter() - start:.1f} s, "
+              f"{(Path(tmp) / 'hnsw_index.bin').stat().st_size / 1e6:.1f} MB on disk")
+        print(f"exact brute force  {exact_ms:7.2f} ms/query\n")
+
+        print(f"{'ef_search':>9s}  {'recall@' + str(k):>9s}  {'p50 ms':>7s}  {'p95 ms':>7s}")
+        for ef in map(int, args.ef.split(",")):
+            times, recalls = [], []
+            for q, truth in zip(queries, exact):
+                t = time.perf_counter()
+                hits = store.search_by_vectors(q, k, ef=ef)[0]
+                times.append((time.perf_counter() - t) * 1000)
+                recalls.append(len({int(cid) for cid, _ in hits} & truth) / k)
+            times.sort()
+            print(f"{ef:9d}  {statistics.mean(recalls):9.1%}  {statistics.median(times):7.2f}  "
+                  f"{times[int(len(times) * 0.95) - 1]:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+bench_batch_search.py - Batched vs. looped top-k retrieval
+Run from project root: python benchmarks/bench_batch_search.py [--chunks 50000] [--queries 1000]
+
+Compares, on random unit vectors:
+  numpy loop     one top_k call per query (what a per-question search costs)
+  numpy batched  one top_k call for the whole query matrix
+  chroma loop / chroma batched (with --chroma) against an in-memory collection
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from logistics_rag.vector_search import normalize_rows, top_k
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chroma", action="store_true", help="also benchmark a Chroma collection")
+    args = parser.parse_args()
+
+    rng     = np.random.default_rng(0)
+    matrix  = normalize_rows(rng.standard_normal((args.chunks, args.dim)))
+    queries = normalize_rows(rng.standard_normal((args.queries, args.dim)))
+    print(f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries, k={args.k}\n")
+
+    loop_s, looped = timed(lambda: [top_k(q, matrix, args.k)[0][0] for q in queries])
+    batch_s, (batched, _) = timed(lambda: top_k(queries, matrix, args.k))
+    assert np.array_equal(np.stack(looped), batched), "batched results differ from looped"
+
+    print(f"numpy loop      {loop_s * 1000:9.1f} ms  ({loop_s / args.queries * 1e6:8.1f} us/query)")
+    print(f"numpy batched   {batch_s * 1000:9.1f} ms  ({batch_s / args.queries * 1e6:8.1f} us/query)"
+          f"  {loop_s / batch_s:5.1f}x")
+
+    if args.chroma:
+        import chromadb
+
+        collection = chromadb.EphemeralClient().create_collection(
+            "bench", metadata={"hnsw:space": "ip"}
+        )
+        ids = [str(i) for i in range(args.chunks)]
+        for start in range(0, args.chunks, 5000):
+            collection.add(ids=ids[start:start + 5000], embeddings=matrix[start:start + 5000].tolist())
+        qlist = queries.tolist()
+        c_loop_s, _ = timed(lambda: [collection.query(query_embeddings=[q], n_results=args.k) for q in qlist])
+        c_batch_s, _ = timed(lambda: collection.query(query_embeddings=qlist, n_results=args.k))
+        print(f"chroma loop     {c_loop_s * 1000:9.1f} ms  ({c_loop_s / args.queries * 1e6:8.1f} us/query)")
+        print(f"chroma batched  {c_batch_s * 1000:9.1f} ms  ({c_batch_s / args.queries * 1e6:8.1f} us/query)"
+              f"  {c_loop_s / c_batch_s:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
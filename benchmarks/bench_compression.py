@@ -0,0 +1,62 @@
+"""
+bench_compression.py - Prompt tokens saved by extractive compression vs. answer accuracy
+Run from project root: python benchmarks/bench_compression.py golden.jsonl [--ratios 1,0.6,0.4,0.25] [--weights 0,0.5]
+
+Indexes the corpus once (options as for `eval_golden.py run`), then answers the
+golden set at every compression ratio and embedding weight. Each row shows
+tokens per answer and the saving against whole excerpts (ratio 1), next to
+hit_rate, exact_match and latency. With the default --llm extractive,
+exact_match shows whether the figure survived compression; --llm gemini checks
+real answers and real token counts.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from eval_golden import corpus_arguments, scratch_index
+
+
+def cell(value):
+    return "-" if value is None else value
+
+
+def floats(text: str):
+    return [float(v) for v in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    corpus_arguments(parser)
+    parser.add_argument("--ratios", type=floats, default=[1.0, 0.6, 0.4, 0.25])
+    parser.add_argument("--weights", type=floats, default=[0.0, 0.5],
+                        help="embedding share of the sentence score; 0 = lexical only")
+    args = parser.parse_args()
+
+    with scratch_index(args) as (tenant, questions, meter):
+        from dataclasses import replace
+
+        from logistics_rag.evaluation import run_golden, score_run
+        from logistics_rag.retrieval import retrieval_params
+
+        base = retrieval_params(args.k)
+        settings = [(1.0, 0.0)] + [(r, w) for r in args.ratios if r < 1 for w in args.weights]
+        rows = []
+        for ratio, weight in settings:
+            params = replace(base, compression=ratio, compression_weight=weight)
+            rows.append((ratio, weight, score_run(run_golden(tenant, questions, params, meter))))
+
+    whole = rows[0][2]["tokens_per_answer"] or 1
+    print(f"\n{len(questions)} questions, k={base.k}, llm={args.llm}\n")
+    print(f"{'ratio':>6} {'weight':>7} {'tokens':>8} {'saved':>7} {'hit_rate':>9} {'mrr':>6} "
+          f"{'exact':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for ratio, weight, s in rows:
+        saved = 1 - s["tokens_per_answer"] / whole
+        hit, mrr, exact = (cell(s[name]) for name in ("hit_rate", "mrr", "exact_match"))
+        print(f"{ratio:>6.2f} {weight if ratio < 1 else '-':>7} {s['tokens_per_answer']:>8.1f} {saved:>7.0%} "
+              f"{hit:>9} {mrr:>6} {exact:>6} {s['latency_p50_ms']:>8.1f} {s['latency_p95_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
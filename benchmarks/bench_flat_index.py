@@ -0,0 +1,82 @@
+"""
+bench_flat_index.py - Flat NumPy index vs. Chroma on the get_answer retrieval path
+Run from project root: python benchmarks/bench_flat_index.py [--chunks 50000] [--queries 200]
+
+Both stores are filled with the same random unit vectors and queried through
+similarity_search_by_vector, i.e. what get_answer does after embedding the
+question. Reports p50/p95 latency per query and recall@k against exact
+brute-force results (Chroma's HNSW is approximate, the flat index is not).
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from logistics_rag.flat_index import FlatVectorStore
+from logistics_rag.vector_search import normalize_rows, top_k
+
+BATCH = 5000
+
+
+def latencies(search, queries, k):
+    times, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        docs = search(q, k)
+        times.append((time.perf_counter() - start) * 1000)
+        results.append([d.page_content for d in docs])
+    times.sort()
+    return times, results
+
+
+def report(name, times, results, exact, k):
+    p95 = times[int(len(times) * 0.95) - 1]
+    recall = np.mean([len(set(got) & truth) / k for got, truth in zip(results, exact)])
+    print(f"{name:16s} p50 {statistics.median(times):7.2f} ms   p95 {p95:7.2f} ms   recall@{k} {recall:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng     = np.random.default_rng(0)
+    vectors = normalize_rows(rng.standard_normal((args.chunks, args.dim)))
+    queries = normalize_rows(rng.standard_normal((args.queries, args.dim)))
+    ids     = [f"c{i}" for i in range(args.chunks)]
+    texts   = ids
+    metas   = [{"source": "bench.pdf", "page": i} for i in range(args.chunks)]
+    exact   = [{ids[i] for i in row} for row in top_k(queries, vectors, args.k)[0]]
+    print(f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries, k={args.k}\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from langchain_community.vectorstores import Chroma
+
+        chroma = Chroma(collection_name="bench", persist_directory=str(Path(tmp) / "chroma"),
+                        collection_metadata={"hnsw:space": "cosine"})
+        for s in range(0, args.chunks, BATCH):
+            chroma._collection.add(ids=ids[s:s + BATCH], embeddings=vectors[s:s + BATCH].tolist(),
+                                   documents=texts[s:s + BATCH], metadatas=metas[s:s + BATCH])
+        qlist = queries.tolist()
+        times, results = latencies(lambda q, k: chroma.similarity_search_by_vector(q, k=k), qlist, args.k)
+        report("chroma", times, results, exact, args.k)
+
+        for dtype in ("float32", "float16"):
+            flat = FlatVectorStore(Path(tmp) / f"flat-{dtype}", embedding=None, dtype=dtype)
+            for s in range(0, args.chunks, BATCH):
+                flat.add_vectors(ids[s:s + BATCH], vectors[s:s + BATCH], texts[s:s + BATCH], metas[s:s + BATCH])
+            times, results = latencies(lambda q, k: flat.similarity_search_by_vector(q, k=k), qlist, args.k)
+            report(f"flat {dtype}", times, results, exact, args.k)
+
+
+if __name__ == "__main__":
+    main()
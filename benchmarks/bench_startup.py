@@ -0,0 +1,69 @@
+"""
+bench_startup.py - Cold-start benchmark for the FastAPI backend
+Run from project root: python benchmarks/bench_startup.py [--runs 5] [--target 1.5]
+
+Each run starts a fresh interpreter so module caches do not hide the cost of
+`import app`. Warm-up (opening Chroma and the Gemini clients) is measured
+separately because it happens in the background after the worker is serving.
+Exits non-zero when the median import time exceeds the target.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+result = {"import_s": t1 - t0}
+if WARM:
+    app.warm_up()
+    result["warm_up_s"] = time.perf_counter() - t1
+print(json.dumps(result))
+"""
+
+
+def run_once(warm: bool) -> dict:
+    code = PROBE.replace("WARM", "True" if warm else "False")
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target", type=float, default=1.5,
+                        help="maximum acceptable median import time in seconds")
+    parser.add_argument("--warm", action="store_true",
+                        help="also time warm_up() (needs GOOGLE_API_KEY and a built index)")
+    args = parser.parse_args()
+
+    results = [run_once(args.warm) for _ in range(args.runs)]
+    imports = [r["import_s"] for r in results]
+    median  = statistics.median(imports)
+
+    print(f"import app   median {median:.3f}s  min {min(imports):.3f}s  max {max(imports):.3f}s")
+    if args.warm:
+        warm = [r["warm_up_s"] for r in results]
+        print(f"warm_up()    median {statistics.median(warm):.3f}s")
+
+    if median > args.target:
+        print(f"FAIL: cold start {median:.3f}s exceeds target {args.target:.3f}s")
+        sys.exit(1)
+    print(f"OK: cold start within target {args.target:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
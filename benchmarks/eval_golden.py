@@ -0,0 +1,204 @@
+"""
+eval_golden.py - Answer quality and latency regression runs over a golden question set
+Run from project root:
+
+    python benchmarks/eval_golden.py run golden.jsonl --name baseline
+    CHUNK_SIZE=600 python benchmarks/eval_golden.py run golden.jsonl --name chunk600 --baseline baseline
+    python benchmarks/eval_golden.py compare baseline chunk600 top_k8
+
+`run` indexes the corpus (default data/raw) into a scratch data directory with
+the settings from the environment, answers every golden question (format in
+logistics_rag/evaluation.py) and saves the results to data/eval/runs/<name>.json.
+Embeddings are cached in data/eval/embeddings.db: once a corpus and golden
+set have been embedded, --offline runs need no API. The default --llm
+extractive is a local stand-in for Gemini; --llm gemini measures the real
+model, its tokens and latency. `compare` prints runs side by side. Both exit
+non-zero when the last run is worse than the first (or --baseline).
+"""
+import argparse
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+EVAL_DIR     = PROJECT_ROOT / "data" / "eval"
+RUNS_DIR     = EVAL_DIR / "runs"
+
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def corpus_arguments(parser):
+    """Options for indexing a corpus and answering a golden set, shared with bench_compression.py."""
+    parser.add_argument("golden", type=Path, help="golden questions, JSONL")
+    parser.add_argument("--corpus", type=Path, default=PROJECT_ROOT / "data" / "raw", help="folder of PDFs")
+    parser.add_argument("--llm", choices=("extractive", "gemini"), default="extractive")
+    parser.add_argument("--embeddings", choices=("gemini", "hashing"), default="gemini",
+                        help="gemini goes through the cache; hashing is a local bag-of-words stand-in")
+    parser.add_argument("--cache", type=Path, default=EVAL_DIR / "embeddings.db")
+    parser.add_argument("--offline", action="store_true", help="fail on embeddings missing from the cache")
+    parser.add_argument("-k", type=int, help="excerpts per prompt (default: the top_k setting)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch index")
+
+
+def run_path(name: str) -> Path:
+    """A run name or a path to a run file."""
+    path = Path(name)
+    return path if path.suffix == ".json" else RUNS_DIR / f"{name}.json"
+
+
+def load_run(name: str) -> dict:
+    return json.loads(run_path(name).read_text(encoding="utf-8"))
+
+
+@contextmanager
+def scratch_index(args):
+    """Index args.corpus into a scratch data directory; yields (tenant, golden questions, metered LLM)."""
+    workdir = Path(tempfile.mkdtemp(prefix="logistics-eval-"))
+    # The package reads its paths at import: point them at the scratch directory first.
+    os.environ["DATA_DIR"]      = str(workdir / "data")
+    os.environ["INDEX_DIR"]     = str(workdir / "index")
+    os.environ["SETTINGS_FILE"] = str(workdir / "settings.json")
+
+    from logistics_rag import clients
+    from logistics_rag.config import EMBED_MODEL
+    from logistics_rag.dir_sync import pdf_files
+    from logistics_rag.evaluation import CachedEmbeddings, ExtractiveLLM, HashingEmbeddings, MeteredLLM, load_golden
+    from logistics_rag.ingest import sync_tenant
+    from logistics_rag.store import current_vectorstore, tenants
+    from logistics_rag.tenants import DEFAULT_TENANT
+
+    try:
+        questions = load_golden(args.golden)
+        if args.embeddings == "hashing":
+            embeddings = query_embeddings = HashingEmbeddings()
+        else:
+            embeddings = CachedEmbeddings(args.cache, EMBED_MODEL, None if args.offline else clients.make_embeddings)
+            query_embeddings = CachedEmbeddings(args.cache, EMBED_MODEL,
+                                                None if args.offline else clients.make_query_embeddings, kind="query")
+        meter = MeteredLLM(ExtractiveLLM() if args.llm == "extractive" else clients.make_llm())
+        clients.use_clients(embeddings=embeddings, llm=meter, query_embeddings=query_embeddings)
+
+        tenant = tenants.get(DEFAULT_TENANT)
+        corpus = pdf_files(args.corpus)
+        if not corpus:
+            raise SystemExit(f"No PDFs in {args.corpus}")
+        for name, path in corpus.items():
+            shutil.copy2(path, tenant.raw_dir / name)
+        synced = sync_tenant(tenant)
+        for failed in synced["failed"]:
+            print(f"  ❌ {failed['filename']}: {failed['reason']}")
+        if synced["failed"]:
+            raise SystemExit(f"{len(synced['failed'])} document(s) could not be indexed")
+
+        # Untimed: opening the index and the first-use imports would otherwise land in the first latency.
+        current_vectorstore(tenant).similarity_search(questions[0].question, k=1)
+        importlib.import_module("langchain.prompts")
+
+        yield tenant, questions, meter
+        if isinstance(embeddings, CachedEmbeddings):
+            print(f"Embedding cache: {embeddings.hits} hits, {embeddings.misses} misses")
+    finally:
+        if args.keep:
+            print(f"Index kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(args) -> dict:
+    with scratch_index(args) as (tenant, questions, meter):
+        from logistics_rag.config import current
+        from logistics_rag.evaluation import run_golden, score_run
+        from logistics_rag.retrieval import retrieval_params
+
+        params = retrieval_params(args.k, args.candidates, args.context_tokens, args.compression)
+        results = run_golden(tenant, questions, params, meter)
+        documents = len(tenant.catalog.list())
+        settings = current().public()
+        for scratch in ("data_dir", "index_dir"):
+            settings.pop(scratch)
+
+    record = {
+        "name": args.name,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "golden": str(args.golden),
+        "corpus": str(args.corpus),
+        "documents": documents,
+        "llm": args.llm,
+        "embeddings": args.embeddings,
+        "k": params.k,
+        "candidates": params.candidates,
+        "context_tokens": params.context_tokens,
+        "compression": params.compression,
+        "settings": settings,
+        "summary": score_run(results),
+        "questions": results,
+    }
+    out = run_path(args.name)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(record, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Saved {out}\n")
+    return record
+
+
+def print_runs(runs, tolerance: float) -> int:
+    """Side-by-side summaries, then what changed from the first run to the last; returns the exit code."""
+    from logistics_rag.evaluation import METRICS, changed_questions, regressions
+
+    width = max(12, *(len(r["name"]) + 2 for r in runs))
+    print(f"{'':<20}" + "".join(f"{r['name']:>{width}}" for r in runs))
+    for name in ("questions", "errors", "k", *(m for m, _ in METRICS)):
+        values = [r["summary"].get(name, r.get(name)) for r in runs]
+        print(f"{name:<20}" + "".join(f"{'-' if v is None else v:>{width}}" for v in values))
+
+    if len(runs) < 2:
+        return 0
+    first, last = runs[0], runs[-1]
+    changes = changed_questions(first, last)
+    if changes:
+        print(f"\n{first['name']} -> {last['name']}:")
+        for line in changes:
+            print(f"  {line}")
+    worse = regressions(first, last, tolerance)
+    if worse:
+        print(f"\n❌ {last['name']} regressed: " + "; ".join(worse))
+        return 1
+    print(f"\n✓ No regressions against {first['name']}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed relative increase of tokens and latency (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("run", parents=[common], help="evaluate the current settings on a golden set")
+    corpus_arguments(p)
+    p.add_argument("--name", default=datetime.now().strftime("run-%Y%m%d-%H%M%S"))
+    p.add_argument("--candidates", type=int)
+    p.add_argument("--context-tokens", type=int)
+    p.add_argument("--compression", type=float, help="share of the excerpts kept (default: the setting)")
+    p.add_argument("--baseline", help="run to compare against")
+
+    p = commands.add_parser("compare", parents=[common], help="print saved runs side by side")
+    p.add_argument("runs", nargs="+", help="run names or files, the first is the baseline")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        record = run(args)
+        runs = [load_run(args.baseline), record] if args.baseline else [record]
+    else:
+        runs = [load_run(name) for name in args.runs]
+    sys.exit(print_runs(runs, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+logistics_rag - The RAG core shared by the API (app.py) and the CLI (src/main.py)
+
+    config       every setting, with its environment override
+    clients      lazily created Gemini embeddings and chat model
+    store        tenant registry, vector store lifecycle, cross-worker write lock
+    ingest       parse, classify, chunk and index PDFs; sync, rebuild, remove
+    retrieval    context for a question (identifier lookup or dense search)
+    answering    answers from rate tables or from retrieved context
+
+The remaining modules are the building blocks these use (catalog, index
+backends, side indexes, parsers, admission control, sessions).
+"""
@@ -0,0 +1,129 @@
+"""
+admission.py - Admission control and quota-aware retries for LLM work
+
+AdmissionController bounds how many /chat requests run at once, overall and
+per client, and how many may wait for a slot. A request that would overflow
+the wait queue is rejected immediately with a Retry-After estimate instead
+of piling onto Gemini and failing with everything else.
+
+call_with_backoff retries a call that failed on a quota / overload error,
+sleeping a random ("full jitter") share of an exponentially growing delay so
+that requests throttled together do not retry together.
+"""
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+QUOTA_ERROR_TYPES   = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable"}
+QUOTA_ERROR_MARKERS = ("429", "RESOURCE_EXHAUSTED", "quota", "rate limit")
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    __slots__ = ("client", "started", "released")
+
+    def __init__(self, client: str):
+        self.client   = client
+        self.started  = time.monotonic()
+        self.released = False
+
+
+class QuotaExhausted(Exception):
+    """Still throttled by the LLM provider after every retry."""
+
+
+def is_quota_error(error: Exception) -> bool:
+    if type(error).__name__ in QUOTA_ERROR_TYPES:
+        return True
+    text = str(error)
+    return any(marker.lower() in text.lower() for marker in QUOTA_ERROR_MARKERS)
+
+
+def call_with_backoff(fn: Callable[[], T], retries: int, base: float, cap: float) -> T:
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if not is_quota_error(e):
+                raise
+            if attempt == retries:
+                raise QuotaExhausted(str(e)) from e
+            delay = random.uniform(0, min(cap, base * 2 ** attempt))
+            print(f"LLM quota error, retry {attempt + 1}/{retries} in {delay:.1f}s: {e}")
+            time.sleep(delay)
+
+
+class AdmissionController:
+    def __init__(self, max_active: int, max_queued: int, per_client: int, queue_timeout: float):
+        self.max_active    = max_active
+        self.max_queued    = max_queued
+        self.per_client    = per_client
+        self.queue_timeout = queue_timeout
+        self._slots   = threading.Semaphore(max_active)
+        self._lock    = threading.Lock()
+        self._active  = 0
+        self._queued  = 0
+        self._clients = defaultdict(int)   # client -> requests active or queued
+        self._service = 5.0                # moving average of seconds per request
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue should have drained."""
+        return max(1, math.ceil(self._service * (self._queued + 1) / self.max_active))
+
+    def acquire(self, client: str) -> Ticket:
+        """Take a slot for `client`, waiting in the bounded queue if needed; raise Overloaded otherwise."""
+        with self._lock:
+            if self._clients.get(client, 0) >= self.per_client:
+                raise Overloaded("Too many concurrent requests from this client.", self.retry_after())
+            if self._active >= self.max_active and self._queued >= self.max_queued:
+                raise Overloaded("Server is busy, please retry.", self.retry_after())
+            self._clients[client] += 1
+            self._queued += 1
+
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self._queued -= 1
+            if not acquired:
+                self._forget(client)
+                raise Overloaded("Timed out waiting for capacity, please retry.", self.retry_after())
+            self._active += 1
+        return Ticket(client)
+
+    def release(self, ticket: Ticket):
+        """Give the slot back. Safe to call more than once per ticket."""
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            self._active -= 1
+            self._forget(ticket.client)
+            self._service = 0.8 * self._service + 0.2 * (time.monotonic() - ticket.started)
+        self._slots.release()
+
+    def _forget(self, client: str):
+        self._clients[client] -= 1
+        if not self._clients[client]:
+            del self._clients[client]
+
+    @contextmanager
+    def admit(self, client: str):
+        ticket = self.acquire(client)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def snapshot(self) -> dict:
+        return {"active": self._active, "queued": self._queued, "max_active": self.max_active,
+                "max_queued": self.max_queued}
@@ -0,0 +1,327 @@
+"""
+ann_index.py - Approximate nearest neighbour index (HNSW) for very large corpora
+
+Exact scoring touches every stored vector per query; past a few million
+chunks that stops being cheap. HnswVectorStore keeps the vectors in an
+hnswlib graph instead (CPU-only, optional dependency: pip install hnswlib).
+Files in the index directory:
+
+    hnsw_meta.json      dim, build parameters, row count, rows in the saved graph
+    hnsw_index.bin      the graph as of its last save
+    hnsw_pending.bin    vectors of the rows added since, float32, replayed on open
+    hnsw_deleted.json   deleted labels
+    chunks.*            chunk IDs, text and metadata per label (chunk_store.py)
+
+Saving the graph rewrites all of it, so an add only appends its vectors to
+the pending log and the graph is saved once CHECKPOINT_ROWS have piled up
+there (and after a full build). Searches run outside the writer lock, in
+parallel with each other, with saves and with the chunk writes and embedding
+of an add; they only wait while the graph itself changes (insert, delete,
+resize) or ef is switched.
+
+Tuning: M and ef_construction are fixed when the index is built (higher =
+better recall, bigger and slower to build); ef_search trades recall for
+latency on every query and can be changed at any time. Deleted labels are
+marked in the graph and their slots reused by later inserts; their chunk
+rows stay on disk until the next rebuild.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from .chunk_store import ChunkStore
+from .vector_search import normalize_rows
+
+META_FILE       = "hnsw_meta.json"
+INDEX_FILE      = "hnsw_index.bin"
+PENDING_FILE    = "hnsw_pending.bin"
+DELETED_FILE    = "hnsw_deleted.json"
+INITIAL_CAP     = 10000
+GROWTH          = 2       # capacity multiplier when the graph fills up
+CHECKPOINT_ROWS = 5000    # rows in the pending log before the graph is saved; bounds replay on open
+
+
+def _hnswlib():
+    try:
+        import hnswlib
+    except ImportError:
+        raise RuntimeError("VECTOR_BACKEND=hnsw needs hnswlib: pip install hnswlib") from None
+    return hnswlib
+
+
+class HnswVectorStore(VectorStore):
+    def __init__(
+        self,
+        path: Path,
+        embedding,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        recover: bool = False,
+    ):
+        self.path = Path(path)
+        self._embedding = embedding
+        self._lock = threading.RLock()        # writers: add, delete, save
+        self._gate = threading.Condition()   # searches vs. graph changes, which hnswlib cannot overlap
+        self._searches = 0
+        self._pausing = 0
+        self.ef_search = ef_search
+        self._new_meta = {"dim": None, "m": m, "ef_construction": ef_construction, "rows": 0, "graph_rows": 0}
+        self._load()
+        if recover:
+            self.recover()
+
+    def _read_meta(self) -> dict:
+        if (self.path / META_FILE).exists():
+            return json.loads((self.path / META_FILE).read_text(encoding="utf-8"))
+        return dict(self._new_meta)
+
+    def _load(self):
+        """Open the committed rows. Writes nothing, so readers can open while a writer appends."""
+        meta = self._read_meta()
+        self._dim, self._m, self._ef_construction = meta["dim"], meta["m"], meta["ef_construction"]
+        self._graph_rows = meta.get("graph_rows", meta["rows"])
+
+        self._chunks = ChunkStore(self.path, rows=meta["rows"])
+        self._deleted = set()
+        if (self.path / DELETED_FILE).exists():
+            self._deleted = set(json.loads((self.path / DELETED_FILE).read_text(encoding="utf-8")))
+
+        self._index = self._open_graph(meta["rows"]) if self._dim else None
+        self._ef = None
+        self._row_of = {cid: row for row, cid in enumerate(self._chunks.ids) if row not in self._deleted}
+
+    def recover(self):
+        """
+        Cut the chunk files back to the committed row count, dropping what an
+        add that died left behind, reloading first if another worker committed
+        since this store was opened. Callers hold the tenant's write lock.
+        """
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            if self._read_meta()["rows"] != len(self._chunks):
+                with self._searches_paused():
+                    self._load()
+            self._chunks.recover(len(self._chunks))
+
+    # ── storage ────────────────────────────────
+    def _open_graph(self, rows: int):
+        """The saved graph (or an empty one) with the pending rows added and every deleted label marked."""
+        index = _hnswlib().Index(space="cosine", dim=self._dim)
+        if (self.path / INDEX_FILE).exists():
+            index.load_index(str(self.path / INDEX_FILE), allow_replace_deleted=True)
+        else:
+            index.init_index(
+                max_elements=max(INITIAL_CAP, rows),
+                ef_construction=self._ef_construction,
+                M=self._m,
+                allow_replace_deleted=True,
+            )
+        labels = np.array([row for row in range(self._graph_rows, rows) if row not in self._deleted], dtype=np.int64)
+        if len(labels):
+            pending = np.fromfile(self.path / PENDING_FILE, dtype=np.float32,
+                                  count=(rows - self._graph_rows) * self._dim).reshape(-1, self._dim)
+            needed = index.get_current_count() + len(labels)
+            if needed > index.get_max_elements():
+                index.resize_index(max(needed, index.get_max_elements() * GROWTH))
+            index.add_items(pending[labels - self._graph_rows], labels, replace_deleted=True)
+        for label in self._deleted:
+            try:
+                index.mark_deleted(label)
+            except RuntimeError:
+                pass   # never inserted, or already deleted in the saved graph
+        return index
+
+    def _mark_deleted(self, label: int):
+        try:
+            self._index.mark_deleted(label)
+        except RuntimeError:
+            pass   # never inserted, or already deleted
+
+    def _write_meta(self):
+        meta = {"dim": self._dim, "m": self._m, "ef_construction": self._ef_construction,
+                "rows": len(self._chunks), "graph_rows": self._graph_rows}
+        tmp = self.path / f"{META_FILE}.tmp"
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, self.path / META_FILE)   # the row count in meta is the commit point
+
+    def _write_deleted(self):
+        (self.path / DELETED_FILE).write_text(json.dumps(sorted(self._deleted)), encoding="utf-8")
+
+    def _log_pending(self, first: int, matrix: np.ndarray):
+        """Write the vectors of rows first.. at their place in the pending log, dropping anything after."""
+        path = self.path / PENDING_FILE
+        with open(path, "r+b" if path.exists() else "wb") as f:
+            f.seek((first - self._graph_rows) * self._dim * 4)
+            f.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+            f.truncate()
+
+    def save(self):
+        """Write the whole graph and empty the pending log."""
+        with self._lock:
+            if self._index is None:
+                return
+            tmp = self.path / f"{INDEX_FILE}.tmp"
+            self._index.save_index(str(tmp))
+            os.replace(tmp, self.path / INDEX_FILE)
+            self._graph_rows = len(self._chunks)
+            self._write_meta()
+            (self.path / PENDING_FILE).unlink(missing_ok=True)
+
+    @contextmanager
+    def _searches_paused(self):
+        """Hold new searches back and wait out the running ones."""
+        with self._gate:
+            self._pausing += 1
+            try:
+                while self._searches:
+                    self._gate.wait()
+                yield
+            finally:
+                self._pausing -= 1
+                self._gate.notify_all()
+
+    def add_vectors(self, ids: List[str], vectors, texts: List[str], metadatas: List[dict]) -> List[str]:
+        """Insert pre-computed vectors. Re-adding an existing ID replaces it."""
+        matrix = normalize_rows(vectors)
+        with self._lock:
+            if self._index is None:
+                self._dim = matrix.shape[1]
+                self._index = self._open_graph(0)
+            elif matrix.shape[1] != self._dim:
+                raise ValueError(f"Vector dimension {matrix.shape[1]} does not match index dimension {self._dim}")
+
+            first = self._chunks.append(ids, texts, metadatas)
+            self._deleted.difference_update(range(first, first + len(ids)))   # labels a dead add had taken
+            self._log_pending(first, matrix)
+            with self._searches_paused():
+                for cid in ids:
+                    if cid in self._row_of:
+                        row = self._row_of.pop(cid)
+                        self._mark_deleted(row)
+                        self._deleted.add(row)
+                needed = self._index.get_current_count() + len(ids)
+                if needed > self._index.get_max_elements():
+                    self._index.resize_index(max(needed, self._index.get_max_elements() * GROWTH))
+                self._index.add_items(matrix, np.arange(first, first + len(ids)), replace_deleted=True)
+                self._row_of.update({cid: first + i for i, cid in enumerate(ids)})
+            self._write_deleted()
+            self._write_meta()   # the graph is only saved with committed rows in it
+            if len(self._chunks) - self._graph_rows >= CHECKPOINT_ROWS:
+                self.save()
+        return list(ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> None:
+        with self._lock:
+            self._tombstone([self._row_of.pop(cid) for cid in ids or [] if cid in self._row_of])
+
+    def delete_where(self, where: dict):
+        """Delete every row whose metadata matches all key/value pairs in `where`."""
+        with self._lock:
+            chunks = self._chunks.view()
+            rows = []
+            for cid, row in list(self._row_of.items()):
+                meta = chunks.metadata(row)
+                if all(meta.get(key) == value for key, value in where.items()):
+                    rows.append(row)
+                    del self._row_of[cid]
+            self._tombstone(rows)
+
+    def _tombstone(self, rows: List[int]):
+        if not rows:
+            return
+        with self._searches_paused():
+            for row in rows:
+                self._mark_deleted(row)
+        self._deleted.update(rows)
+        self._write_deleted()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    # ── search ─────────────────────────────────
+    @contextmanager
+    def _searching(self, ef: int):
+        """Count a search in flight; switching ef waits until none runs with the old one."""
+        with self._gate:
+            while self._pausing or (ef != self._ef and self._searches):
+                self._gate.wait()
+            if ef != self._ef:
+                self._index.set_ef(ef)
+                self._ef = ef
+            self._searches += 1
+        try:
+            yield
+        finally:
+            with self._gate:
+                self._searches -= 1
+                self._gate.notify_all()
+
+    def search_by_vectors(self, vectors, k: int, ef: Optional[int] = None):
+        """Approximate top-k (chunk_id, Document) pairs for each query vector."""
+        queries = normalize_rows(np.atleast_2d(vectors))
+        k = min(k, len(self._row_of))
+        if self._index is None or k == 0:
+            return [[] for _ in queries]
+        with self._searching(max(ef or self.ef_search, k)):
+            labels, _ = self._index.knn_query(queries, k=k)
+        chunks = self._chunks.view()   # taken after the query: an add appends its rows before inserting them
+        return [[(chunks.ids[i], chunks.document(i)) for i in map(int, row)] for row in labels]
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """Documents of the chunk IDs that are still indexed, in the order asked."""
+        with self._lock:
+            rows = [self._row_of.get(cid) for cid in ids]
+            chunks = self._chunks.view()
+        return [chunks.document(row) for row in rows if row is not None]
+
+    # ── langchain VectorStore interface ────────
+    @classmethod
+    def exists(cls, path: Path) -> bool:
+        return (Path(path) / META_FILE).exists()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if ids is None:
+            import uuid
+            ids = [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        return self.add_vectors(ids, self._embedding.embed_documents(texts), texts, metadatas)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for _, doc in self.search_by_vectors([embedding], k, ef=kwargs.get("ef"))[0]]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k, **kwargs)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        path: Optional[Path] = None,
+        **kwargs: Any,
+    ) -> "HnswVectorStore":
+        store = cls(path, embedding, recover=True, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.save()
+        return store
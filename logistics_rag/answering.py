@@ -0,0 +1,157 @@
+"""
+answering.py - Answers from rate tables or from retrieved context
+
+Rate lookups are answered straight from the extracted tables, without
+retrieval or Gemini. Everything else is answered by Gemini from the excerpts
+retrieval.py returns. Follow-up questions of a conversation session are first
+rewritten into standalone ones.
+"""
+from typing import Optional
+
+from .clients import invoke_llm
+from .config import current
+from .retrieval import RetrievalParams, entity_docs, prompt_context, retrieval_params, retrieve
+from .sessions import Session
+from .tenants import Tenant
+
+
+def get_answer(tenant: Tenant, question: str, include_sources: bool = True,
+               params: Optional[RetrievalParams] = None):
+    table_answer = answer_from_tables(tenant, question, include_sources)
+    if table_answer is not None:
+        return table_answer
+    return answer_from_docs(question, retrieve(tenant, question, params or retrieval_params()), include_sources)
+
+
+def answer_planned(tenant: Tenant, question: str, docs, include_sources: bool = True,
+                   params: Optional[RetrievalParams] = None):
+    """get_answer for a question whose search already ran in a batch plan (fetching params.candidates)."""
+    table_answer = answer_from_tables(tenant, question, include_sources)
+    if table_answer is not None:
+        return table_answer
+    params = params or retrieval_params()
+    docs = entity_docs(tenant, question, params.candidates) or docs
+    return answer_from_docs(question, prompt_context(tenant, question, docs, params), include_sources)
+
+
+def answer_from_tables(tenant: Tenant, question: str, include_sources: bool = True):
+    """Answer a rate lookup straight from the extracted tables, without retrieval or Gemini; None if it isn't one."""
+    rows = tenant.tables.lookup(question)
+    if not rows:
+        return None
+
+    lines = []
+    for row in rows:
+        label = "".join(f", {row[name]}" for name in ("equipment", "weight_break") if row.get(name))
+        currency = f" {row['currency']}" if row["currency"] else ""
+        lines.append(f"{row['lane']}{label}: {row['rate_text']}{currency} ({row['source']}, page {row['page']})")
+    answer = lines[0] if len(lines) == 1 else "From the rate tables:\n" + "\n".join(f"- {line}" for line in lines)
+
+    return {
+        "answer": answer,
+        "sources": [
+            {"filename": row["source"], "page": row["page"], "content": row["text"]} for row in rows
+        ] if include_sources else []
+    }
+
+
+def answer_from_docs(question: str, docs, include_sources: bool = True):
+    if not docs:
+        return {
+            "answer": "I couldn't find any relevant information in the uploaded documents.",
+            "sources": []
+        }
+
+    context_parts = []
+    sources = []
+    for i, doc in enumerate(docs, 1):
+        src  = doc.metadata.get("source", "unknown")
+        page = doc.metadata.get("page", "?")
+        context_parts.append(f"[Excerpt {i} | {src} | page {page}]\n{doc.page_content}")
+        if include_sources:
+            sources.append({
+                "filename": src,
+                "page": page,
+                "content": doc.page_content[:200] + "..."
+            })
+
+    context = "\n\n".join(context_parts)
+
+    from langchain.prompts import ChatPromptTemplate
+
+    prompt_template = """You are a helpful logistics assistant. Use ONLY the document excerpts below to answer the question.
+
+Rules:
+- Answer using ONLY the information in the excerpts.
+- Quote exact numbers, names, codes, and dates where possible.
+- If the excerpts do not contain the answer, say exactly: "I could not find that information in the provided documents."
+- Be concise and clear.
+
+Document excerpts:
+----------------
+{context}
+----------------
+
+Question: {question}"""
+
+    prompt   = ChatPromptTemplate.from_messages([("human", prompt_template)])
+    messages = prompt.format_messages(context=context, question=question)
+    response = invoke_llm(messages)
+
+    return {
+        "answer": response.content,
+        "sources": sources if include_sources else []
+    }
+
+
+def condense_question(session: Session, question: str) -> str:
+    """Rewrite a follow-up ("and for reefers?") as a standalone question for retrieval."""
+    if not session.turns and not session.summary:
+        return question
+
+    from langchain.prompts import ChatPromptTemplate
+
+    prompt_template = """Given the conversation below and a follow-up question, rewrite the follow-up as a single standalone question that can be understood without the conversation.
+Keep every number, code, name and date it refers to. If it is already standalone, return it unchanged.
+Reply with the question only.
+
+Conversation:
+{history}
+
+Follow-up question: {question}"""
+
+    prompt   = ChatPromptTemplate.from_messages([("human", prompt_template)])
+    messages = prompt.format_messages(history=session.transcript(), question=question)
+    return invoke_llm(messages).content.strip() or question
+
+
+def summarize_session(session: Session):
+    """Fold all but the last session_turns turns into the session's rolling summary."""
+    settings = current()
+    keep = settings.session_turns
+    if len(session.turns) <= keep:
+        return
+    old, session.turns = session.turns[:-keep], session.turns[-keep:]
+
+    from langchain.prompts import ChatPromptTemplate
+
+    prompt_template = """Update the summary of a conversation about logistics documents with the new exchanges below.
+Keep the documents, shipments, identifiers and figures discussed, drop small talk. At most 150 words.
+
+Current summary:
+{summary}
+
+New exchanges:
+{exchanges}
+
+Updated summary:"""
+
+    prompt   = ChatPromptTemplate.from_messages([("human", prompt_template)])
+    messages = prompt.format_messages(
+        summary=session.summary or "(none)", exchanges=Session.format_turns(old)
+    )
+    try:
+        session.summary = invoke_llm(messages).content.strip()[:settings.summary_chars]
+    except Exception as e:
+        # The answer is already made; losing a little context beats failing the request.
+        print(f"Warning: Could not summarize session: {e}")
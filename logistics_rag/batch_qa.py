@@ -0,0 +1,78 @@
+"""
+batch_qa.py - Batched question answering shared by /chat/batch and the CLI
+
+A batch is answered in two phases:
+  plan_batch  - deduplicate questions, embed the unique ones in batched calls
+                and run all vector searches in a single store query
+  run_batch   - fan the LLM calls out over a bounded thread pool and yield
+                one result per input question as each answer completes
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List
+
+from .vector_search import search_by_vectors
+
+EMBED_BATCH = 100   # texts per embedding request (API limit)
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+
+def embed_questions(embeddings, questions: List[str], batch_size: int = EMBED_BATCH) -> List[List[float]]:
+    """`embeddings` is the query client (clients.get_query_embeddings), so the vectors match /chat's."""
+    vectors = []
+    for start in range(0, len(questions), batch_size):
+        vectors.extend(embeddings.embed_documents(questions[start:start + batch_size]))
+    return vectors
+
+
+@dataclass
+class BatchPlan:
+    questions: List[str]                 # as submitted
+    groups: Dict[str, List[int]]         # normalized question -> input positions
+    contexts: Dict[str, list]            # normalized question -> retrieved Documents
+
+
+def plan_batch(questions: List[str], vectorstore, embeddings, k: int) -> BatchPlan:
+    groups: Dict[str, List[int]] = {}
+    for i, question in enumerate(questions):
+        groups.setdefault(normalize_question(question), []).append(i)
+
+    keys = list(groups)
+    representatives = [questions[groups[key][0]].strip() for key in keys]
+    hits = search_by_vectors(vectorstore, embed_questions(embeddings, representatives), k)
+
+    # Chunks retrieved by several questions are held once and shared.
+    shared = {}
+    contexts = {
+        key: [shared.setdefault(cid, doc) for cid, doc in row]
+        for key, row in zip(keys, hits)
+    }
+    return BatchPlan(questions=questions, groups=groups, contexts=contexts)
+
+
+def run_batch(plan: BatchPlan, answer_fn: Callable[[str, list], dict], max_workers: int) -> Iterator[dict]:
+    """
+    Yield {"index", "question", **answer_fn(...)} for every input question in
+    completion order; a failed answer yields {"index", "question", "error"}.
+    """
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-qa")
+    try:
+        futures = {
+            pool.submit(answer_fn, plan.questions[positions[0]].strip(), plan.contexts[key]): key
+            for key, positions in plan.groups.items()
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                payload = future.result()
+            except Exception as e:
+                payload = {"error": str(e)}
+            for i in plan.groups[key]:
+                yield {"index": i, "question": plan.questions[i], **payload}
+    finally:
+        # A disconnected client closes the generator; drop the work it no longer wants.
+        pool.shutdown(wait=False, cancel_futures=True)
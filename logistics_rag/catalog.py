@@ -0,0 +1,188 @@
+"""
+catalog.py - Persistent document catalog (SQLite)
+
+One row per ingested PDF, so listing, deleting and rebuilding never have to
+glob data/raw or stat files. A monotonically increasing version number is
+bumped on every write and doubles as the ETag for /documents. A separate
+index generation is bumped by whichever worker last wrote to the vector
+store, so the other workers know to reopen it.
+"""
+import json
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    filename          TEXT PRIMARY KEY,
+    sha256            TEXT NOT NULL,
+    size_bytes        INTEGER NOT NULL,
+    page_count        INTEGER NOT NULL DEFAULT 0,
+    chunk_count       INTEGER NOT NULL DEFAULT 0,
+    chunk_ids         TEXT NOT NULL DEFAULT '[]',
+    ingested_at       TEXT NOT NULL,
+    is_logistics      INTEGER,
+    classifier_reason TEXT,
+    mtime_ns          INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_documents_sha256 ON documents (sha256);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0');
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0');
+"""
+
+COLUMNS = (
+    "filename, sha256, size_bytes, page_count, chunk_count, chunk_ids, "
+    "ingested_at, is_logistics, classifier_reason, mtime_ns"
+)
+
+
+@dataclass
+class DocumentRecord:
+    filename: str
+    sha256: str
+    size_bytes: int
+    page_count: int = 0
+    chunk_count: int = 0
+    chunk_ids: List[str] = field(default_factory=list)
+    ingested_at: str = ""
+    is_logistics: Optional[bool] = None
+    classifier_reason: Optional[str] = None
+    mtime_ns: int = 0   # file mtime when indexed; 0 = unknown, directory sync hashes it once
+
+    @classmethod
+    def from_row(cls, row) -> "DocumentRecord":
+        return cls(
+            filename=row[0],
+            sha256=row[1],
+            size_bytes=row[2],
+            page_count=row[3],
+            chunk_count=row[4],
+            chunk_ids=json.loads(row[5]),
+            ingested_at=row[6],
+            is_logistics=None if row[7] is None else bool(row[7]),
+            classifier_reason=row[8],
+            mtime_ns=row[9],
+        )
+
+    def summary(self) -> dict:
+        """The public view served by /documents (chunk IDs stay internal)."""
+        return {
+            "filename": self.filename,
+            "size_kb": round(self.size_bytes / 1024, 2),
+            "pages": self.page_count,
+            "chunks": self.chunk_count,
+            "ingested_at": self.ingested_at,
+            "sha256": self.sha256,
+            "classifier_reason": self.classifier_reason,
+        }
+
+
+class DocumentCatalog:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+            if "mtime_ns" not in columns:   # catalogs created before directory sync
+                conn.execute("ALTER TABLE documents ADD COLUMN mtime_ns INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _bump(conn):
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+
+    # ── reads ──────────────────────────────────
+    def version(self) -> int:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0])
+
+    def generation(self) -> int:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0])
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def get(self, filename: str) -> Optional[DocumentRecord]:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {COLUMNS} FROM documents WHERE filename = ?", (filename,)
+            ).fetchone()
+        return DocumentRecord.from_row(row) if row else None
+
+    def list(self, offset: int = 0, limit: Optional[int] = None) -> List[DocumentRecord]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {COLUMNS} FROM documents ORDER BY filename LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        return [DocumentRecord.from_row(r) for r in rows]
+
+    def page(self, offset: int, limit: int) -> Tuple[int, List[DocumentRecord]]:
+        """Total row count plus one page, read in a single transaction."""
+        with self._connect() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {COLUMNS} FROM documents ORDER BY filename LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return total, [DocumentRecord.from_row(r) for r in rows]
+
+    def last_ingest_at(self) -> Optional[str]:
+        with self._connect() as conn:
+            return conn.execute("SELECT MAX(ingested_at) FROM documents").fetchone()[0]
+
+    # ── writes ─────────────────────────────────
+    def upsert(self, record: DocumentRecord):
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO documents ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.filename,
+                    record.sha256,
+                    record.size_bytes,
+                    record.page_count,
+                    record.chunk_count,
+                    json.dumps(record.chunk_ids),
+                    record.ingested_at,
+                    None if record.is_logistics is None else int(record.is_logistics),
+                    record.classifier_reason,
+                    record.mtime_ns,
+                ),
+            )
+            self._bump(conn)
+
+    def bump_generation(self) -> int:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'"
+            )
+            row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0])
+
+    def remove(self, filename: str) -> bool:
+        with self._connect() as conn:
+            cur = conn.execute("DELETE FROM documents WHERE filename = ?", (filename,))
+            if cur.rowcount:
+                self._bump(conn)
+            return cur.rowcount > 0
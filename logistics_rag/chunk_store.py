@@ -0,0 +1,153 @@
+"""
+chunk_store.py - Append-only, memory-mapped chunk text store
+
+    chunks.seg   concatenated records: UTF-8 text, then the metadata as JSON
+    chunks.idx   one fixed-width (offset, text_len, meta_len) entry per row
+    chunks.ids   one chunk ID per line, row-aligned with chunks.idx
+
+The in-process vector indexes keep only IDs and vectors and address chunks
+by row number. Text and metadata stay in the mapped segment file and are
+decoded only for the rows a query returns, so a corpus's text lives in the
+OS page cache instead of the Python heap.
+
+An append writes the segment, then the IDs, then the index entries; the
+entry count in chunks.idx is the commit point. Opening a store maps the
+committed rows and writes nothing, so readers may open it while a writer
+appends. Anything past the commit point is cut off by recover(), which only
+the writer calls, under the tenant's write lock, before it appends.
+"""
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+SEGMENT_FILE = "chunks.seg"
+INDEX_FILE   = "chunks.idx"
+IDS_FILE     = "chunks.ids"
+ENTRY        = np.dtype([("offset", "<u8"), ("text_len", "<u4"), ("meta_len", "<u4")])
+
+
+def _end(entries: np.ndarray) -> int:
+    """Segment bytes used by these entries."""
+    if not len(entries):
+        return 0
+    offset, text_len, meta_len = entries[-1]
+    return int(offset + text_len + meta_len)
+
+
+def _write_ids(path: Path, ids: List[str]):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.writelines(f"{cid}\n" for cid in ids)
+    os.replace(tmp, path)
+
+
+class ChunkView:
+    """Read-only snapshot of a ChunkStore; stays valid across later appends."""
+
+    def __init__(self, ids: List[str], entries: np.ndarray, segment):
+        self.ids = ids
+        self._entries = entries
+        self._segment = segment
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def text(self, row: int) -> str:
+        offset, text_len, _ = self._entries[row]
+        return str(memoryview(self._segment)[offset:offset + text_len], "utf-8")
+
+    def metadata(self, row: int) -> dict:
+        offset, text_len, meta_len = self._entries[row]
+        start = offset + text_len
+        return json.loads(memoryview(self._segment)[start:start + meta_len].tobytes())
+
+    def document(self, row: int):
+        from langchain_core.documents import Document
+
+        return Document(page_content=self.text(row), metadata=self.metadata(row))
+
+
+class ChunkStore:
+    def __init__(self, path: Path, rows: Optional[int] = None):
+        """Map the committed rows, at most `rows` of them (the caller's own commit point)."""
+        self.path = Path(path)
+        self._ids: List[str] = []
+        committed = 0
+        if (self.path / INDEX_FILE).exists():
+            committed = (self.path / INDEX_FILE).stat().st_size // ENTRY.itemsize
+            if rows is not None:
+                committed = min(committed, rows)
+            with open(self.path / IDS_FILE, encoding="utf-8") as f:
+                self._ids = f.read().splitlines()[:committed]   # IDs are written before their index entries
+        self._map(committed)
+
+    # ── storage ────────────────────────────────
+    def _map(self, rows: int):
+        entries = np.memmap(self.path / INDEX_FILE, dtype=ENTRY, mode="r", shape=(rows,)) if rows else \
+            np.empty(0, dtype=ENTRY)
+        end = _end(entries)
+        segment = b""
+        if end:
+            with open(self.path / SEGMENT_FILE, "rb") as f:   # only the committed bytes: a writer may cut the rest
+                segment = mmap.mmap(f.fileno(), end, access=mmap.ACCESS_READ)
+        self._view = ChunkView(self._ids, entries, segment)
+
+    def view(self) -> ChunkView:
+        return self._view
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    @property
+    def ids(self) -> List[str]:
+        return self._ids
+
+    def recover(self, rows: Optional[int] = None):
+        """
+        Create the files if missing and cut them back to the committed rows (at
+        most `rows`), dropping whatever an append that died left behind.
+        Callers hold the tenant's write lock.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name in (SEGMENT_FILE, INDEX_FILE, IDS_FILE):
+            (self.path / name).touch()
+        committed = (self.path / INDEX_FILE).stat().st_size // ENTRY.itemsize
+        if rows is not None:
+            committed = min(committed, rows)
+        if (self.path / INDEX_FILE).stat().st_size > committed * ENTRY.itemsize:
+            os.truncate(self.path / INDEX_FILE, committed * ENTRY.itemsize)
+        with open(self.path / IDS_FILE, encoding="utf-8") as f:
+            self._ids = f.read().splitlines()
+        if len(self._ids) > committed:
+            del self._ids[committed:]
+            _write_ids(self.path / IDS_FILE, self._ids)
+        self._map(committed)
+        end = _end(self._view._entries)
+        if (self.path / SEGMENT_FILE).stat().st_size > end:
+            os.truncate(self.path / SEGMENT_FILE, end)
+
+    def append(self, ids: List[str], texts: List[str], metadatas: List[dict]) -> int:
+        """Append chunks and return the row number of the first one. Runs after recover() on a store in use."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        first = len(self)
+        offset = _end(self._view._entries)
+        entries = np.empty(len(ids), dtype=ENTRY)
+        with open(self.path / SEGMENT_FILE, "ab") as f:
+            for i, (text, meta) in enumerate(zip(texts, metadatas)):
+                text_bytes = text.encode("utf-8")
+                meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+                f.write(text_bytes)
+                f.write(meta_bytes)
+                entries[i] = (offset, len(text_bytes), len(meta_bytes))
+                offset += len(text_bytes) + len(meta_bytes)
+        with open(self.path / IDS_FILE, "a", encoding="utf-8") as f:
+            f.writelines(f"{cid}\n" for cid in ids)
+        with open(self.path / INDEX_FILE, "ab") as f:
+            f.write(entries.tobytes())
+        self._ids.extend(ids)
+        self._map(first + len(ids))
+        return first
@@ -0,0 +1,115 @@
+"""
+chunking.py - Standard and parent-child chunking of PDF pages
+
+"standard" splits pages into CHUNK_SIZE chunks with overlap; each chunk is
+both what is searched and what goes in the prompt. "parent" splits each page
+into non-overlapping parent sections, then each parent into small child
+chunks. Only the children are embedded, so retrieval matches on a few
+sentences. A hit is expanded to its parent for the prompt, and children of
+the same parent share one context:
+
+    child metadata: {"source", "page", "parent": <row in the document's ParentStore entry>}
+
+ParentStore keeps each document's parents in its own ChunkStore directory,
+memory-mapped, so parent text stays off the Python heap like chunk text does.
+"""
+import hashlib
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+from .chunk_store import ChunkStore, ChunkView
+
+
+def split_pages(pages, mode: str, chunk_size: int, chunk_overlap: int,
+                parent_size: int, child_size: int, child_overlap: int) -> Tuple[list, list]:
+    """(chunks to embed, parent sections); there are no parents in standard mode."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    separators = ["\n\n", "\n", ".", " ", ""]
+    if mode == "standard":
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=separators
+        )
+        return splitter.split_documents(pages), []
+    if mode != "parent":
+        raise ValueError(f"Unknown CHUNKING mode {mode!r}; expected 'standard' or 'parent'")
+
+    parent_splitter = RecursiveCharacterTextSplitter(chunk_size=parent_size, chunk_overlap=0, separators=separators)
+    child_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=child_size, chunk_overlap=child_overlap, separators=separators
+    )
+    parents = parent_splitter.split_documents(pages)
+    children = []
+    for row, parent in enumerate(parents):
+        for child in child_splitter.split_documents([parent]):
+            child.metadata["parent"] = row
+            children.append(child)
+    return children, parents
+
+
+class ParentStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._views: Dict[str, ChunkView] = {}   # source -> mapped parents, dropped when the directory changes
+
+    def _dir(self, source: str) -> Path:
+        return self.path / hashlib.sha1(source.encode("utf-8")).hexdigest()[:20]
+
+    def put(self, source: str, parents: list):
+        """Replace `source`'s parent Documents. Callers hold the tenant's write lock."""
+        self.remove(source)
+        if not parents:
+            return
+        tmp = self.path / (self._dir(source).name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        ChunkStore(tmp).append(
+            [str(row) for row in range(len(parents))],
+            [p.page_content for p in parents],
+            [p.metadata for p in parents],
+        )
+        tmp.rename(self._dir(source))
+        self._stamp = None
+
+    def remove(self, source: str):
+        shutil.rmtree(self._dir(source), ignore_errors=True)   # open maps stay readable until dropped
+        self._stamp = None
+
+    def _view(self, source: str):
+        try:
+            stamp = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if stamp != self._stamp:
+                self._views, self._stamp = {}, stamp
+            if source not in self._views:
+                try:
+                    self._views[source] = ChunkStore(self._dir(source)).view()   # empty if it has no parents
+                except FileNotFoundError:
+                    self._views[source] = None   # removed while being opened
+            return self._views[source]
+
+    def expand(self, docs, limit: int) -> list:
+        """
+        Replace child hits by their parents, best hit first, each parent once,
+        at most `limit` of them. Chunks without a parent (standard mode, or a
+        parent that has since gone) are kept as they are.
+        """
+        expanded, seen = [], set()
+        for doc in docs:
+            source, parent = doc.metadata.get("source"), doc.metadata.get("parent")
+            if parent is not None:
+                if (source, parent) in seen:
+                    continue
+                seen.add((source, parent))
+                view = self._view(source)
+                if view is not None and int(parent) < len(view):
+                    doc = view.document(int(parent))
+            expanded.append(doc)
+            if len(expanded) == limit:
+                break
+        return expanded
@@ -0,0 +1,88 @@
+"""
+clients.py - Lazily created Gemini clients
+
+langchain and the Google GenAI SDK are imported on first use: importing them
+at module load costs seconds of cold start per worker. Every chat model call
+goes through invoke_llm. use_clients swaps in other clients, such as the
+evaluation harness's embedding cache and local LLM stand-in (evaluation.py).
+"""
+import threading
+
+from .admission import call_with_backoff
+from .config import EMBED_MODEL, GEMINI_MODEL, LLM_CONCURRENCY, current
+
+_embeddings       = None
+_query_embeddings = None
+_llm              = None
+_init_lock  = threading.RLock()
+llm_slots   = threading.BoundedSemaphore(LLM_CONCURRENCY)
+
+
+def make_embeddings():
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model=EMBED_MODEL)
+
+
+def make_query_embeddings():
+    """Embeds a batch of questions in one call with the task type embed_query uses."""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model=EMBED_MODEL, task_type="retrieval_query")
+
+
+def make_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model=GEMINI_MODEL,
+        temperature=0,
+        convert_system_message_to_human=True,
+        max_retries=1,   # invoke_llm retries with jitter (older releases ignore this)
+    )
+
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        with _init_lock:
+            if _embeddings is None:
+                _embeddings = make_embeddings()
+    return _embeddings
+
+
+def get_query_embeddings():
+    global _query_embeddings
+    if _query_embeddings is None:
+        with _init_lock:
+            if _query_embeddings is None:
+                _query_embeddings = make_query_embeddings()
+    return _query_embeddings
+
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        with _init_lock:
+            if _llm is None:
+                _llm = make_llm()
+    return _llm
+
+
+def use_clients(embeddings=None, llm=None, query_embeddings=None):
+    """
+    Use these instead of the Gemini clients from now on; None keeps the current
+    one. query_embeddings.embed_documents must return what embeddings.embed_query
+    would; it defaults to `embeddings`, which is right for clients without task types.
+    """
+    global _embeddings, _query_embeddings, _llm
+    with _init_lock:
+        _embeddings       = embeddings or _embeddings
+        _query_embeddings = query_embeddings or embeddings or _query_embeddings
+        _llm              = llm or _llm
+
+
+def invoke_llm(messages):
+    """Every Gemini call goes through here: bounded concurrency, jittered retries on quota errors."""
+    def call():
+        with llm_slots:
+            return get_llm().invoke(messages)
+    settings = current()
+    return call_with_backoff(call, settings.llm_retries, settings.llm_backoff_base, settings.llm_backoff_cap)
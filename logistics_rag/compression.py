@@ -0,0 +1,108 @@
+"""
+compression.py - Extractive compression of retrieved context
+
+A chunk is retrieved whole even when one sentence in it answers the question,
+so the prompt carries mostly unrelated text. compress_docs splits the excerpts
+into sentences and scores each against the question:
+
+    lexical    share of the question's words (IDF-weighted over the excerpts) in the sentence
+    semantic   cosine similarity of sentence and question embeddings, scaled to 0-1
+               over the excerpts; one batched embedding call for all sentences
+
+score = (1 - weight) * lexical + weight * semantic. Sentences repeated in
+overlapping chunks count once. The best are kept until they hold `ratio` of
+the characters of all distinct sentences, then put back in their excerpt in
+document order, so each keeps its file and page citation. Excerpts left with
+no sentence are dropped.
+"""
+import math
+import re
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+from .batch_qa import embed_questions
+from .vector_search import normalize_rows
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD_RE     = re.compile(r"[a-z0-9]+")
+STOPWORDS   = frozenset("""
+    the and for are was were what which who how much many from with this that does did
+    is in of to a an on at by be it as or per our your there their any can all
+""".split())
+GAP = " ... "   # between kept sentences that were not adjacent
+
+
+def content_words(text: str) -> List[str]:
+    return [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in SENTENCE_RE.split(text) if s.strip()]
+
+
+def lexical_scores(question: str, sentences: List[str]) -> np.ndarray:
+    asked = set(content_words(question))
+    words = [set(content_words(s)) for s in sentences]
+    if not asked:
+        return np.zeros(len(sentences))
+    df = Counter(w for ws in words for w in ws & asked)
+    idf = {w: math.log(1 + len(sentences) / (1 + df[w])) for w in asked}
+    total = sum(idf.values())
+    return np.array([sum(idf[w] for w in ws & asked) / total for ws in words])
+
+
+def semantic_scores(question: str, sentences: List[str], embeddings) -> np.ndarray:
+    query   = normalize_rows(embeddings.embed_query(question))
+    vectors = normalize_rows(embed_questions(embeddings, sentences))
+    sims    = vectors @ query
+    spread  = sims.max() - sims.min()
+    return (sims - sims.min()) / spread if spread > 0 else np.zeros(len(sentences))
+
+
+def compress_docs(question: str, docs, ratio: float, weight: float, embeddings=None):
+    """The docs cut down to their best sentences, about `ratio` of their characters; docs as they are if ratio >= 1."""
+    if ratio >= 1 or not docs:
+        return docs
+    from langchain_core.documents import Document
+
+    sentences, where = [], {}   # unique sentence text -> its first (doc, position)
+    per_doc = []
+    for d, doc in enumerate(docs):
+        parts = split_sentences(doc.page_content)
+        per_doc.append(parts)
+        for p, sentence in enumerate(parts):
+            if sentence not in where:
+                where[sentence] = (d, p)
+                sentences.append(sentence)
+    if not sentences:
+        return docs
+
+    scores = lexical_scores(question, sentences)
+    if weight > 0 and embeddings is not None:
+        try:
+            scores = (1 - weight) * scores + weight * semantic_scores(question, sentences, embeddings)
+        except Exception as e:
+            # Lexical scores alone still compress well; an embedding outage must not fail the answer.
+            print(f"Warning: Compressing on lexical scores only, embedding failed: {e}")
+
+    budget = ratio * sum(len(s) for s in sentences)
+    kept, used = set(), 0
+    for i in np.argsort(-scores, kind="stable"):
+        size = len(sentences[i])
+        if kept and used + size > budget:
+            continue
+        kept.add(where[sentences[i]])
+        used += size
+
+    compressed = []
+    for d, doc in enumerate(docs):
+        positions = sorted(p for dd, p in kept if dd == d)
+        if not positions:
+            continue
+        text = per_doc[d][positions[0]]
+        for prev, p in zip(positions, positions[1:]):
+            text += (" " if p == prev + 1 else GAP) + per_doc[d][p]
+        compressed.append(Document(page_content=text, metadata=doc.metadata))
+    return compressed
@@ -0,0 +1,298 @@
+"""
+config.py - Typed settings shared by the API (app.py) and the CLI (src/main.py)
+
+Settings are read at startup from, in increasing priority: the defaults in
+Settings, environment variables (or .env) named after each field in upper
+case (TOP_K, VECTOR_BACKEND, ...), and data/settings.json (SETTINGS_FILE).
+
+Structural settings shape data on disk or objects built at startup (paths,
+models, chunking, index backend, pool sizes). They are bound to the module
+constants at the bottom and take a restart to change. Tunable settings are
+read through current() whenever they are used: when settings.json changes,
+every worker applies the new values within SETTINGS_CHECK seconds. A request
+reads them once, when it starts, so a reload never changes one in flight.
+"""
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from .tenants import TenantLimits
+
+load_dotenv()
+
+PROJECT_ROOT   = Path(__file__).parent.parent
+SETTINGS_FILE  = Path(os.getenv("SETTINGS_FILE", str(PROJECT_ROOT / "data" / "settings.json")))
+SETTINGS_CHECK = 1.0   # seconds between checks of SETTINGS_FILE for changes
+
+
+def setting(default, tunable: bool = False):
+    return field(default=default, metadata={"tunable": tunable})
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Paths and models
+    data_dir: Path       = setting(PROJECT_ROOT / "data")
+    index_dir: Path      = setting(PROJECT_ROOT / "chroma_db")   # versioned index dirs + CURRENT pointer
+    collection: str      = setting("logistics_docs")
+    gemini_model: str    = setting("models/gemini-2.5-flash")
+    embed_model: str     = setting("models/gemini-embedding-001")
+    admin_token: str     = setting("")   # enables /admin/settings; empty = disabled
+
+    # "standard" embeds chunk_size chunks and prompts with them. "parent" embeds
+    # small child chunks and prompts with the parent sections they were cut from.
+    # A new mode applies to existing documents after a rebuild.
+    chunking: str            = setting("standard")
+    chunk_size: int          = setting(1000)
+    chunk_overlap: int       = setting(200)
+    parent_chunk_size: int   = setting(2000)   # non-overlapping sections sent to the LLM
+    child_chunk_size: int    = setting(300)    # what is embedded and searched
+    child_chunk_overlap: int = setting(50)
+
+    # "chroma", "flat" (exact in-process NumPy index, faster below ~100k chunks)
+    # or "hnsw" (approximate hnswlib index for millions of chunks). Switching
+    # backends takes effect after a rebuild.
+    vector_backend: str        = setting("chroma")
+    flat_index_dtype: str      = setting("float32")   # float16 halves memory
+    hnsw_m: int                = setting(16)          # graph degree, fixed at build
+    hnsw_ef_construction: int  = setting(200)         # build-time recall, fixed at build
+    hnsw_ef_search: int        = setting(64)          # query-time recall vs latency
+
+    # Retrieval; /chat and /chat/batch can override top_k, candidates, context_tokens
+    # and compression per request
+    top_k: int          = setting(5, tunable=True)   # excerpts per prompt
+    candidates: int     = setting(0, tunable=True)   # chunks fetched before deduplication and the budget; 0 = top_k
+    context_tokens: int = setting(0, tunable=True)   # prompt context budget (~4 characters a token); 0 = no limit
+    max_parents: int    = setting(3, tunable=True)   # parent sections per prompt with chunking=parent
+    # Extractive compression (compression.py): keep the excerpt sentences closest to the
+    # question, about this share of the excerpts' characters; 1 = send excerpts whole
+    compression: float        = setting(1.0, tunable=True)
+    compression_weight: float = setting(0.5, tunable=True)   # embedding share of a sentence's score; 0 = lexical only
+
+    batch_workers: int = setting(8, tunable=True)       # concurrent LLM calls per batch (/chat/batch, `main.py query`)
+    max_batch: int     = setting(10000, tunable=True)   # questions accepted per /chat/batch request
+
+    # PDF parsers, tried in order on pages that are still empty (see pdf_parsing.py).
+    # OCR runs in its own process pool and needs pytesseract, pillow and tesseract.
+    pdf_parsers: str      = setting("pypdf,ocr")
+    ocr_workers: int      = setting(2)
+    ocr_page_timeout: int = setting(60)   # seconds per page
+
+    # Tenants other than "default" live under data/tenants. Limits are defaults,
+    # overridable per tenant in data/tenants.json (see tenants.py).
+    max_loaded_tenants: int    = setting(32)    # open tenant indexes per worker
+    tenant_max_documents: int  = setting(0)     # 0 = unlimited
+    tenant_max_chunks: int     = setting(0)
+    tenant_rate_limit: float   = setting(120)   # requests per minute, per worker
+    tenant_burst: int          = setting(20)
+
+    # Admission control per worker. Queued /chat requests hold a threadpool thread,
+    # so keep chat_concurrency + chat_queue under its size (40).
+    chat_concurrency: int    = setting(16)   # /chat and /chat/batch requests served at once
+    chat_queue: int          = setting(16)   # requests waiting for a slot before 429s
+    client_concurrency: int  = setting(4)    # per client (X-Client-ID header, else IP)
+    queue_timeout: float     = setting(30)   # seconds a queued request waits for a slot
+    llm_concurrency: int     = setting(16)   # Gemini calls in flight, all endpoints
+    llm_retries: int         = setting(4, tunable=True)      # retries of a call that hit a quota error
+    llm_backoff_base: float  = setting(1.0, tunable=True)    # seconds; the delay ceiling doubles per retry
+    llm_backoff_cap: float   = setting(30.0, tunable=True)
+    write_timeout: float     = setting(600, tunable=True)    # seconds a writer waits for another worker's write
+
+    # Conversation sessions (/chat with a session_id), kept in memory per worker
+    session_ttl: int    = setting(1800)                # seconds idle before a session is dropped
+    max_sessions: int   = setting(10000)               # least recently used go first beyond this
+    session_turns: int  = setting(4, tunable=True)     # recent turns kept verbatim; older ones fold into the summary
+    summary_chars: int  = setting(1200, tunable=True)  # hard cap on a session's rolling summary
+
+    # Directory sync (POST /sync, `main.py sync`). With sync_watch_interval set, every
+    # API worker also polls data/raw and syncs the default tenant once the folder has
+    # been quiet for sync_debounce seconds; the write lock makes concurrent syncs safe.
+    sync_watch_interval: float = setting(0.0)   # seconds between polls, 0 = off
+    sync_debounce: float       = setting(5.0)
+
+    def __post_init__(self):
+        for f in fields(self):
+            if f.type in (int, float) and getattr(self, f.name) < 0:
+                raise ValueError(f"{f.name} must not be negative")
+        for name in ("top_k", "max_parents", "batch_workers", "max_batch", "chunk_size", "child_chunk_size"):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} must be at least 1")
+        if not 0 < self.compression <= 1 or self.compression_weight > 1:
+            raise ValueError("compression must be in (0, 1] and compression_weight in [0, 1]")
+        if self.chunking not in ("standard", "parent"):
+            raise ValueError(f"chunking must be 'standard' or 'parent', not {self.chunking!r}")
+        if self.vector_backend not in ("chroma", "flat", "hnsw"):
+            raise ValueError(f"vector_backend must be 'chroma', 'flat' or 'hnsw', not {self.vector_backend!r}")
+
+    def public(self) -> Dict[str, Any]:
+        """Every setting except the admin token, JSON-ready."""
+        values = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if f.name != "admin_token":
+                values[f.name] = str(value) if isinstance(value, Path) else value
+        return values
+
+
+TUNABLE = tuple(f.name for f in fields(Settings) if f.metadata["tunable"])
+
+
+def _coerce(f, value):
+    try:
+        return f.type(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid value for {f.name}: {value!r}") from None
+
+
+def _read_file(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    values = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(values, dict):
+        raise ValueError(f"{path} must hold a JSON object")
+    return values
+
+
+def load_settings(path: Path = SETTINGS_FILE) -> Settings:
+    known = {f.name: f for f in fields(Settings)}
+    values = {}
+    for f in known.values():
+        raw = os.getenv(f.name.upper())
+        if raw is not None:
+            values[f.name] = _coerce(f, raw)
+    for name, raw in _read_file(path).items():
+        if name not in known:
+            print(f"Warning: Unknown setting {name!r} in {path}")
+            continue
+        values[name] = _coerce(known[name], raw)
+    return Settings(**values)
+
+
+def _file_stamp() -> Optional[int]:
+    try:
+        return SETTINGS_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+_settings = load_settings()
+_stamp    = _file_stamp()
+_checked  = time.monotonic()
+_lock     = threading.Lock()
+
+
+def current() -> Settings:
+    """The live settings; picks up changes to SETTINGS_FILE made by any process."""
+    global _checked
+    if time.monotonic() - _checked >= SETTINGS_CHECK:
+        _checked = time.monotonic()
+        if _file_stamp() != _stamp:
+            try:
+                reload()
+            except (OSError, ValueError) as e:
+                print(f"Warning: Kept the current settings, {SETTINGS_FILE} is invalid: {e}")
+    return _settings
+
+
+def reload() -> Dict[str, Any]:
+    """Re-read the settings. Tunable changes apply at once; structural ones are reported and wait for a restart."""
+    global _settings, _stamp
+    with _lock:
+        _stamp = _file_stamp()   # a broken file is reported once, not on every check
+        new = load_settings()
+        changed, restart = {}, []
+        for f in fields(Settings):
+            value = getattr(new, f.name)
+            if value == getattr(_settings, f.name):
+                continue
+            if f.metadata["tunable"]:
+                changed[f.name] = value
+            else:
+                restart.append(f.name)
+        _settings = replace(_settings, **changed)
+    if changed:
+        print(f"Settings reloaded: {changed}")
+    if restart:
+        print(f"Warning: Settings changed that need a restart: {', '.join(restart)}")
+    return {"changed": changed, "restart_required": restart}
+
+
+def update(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Store tunable `values` in SETTINGS_FILE and apply them; other workers follow within SETTINGS_CHECK."""
+    not_tunable = sorted(set(values) - set(TUNABLE))
+    if not_tunable:
+        raise ValueError(f"Not tunable at runtime: {', '.join(not_tunable)}")
+    known = {f.name: f for f in fields(Settings)}
+    with _lock:
+        replace(_settings, **{name: _coerce(known[name], v) for name, v in values.items()})   # validate first
+        stored = {**_read_file(SETTINGS_FILE), **values}
+        SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = SETTINGS_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(stored, indent=2), encoding="utf-8")
+        os.replace(tmp, SETTINGS_FILE)
+    return reload()
+
+
+# ─────────────────────────────────────────────
+# STRUCTURAL SETTINGS (fixed for the life of the process)
+# ─────────────────────────────────────────────
+RAW_DATA_DIR  = _settings.data_dir / "raw"
+CHROMA_DB_DIR = _settings.index_dir
+CATALOG_PATH  = _settings.data_dir / "catalog.db"
+WRITE_LOCK    = _settings.data_dir / "index.lock"
+TABLES_DIR    = _settings.data_dir / "tables"     # rate table rows extracted at ingest
+ENTITIES_DIR  = _settings.data_dir / "entities"   # identifier -> chunk ID postings
+PARENTS_DIR   = _settings.data_dir / "parents"    # parent sections when CHUNKING=parent
+TENANTS_DIR   = _settings.data_dir / "tenants"
+COLLECTION    = _settings.collection
+GEMINI_MODEL  = _settings.gemini_model
+EMBED_MODEL   = _settings.embed_model
+ADMIN_TOKEN   = _settings.admin_token
+
+CHUNKING            = _settings.chunking
+CHUNK_SIZE          = _settings.chunk_size
+CHUNK_OVERLAP       = _settings.chunk_overlap
+PARENT_CHUNK_SIZE   = _settings.parent_chunk_size
+CHILD_CHUNK_SIZE    = _settings.child_chunk_size
+CHILD_CHUNK_OVERLAP = _settings.child_chunk_overlap
+
+VECTOR_BACKEND       = _settings.vector_backend
+FLAT_DTYPE           = _settings.flat_index_dtype
+HNSW_M               = _settings.hnsw_m
+HNSW_EF_CONSTRUCTION = _settings.hnsw_ef_construction
+HNSW_EF_SEARCH       = _settings.hnsw_ef_search
+
+PDF_PARSERS      = _settings.pdf_parsers
+OCR_WORKERS      = _settings.ocr_workers
+OCR_PAGE_TIMEOUT = _settings.ocr_page_timeout
+
+MAX_LOADED_TENANTS = _settings.max_loaded_tenants
+TENANT_LIMITS      = TenantLimits(
+    max_documents=_settings.tenant_max_documents or None,
+    max_chunks=_settings.tenant_max_chunks or None,
+    requests_per_minute=_settings.tenant_rate_limit,
+    burst=_settings.tenant_burst,
+)
+
+CHAT_CONCURRENCY   = _settings.chat_concurrency
+CHAT_QUEUE         = _settings.chat_queue
+CLIENT_CONCURRENCY = _settings.client_concurrency
+QUEUE_TIMEOUT      = _settings.queue_timeout
+LLM_CONCURRENCY    = _settings.llm_concurrency
+
+SESSION_TTL   = _settings.session_ttl
+MAX_SESSIONS  = _settings.max_sessions
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+SYNC_WATCH_INTERVAL = _settings.sync_watch_interval
+SYNC_DEBOUNCE       = _settings.sync_debounce
+SYNC_REASON         = "Added by directory sync."
+
+RAW_DATA_DIR.mkdir(parents=True, exist_ok=True)
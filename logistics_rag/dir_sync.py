@@ -0,0 +1,112 @@
+"""
+dir_sync.py - Incremental sync of a raw PDF directory with the document catalog
+
+plan_sync compares the PDFs in a directory with their catalog records. A file
+whose size and mtime match its record is taken as unchanged without reading
+it; any other file is hashed, and only a different SHA-256 makes it count as
+changed. Catalogued files that are gone from the directory are removed:
+
+    added      on disk, not in the catalog
+    changed    in the catalog, different content
+    touched    in the catalog, same content, new mtime (only the record is refreshed)
+    removed    in the catalog, no longer on disk
+
+DirectoryWatcher polls the directory and calls back once its listing has stayed
+the same for `debounce` seconds, so a file that is still being copied is not
+picked up half-written.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+
+def pdf_files(raw_dir: Path) -> Dict[str, Path]:
+    """{filename: path} of the PDFs in `raw_dir`; dot-files are upload staging copies."""
+    if not raw_dir.exists():
+        return {}
+    return {
+        p.name: p for p in raw_dir.iterdir()
+        if p.suffix.lower() == ".pdf" and not p.name.startswith(".") and p.is_file()
+    }
+
+
+def snapshot(raw_dir: Path) -> Dict[str, Tuple[int, int]]:
+    """{filename: (size, mtime_ns)}; a PDF that vanishes mid-listing is left out."""
+    listing = {}
+    for name, path in pdf_files(raw_dir).items():
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        listing[name] = (st.st_size, st.st_mtime_ns)
+    return listing
+
+
+@dataclass
+class SyncPlan:
+    added:     List[Tuple[Path, str]] = field(default_factory=list)   # (path, sha256)
+    changed:   List[Tuple[Path, str]] = field(default_factory=list)
+    touched:   List[Tuple[Path, int]] = field(default_factory=list)   # (path, mtime_ns)
+    removed:   List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.touched or self.removed)
+
+
+def plan_sync(raw_dir: Path, records, hasher: Callable[[Path], str]) -> SyncPlan:
+    """Diff `raw_dir` against catalog `records`, hashing only files whose size or mtime moved."""
+    catalogued = {r.filename: r for r in records}
+    plan = SyncPlan()
+    for name, (size, mtime_ns) in sorted(snapshot(raw_dir).items()):
+        path, record = raw_dir / name, catalogued.pop(name, None)
+        if record and record.size_bytes == size and record.mtime_ns == mtime_ns:
+            plan.unchanged += 1
+            continue
+        try:
+            digest = hasher(path)
+        except FileNotFoundError:
+            continue
+        if record is None:
+            plan.added.append((path, digest))
+        elif record.sha256 != digest:
+            plan.changed.append((path, digest))
+        else:
+            plan.touched.append((path, mtime_ns))
+    plan.removed = sorted(catalogued)
+    return plan
+
+
+class DirectoryWatcher:
+    def __init__(self, raw_dir: Path, interval: float, debounce: float, on_change: Callable[[], None]):
+        self.raw_dir   = Path(raw_dir)
+        self.interval  = interval
+        self.debounce  = debounce
+        self.on_change = on_change
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="raw-dir-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        synced = None   # None: sync once at start, whatever the listing
+        seen, since = None, 0.0
+        while not self._stop.wait(self.interval):
+            listing = snapshot(self.raw_dir)
+            if listing != seen:
+                seen, since = listing, time.monotonic()
+            if listing == synced or time.monotonic() - since < self.debounce:
+                continue
+            try:
+                self.on_change()
+                synced = listing
+            except Exception as e:
+                print(f"Directory sync of {self.raw_dir} failed: {e}")
+                seen = None   # retry after another quiet period
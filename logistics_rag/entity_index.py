@@ -0,0 +1,178 @@
+"""
+entity_index.py - Inverted index of logistics identifiers
+
+Dense search and generic splitting do not guarantee that "status of container
+MSCU1234566" retrieves the one chunk that mentions MSCU1234566. At ingest,
+extract_entities pulls identifiers out of every chunk:
+
+    CONTAINER:MSCU1234566   ISO 6346 container numbers, upper case with a valid check digit
+    BOL:88421               bill of lading numbers (after "B/L", "BOL", "bill of lading")
+    AWB:17612345675         air waybill numbers (after "AWB", or ddd-dddddddd with a valid check digit)
+    HS:84051000, HS:8405    HS codes (after "HS" / "HTS"), plus their 4- and 6-digit headings
+    LOCODE:CNSHA            UN/LOCODEs with a known country prefix, after a cue ("port", "POL", "from", ...)
+    INCOTERM:FOB            Incoterms
+
+EntityIndex keeps one JSON file of {entity: [chunk_id, ...]} per document and
+merges them into a dict in memory, so a question's identifiers resolve to
+chunk IDs in O(1) each.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+CONTAINER_RE = re.compile(r"\b([A-Z]{3}[UJZ])[\s-]?(\d{6})[\s-]?(\d)\b")
+BOL_RE       = re.compile(
+    r"\b(?:B/L|BOL|bill of lading)\s*(?:no\.?|number|#)?\s*[:#]?\s*([A-Z0-9][A-Z0-9-]{3,19})\b", re.IGNORECASE
+)
+AWB_RE       = re.compile(r"\b(?:[MH]?AWB|air\s?waybill)\s*(?:no\.?|number|#)?\s*[:#]?\s*(\d{3})[\s-]?(\d{4})\s?(\d{4})\b",
+                          re.IGNORECASE)
+BARE_AWB_RE  = re.compile(r"\b(\d{3})-(\d{8})\b")
+HS_RE        = re.compile(r"\b(?:HS|HTS|H\.S\.)\s*(?:code|no\.?|heading)?\s*[:#]?\s*(\d{4}(?:[.\s]?\d{2}){0,3})\b",
+                          re.IGNORECASE)
+LOCODE_RE    = re.compile(r"\b([A-Z]{2})([A-Z2-9]{3})\b")
+# A port word up to two words before a LOCODE: "POL: CNSHA", "port of loading CNSHA", "from CNSHA".
+# Five capitals alone are too often a word ("CARGO", "CHINA").
+LOCODE_CUE   = re.compile(
+    r"\b(?:port|pol|pod|locode|origin|destination|loading|discharge|delivery|via|from|to|at|"
+    r"arriv\w*|depart\w*|trans?ship\w*)(?:\W+\w+){0,2}?\W+$",
+    re.IGNORECASE,
+)
+CUE_WINDOW   = 40   # characters before a LOCODE searched for its cue
+INCOTERM_RE  = re.compile(r"\b(EXW|FCA|FAS|FOB|CFR|CIF|CPT|CIP|DAP|DPU|DDP|DAT)\b")
+
+# ISO 3166-1 alpha-2, for telling UN/LOCODEs from other five-letter capitals.
+COUNTRIES = set("""
+AD AE AF AG AI AL AM AO AQ AR AS AT AU AW AX AZ BA BB BD BE BF BG BH BI BJ BL BM BN BO BQ BR BS BT BV BW BY BZ
+CA CC CD CF CG CH CI CK CL CM CN CO CR CU CV CW CX CY CZ DE DJ DK DM DO DZ EC EE EG EH ER ES ET FI FJ FK FM FO
+FR GA GB GD GE GF GG GH GI GL GM GN GP GQ GR GS GT GU GW GY HK HM HN HR HT HU ID IE IL IM IN IO IQ IR IS IT JE
+JM JO JP KE KG KH KI KM KN KP KR KW KY KZ LA LB LC LI LK LR LS LT LU LV LY MA MC MD ME MF MG MH MK ML MM MN MO
+MP MQ MR MS MT MU MV MW MX MY MZ NA NC NE NF NG NI NL NO NP NR NU NZ OM PA PE PF PG PH PK PL PM PN PR PS PT PW
+PY QA RE RO RS RU RW SA SB SC SD SE SG SH SI SJ SK SL SM SN SO SR SS ST SV SX SY SZ TC TD TF TG TH TJ TK TL TM
+TN TO TR TT TV TW TZ UA UG UM US UY UZ VA VC VE VG VI VN VU WF WS YE YT ZA ZM ZW
+""".split())
+
+# ISO 6346 letter values: A=10 upwards, skipping multiples of 11.
+LETTER_VALUES = dict(zip("ABCDEFGHIJKLMNOPQRSTUVWXYZ", [v for v in range(10, 39) if v % 11][:26]))
+
+# Types specific enough that a hit beats dense search; the others only rank alongside them.
+SPECIFIC = ("CONTAINER", "BOL", "AWB", "HS")
+
+
+def container_check_digit(code: str) -> int:
+    """ISO 6346 check digit of the first ten characters (owner, category, serial)."""
+    total = sum((LETTER_VALUES[c] if c.isalpha() else int(c)) << i for i, c in enumerate(code[:10]))
+    return total % 11 % 10
+
+
+def entities_in(text: str) -> List[str]:
+    """Every identifier in `text`, normalized to TYPE:VALUE keys, without duplicates."""
+    found = []
+    for owner, serial, check in CONTAINER_RE.findall(text):
+        if container_check_digit(owner + serial) == int(check):
+            found.append(f"CONTAINER:{owner}{serial}{check}")
+    for number in BOL_RE.findall(text):
+        if any(c.isdigit() for c in number):
+            found.append(f"BOL:{number.upper()}")
+    for parts in AWB_RE.findall(text):
+        found.append("AWB:" + "".join(parts))
+    for prefix, serial in BARE_AWB_RE.findall(text):
+        if int(serial[:7]) % 7 == int(serial[7]):
+            found.append(f"AWB:{prefix}{serial}")
+    for code in HS_RE.findall(text):
+        digits = re.sub(r"\D", "", code)
+        found.extend(f"HS:{digits[:n]}" for n in (4, 6, 8, 10) if n <= len(digits))
+    for match in LOCODE_RE.finditer(text):
+        country, place = match.groups()
+        if country in COUNTRIES and LOCODE_CUE.search(text, max(match.start() - CUE_WINDOW, 0), match.start()):
+            found.append(f"LOCODE:{country}{place}")
+    found.extend(f"INCOTERM:{term}" for term in INCOTERM_RE.findall(text))
+    return list(dict.fromkeys(found))
+
+
+def question_entities(question: str) -> List[str]:
+    """
+    entities_in for a question. People type identifiers in lower case
+    ("mscu1234566"), so the specific types are also read from the upper-cased
+    question; port codes and Incoterms are not, "to china" is no LOCODE.
+    """
+    typed = [e for e in entities_in(question.upper()) if e.split(":", 1)[0] in SPECIFIC]
+    return list(dict.fromkeys(entities_in(question) + typed))
+
+
+def extract_entities(chunks, ids: List[str]) -> Dict[str, List[str]]:
+    """{entity: [chunk_id, ...]} for one document's chunks."""
+    postings: Dict[str, List[str]] = {}
+    for chunk, chunk_id in zip(chunks, ids):
+        for entity in entities_in(chunk.page_content):
+            postings.setdefault(entity, []).append(chunk_id)
+    return postings
+
+
+class EntityIndex:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._postings: Dict[str, List[str]] = {}
+
+    def _file(self, source: str) -> Path:
+        return self.path / (hashlib.sha1(source.encode("utf-8")).hexdigest()[:20] + ".json")
+
+    def put(self, source: str, postings: Dict[str, List[str]]):
+        """Replace `source`'s postings. Callers hold the tenant's write lock."""
+        if not postings:
+            self.remove(source)
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        target = self._file(source)
+        tmp = target.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"source": source, "postings": postings}), encoding="utf-8")
+        os.replace(tmp, target)
+        self._stamp = None
+
+    def remove(self, source: str):
+        self._file(source).unlink(missing_ok=True)
+        self._stamp = None
+
+    def _load(self) -> Dict[str, List[str]]:
+        """Merged postings; re-read only when another write changed the directory."""
+        try:
+            stamp = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if stamp != self._stamp:
+                merged: Dict[str, List[str]] = {}
+                for path in sorted(self.path.glob("*.json")):
+                    for entity, chunk_ids in json.loads(path.read_text(encoding="utf-8"))["postings"].items():
+                        merged.setdefault(entity, []).extend(chunk_ids)
+                self._postings, self._stamp = merged, stamp
+            return self._postings
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def lookup(self, question: str, k: int) -> List[str]:
+        """
+        Up to k chunk IDs for the identifiers in `question`, rarest matches
+        first. Empty unless at least one specific identifier (container, BOL,
+        AWB, HS code) is indexed: a bare port code or Incoterm is too common
+        to replace dense search.
+        """
+        entities = question_entities(question)
+        if not entities:
+            return []
+        postings = self._load()
+        hits = {e: postings[e] for e in entities if e in postings}
+        if not any(e.split(":", 1)[0] in SPECIFIC for e in hits):
+            return []
+
+        scores: Dict[str, float] = {}
+        for chunk_ids in hits.values():
+            for chunk_id in chunk_ids:
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / len(chunk_ids)
+        return sorted(scores, key=scores.get, reverse=True)[:k]
@@ -0,0 +1,323 @@
+"""
+evaluation.py - Answer quality and latency over a golden question set
+
+A golden set is a JSONL file, one question per line:
+
+    {"id": "sha-rtm-rate", "question": "Rate from Shanghai to Rotterdam for 120 kg?",
+     "sources": [{"filename": "rates_2024.pdf", "page": 0}], "numbers": ["2.95"]}
+
+`sources` are where the answer is written (the page as the API reports it, or
+left out for any page) and `numbers` the figures a correct answer states.
+Either may be empty. run_golden answers each question with get_answer, as
+/chat does, and score_run sums the results up:
+
+    hit_rate   questions with an expected source among the excerpts given to the LLM
+    mrr        mean of 1 / rank of the first expected source (0 for a miss)
+    exact      questions whose answer states every expected number
+    tokens     prompt + answer tokens per question (rate table answers cost none)
+    latency    p50 / p95 wall time per question
+
+To run offline, CachedEmbeddings keeps every vector in SQLite by model and
+text, so a corpus and golden set embedded once replay without the API, and
+ExtractiveLLM stands in for Gemini by answering with the context sentence that
+shares most words with the question. HashingEmbeddings needs no API at all,
+for checking the harness itself. benchmarks/eval_golden.py runs and compares
+evaluations.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .answering import get_answer
+from .compression import content_words, split_sentences
+from .retrieval import CHARS_PER_TOKEN, RetrievalParams
+from .tenants import Tenant
+
+NUMBER_RE  = re.compile(r"\d[\d,]*(?:\.\d+)?")
+EXCERPT_RE = re.compile(r"^\[Excerpt \d+ \|.*\]$", re.MULTILINE)
+
+# Summary metrics: (name, True if higher is better)
+METRICS = (
+    ("hit_rate", True),
+    ("mrr", True),
+    ("exact_match", True),
+    ("tokens_per_answer", False),
+    ("latency_p50_ms", False),
+    ("latency_p95_ms", False),
+)
+
+
+# ─────────────────────────────────────────────
+# GOLDEN SET AND SCORING
+# ─────────────────────────────────────────────
+@dataclass
+class GoldenQuestion:
+    id: str
+    question: str
+    sources: List[dict] = field(default_factory=list)   # {"filename", optional "page"}
+    numbers: List[str]  = field(default_factory=list)
+
+
+def load_golden(path: Path) -> List[GoldenQuestion]:
+    questions, ids = [], set()
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                sources = [{"filename": s} if isinstance(s, str) else dict(s) for s in item.get("sources", [])]
+                question = GoldenQuestion(
+                    id=str(item.get("id") or f"q{line_no}"),
+                    question=item["question"].strip(),
+                    sources=sources,
+                    numbers=[str(n) for n in item.get("numbers", [])],
+                )
+                if not question.question or any("filename" not in s for s in sources):
+                    raise ValueError("needs a question, and a filename for every source")
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                raise ValueError(f"{path}:{line_no}: invalid golden question: {e}") from None
+            if question.id in ids:
+                raise ValueError(f"{path}:{line_no}: duplicate id {question.id!r}")
+            ids.add(question.id)
+            questions.append(question)
+    if not questions:
+        raise ValueError(f"{path} has no questions")
+    return questions
+
+
+def numeric_values(text: str) -> set:
+    """The numbers in `text`, so that "1,250.00" and "1250" compare equal."""
+    return {Decimal(n.replace(",", "")).normalize() for n in NUMBER_RE.findall(text)}
+
+
+def numbers_match(answer: str, expected: List[str]) -> bool:
+    return numeric_values(" ".join(expected)) <= numeric_values(answer)
+
+
+def source_rank(sources: List[dict], expected: List[dict]) -> int:
+    """1-based rank of the first source that is an expected one, 0 if none is."""
+    for rank, source in enumerate(sources, 1):
+        for want in expected:
+            if source["filename"] == want["filename"] and (
+                want.get("page") is None or str(source["page"]) == str(want["page"])
+            ):
+                return rank
+    return 0
+
+
+def run_golden(tenant: Tenant, questions: List[GoldenQuestion], params: RetrievalParams,
+               meter: "MeteredLLM") -> List[dict]:
+    """Answer each question in turn, one result per question."""
+    results = []
+    for q in questions:
+        meter.reset()
+        error = None
+        start = time.perf_counter()
+        try:
+            answer = get_answer(tenant, q.question, params=params)
+        except Exception as e:
+            answer, error = {"answer": "", "sources": []}, str(e)
+        latency = time.perf_counter() - start
+        sources = [{"filename": s["filename"], "page": s["page"]} for s in answer["sources"]]
+        results.append({
+            "id": q.id,
+            "question": q.question,
+            "answer": answer["answer"],
+            "sources": sources,
+            "rank": source_rank(sources, q.sources) if q.sources else None,
+            "exact": numbers_match(answer["answer"], q.numbers) if q.numbers else None,
+            "tokens": meter.tokens,
+            "latency_ms": round(latency * 1000, 1),
+            "error": error,
+        })
+    return results
+
+
+def score_run(results: List[dict]) -> Dict[str, Optional[float]]:
+    ranks   = [r["rank"] for r in results if r["rank"] is not None]
+    exact   = [r["exact"] for r in results if r["exact"] is not None]
+    latency = [r["latency_ms"] for r in results]
+
+    def mean(values):
+        return round(sum(values) / len(values), 4) if values else None
+
+    return {
+        "questions": len(results),
+        "errors": sum(1 for r in results if r["error"]),
+        "hit_rate": mean([1.0 if rank else 0.0 for rank in ranks]),
+        "mrr": mean([1 / rank if rank else 0.0 for rank in ranks]),
+        "exact_match": mean([1.0 if e else 0.0 for e in exact]),
+        "tokens_per_answer": round(sum(r["tokens"] for r in results) / len(results), 1),
+        "latency_p50_ms": round(float(np.percentile(latency, 50)), 1),
+        "latency_p95_ms": round(float(np.percentile(latency, 95)), 1),
+    }
+
+
+def regressions(baseline: dict, run: dict, tolerance: float = 0.1) -> List[str]:
+    """
+    Metrics of `run` worse than `baseline`: any drop in a quality metric, or
+    tokens and latency more than `tolerance` (a fraction) above it.
+    """
+    worse = []
+    for name, higher_is_better in METRICS:
+        old, new = baseline["summary"].get(name), run["summary"].get(name)
+        if old is None or new is None:
+            continue
+        if higher_is_better and new < old:
+            worse.append(f"{name} {old} -> {new}")
+        elif not higher_is_better and new > old * (1 + tolerance):
+            worse.append(f"{name} {old} -> {new}")
+    return worse
+
+
+def changed_questions(baseline: dict, run: dict) -> List[str]:
+    """Questions that found their source or number in one run and not the other."""
+    before = {r["id"]: r for r in baseline["questions"]}
+    lines = []
+    for r in run["questions"]:
+        old = before.get(r["id"])
+        if old is None:
+            continue
+        if bool(old["rank"]) != bool(r["rank"]) and r["rank"] is not None:
+            lines.append(f"{r['id']}: source {'found' if r['rank'] else 'lost'} "
+                         f"(rank {old['rank'] or '-'} -> {r['rank'] or '-'})")
+        if old["exact"] != r["exact"] and r["exact"] is not None:
+            lines.append(f"{r['id']}: numbers {'right' if r['exact'] else 'wrong'} now")
+    return lines
+
+
+# ─────────────────────────────────────────────
+# OFFLINE CLIENTS
+# ─────────────────────────────────────────────
+class CachedEmbeddings:
+    """
+    Read-through SQLite cache in front of an embeddings client. Vectors are
+    stored as float32 and always returned from the stored copy, so a replay
+    sees exactly what the first run saw. With no client (`factory` None) a
+    text that is not cached is an error instead of an API call.
+    """
+
+    def __init__(self, path: Path, model: str, factory: Optional[Callable] = None, kind: str = "document"):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path     = path
+        self.model    = model
+        self.kind     = kind   # what embed_documents embeds: "query" in front of clients.make_query_embeddings
+        self._factory = factory
+        self._client  = None
+        self._lock    = threading.Lock()
+        self._db      = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self.hits = self.misses = 0
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _embed(self, kind: str, texts: List[str], embed: Callable) -> List[List[float]]:
+        keys = [self._key(kind, text) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                found.update(self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ))
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            if self._factory is None:
+                raise LookupError(f"{len(missing)} text(s) are not in the embedding cache {self.path}; "
+                                  f"run once online to fill it")
+            if self._client is None:
+                self._client = self._factory()
+            vectors = embed([texts[i] for i in missing])
+            with self._lock, self._db:
+                for i, vector in zip(missing, vectors):
+                    found[keys[i]] = np.asarray(vector, dtype=np.float32).tobytes()
+                    self._db.execute("INSERT OR REPLACE INTO embeddings VALUES (?, ?)", (keys[i], found[keys[i]]))
+        return [np.frombuffer(found[key], dtype=np.float32).tolist() for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(self.kind, list(texts), lambda todo: self._client.embed_documents(todo))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed("query", [text], lambda todo: [self._client.embed_query(todo[0])])[0]
+
+
+class HashingEmbeddings:
+    """Hashed bag-of-words vectors: no API and no cache, but only lexical matches."""
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in content_words(text):
+            h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dim] += 1.0 if h >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+class ExtractiveLLM:
+    """
+    Local stand-in for Gemini on the answer prompt: replies with the context
+    sentence sharing most words with the question, or the prompt's "could not
+    find" line when none shares any. Numbers in that sentence are what the
+    exact-match metric checks, so it measures whether retrieval put the fact
+    in front of the model rather than how well a model reads.
+    """
+    NOT_FOUND = "I could not find that information in the provided documents."
+
+    def invoke(self, messages, *args, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        prompt = "\n".join(m.content for m in messages)
+        head, _, question = prompt.rpartition("Question:")
+        parts = head.split("----------------")
+        context = EXCERPT_RE.sub("", parts[1] if len(parts) >= 3 else head)
+
+        asked = set(content_words(question))
+        best, best_score = self.NOT_FOUND, 0
+        for sentence in split_sentences(context):
+            score = len(asked & set(content_words(sentence)))
+            if score > best_score:
+                best, best_score = sentence.strip(), score
+        return AIMessage(content=best)
+
+
+class MeteredLLM:
+    """Wraps a chat model to count the tokens of the calls made by each thread."""
+
+    def __init__(self, llm):
+        self.llm    = llm
+        self._local = threading.local()
+
+    def reset(self):
+        self._local.tokens = 0
+
+    @property
+    def tokens(self) -> int:
+        return getattr(self._local, "tokens", 0)
+
+    def invoke(self, messages, *args, **kwargs):
+        response = self.llm.invoke(messages, *args, **kwargs)
+        usage = getattr(response, "usage_metadata", None) or {}
+        tokens = usage.get("total_tokens") or (
+            (sum(len(m.content) for m in messages) + len(response.content)) // CHARS_PER_TOKEN
+        )
+        self._local.tokens = self.tokens + tokens
+        return response
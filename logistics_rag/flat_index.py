@@ -0,0 +1,263 @@
+"""
+flat_index.py - In-process exact vector index on a memory-mapped NumPy matrix
+
+For corpora up to ~100k chunks a brute-force normalized dot product over a
+contiguous float32 (or float16) matrix is faster than a Chroma round trip and
+needs no server or HNSW graph. Files in the index directory:
+
+    flat_index.json         dim, dtype, row count and the live data directory
+    data-NNNNNN/
+      flat_vectors.bin      row-major matrix, appended on add, memory-mapped on read
+      flat_deleted.json     tombstoned row numbers
+      chunks.*              chunk IDs, text and metadata per row (chunk_store.py)
+
+Deletes only tombstone rows; once more than COMPACT_RATIO of the rows are
+dead, compaction copies the live rows into the next data directory and
+points flat_index.json at it with one atomic rename. A crash before that
+leaves the old directory in use, so vectors, rows and tombstones always
+belong together.
+"""
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from .chunk_store import ChunkStore
+from .vector_search import normalize_rows, select_top_k
+
+META_FILE     = "flat_index.json"
+VECTORS_FILE  = "flat_vectors.bin"
+DELETED_FILE  = "flat_deleted.json"
+COMPACT_RATIO = 0.25
+ROW_BLOCK     = 65536   # rows scored per matmul, bounds the float32 upcast of float16 storage
+
+
+class FlatVectorStore(VectorStore):
+    def __init__(self, path: Path, embedding, dtype: str = "float32", recover: bool = False):
+        self.path = Path(path)
+        self._embedding = embedding
+        self._lock = threading.RLock()
+        self._new_dtype = dtype
+        self._load()
+        if recover:
+            self.recover()
+
+    def _read_meta(self) -> dict:
+        if (self.path / META_FILE).exists():
+            return json.loads((self.path / META_FILE).read_text(encoding="utf-8"))
+        return {"dim": None, "dtype": self._new_dtype, "rows": 0, "data": "data-000000"}
+
+    def _load(self):
+        """Map the committed rows. Writes nothing, so readers can open while a writer appends."""
+        meta = self._read_meta()
+        self._dim   = meta["dim"]
+        self._dtype = np.dtype(meta["dtype"])
+        self._data  = self.path / meta["data"]
+        self._chunks = ChunkStore(self._data, rows=meta["rows"])
+
+        self._deleted = set()
+        if (self._data / DELETED_FILE).exists():
+            self._deleted = set(json.loads((self._data / DELETED_FILE).read_text(encoding="utf-8")))
+        self._row_of = {cid: row for row, cid in enumerate(self._chunks.ids) if row not in self._deleted}
+        self._remap()
+
+    def recover(self):
+        """
+        Cut the files back to the committed row count, dropping what an add
+        that died left behind, reloading first if another worker committed
+        since this store was opened. Callers hold the tenant's write lock.
+        """
+        with self._lock:
+            meta = self._read_meta()
+            if meta["rows"] != len(self._chunks) or meta["data"] != self._data.name:
+                self._load()
+            rows = len(self._chunks)
+            self._chunks.recover(rows)
+            vectors = self._data / VECTORS_FILE
+            if self._dim and vectors.exists() and vectors.stat().st_size > rows * self._dim * self._dtype.itemsize:
+                os.truncate(vectors, rows * self._dim * self._dtype.itemsize)
+
+    # ── storage ────────────────────────────────
+    def _remap(self):
+        rows = len(self._chunks)
+        if rows and self._dim:
+            self._matrix = np.memmap(
+                self._data / VECTORS_FILE, dtype=self._dtype, mode="r", shape=(rows, self._dim)
+            )
+        else:
+            self._matrix = np.empty((0, self._dim or 0), dtype=self._dtype)
+        alive = np.ones(rows, dtype=bool)
+        if self._deleted:
+            alive[list(self._deleted)] = False
+        self._alive = alive
+
+    def _write_meta(self):
+        meta = {"dim": self._dim, "dtype": self._dtype.name, "rows": len(self._chunks), "data": self._data.name}
+        tmp = self.path / f"{META_FILE}.tmp"
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, self.path / META_FILE)
+
+    def _write_deleted(self):
+        (self._data / DELETED_FILE).write_text(json.dumps(sorted(self._deleted)), encoding="utf-8")
+
+    def add_vectors(self, ids: List[str], vectors, texts: List[str], metadatas: List[dict]) -> List[str]:
+        """Append pre-computed vectors. Re-adding an existing ID replaces it."""
+        matrix = normalize_rows(vectors).astype(self._dtype)
+        with self._lock:
+            if self._dim is None:
+                self._dim = matrix.shape[1]
+            elif matrix.shape[1] != self._dim:
+                raise ValueError(f"Vector dimension {matrix.shape[1]} does not match index dimension {self._dim}")
+
+            replaced = [self._row_of[cid] for cid in ids if cid in self._row_of]
+            if replaced:
+                self._deleted.update(replaced)
+                self._write_deleted()
+
+            first = self._chunks.append(ids, texts, metadatas)
+            with open(self._data / VECTORS_FILE, "ab") as f:
+                f.write(matrix.tobytes())
+            self._row_of.update({cid: first + i for i, cid in enumerate(ids)})
+            self._write_meta()   # the row count in meta is the commit point
+            self._remap()
+        return list(ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> None:
+        with self._lock:
+            rows = [self._row_of.pop(cid) for cid in ids or [] if cid in self._row_of]
+            self._tombstone(rows)
+
+    def delete_where(self, where: dict):
+        """Tombstone every row whose metadata matches all key/value pairs in `where`."""
+        with self._lock:
+            chunks = self._chunks.view()
+            rows = []
+            for cid, row in list(self._row_of.items()):
+                meta = chunks.metadata(row)
+                if all(meta.get(key) == value for key, value in where.items()):
+                    rows.append(row)
+                    del self._row_of[cid]
+            self._tombstone(rows)
+
+    def _tombstone(self, rows: List[int]):
+        if not rows:
+            return
+        self._deleted.update(rows)
+        self._write_deleted()
+        self._remap()
+        if len(self._deleted) > COMPACT_RATIO * len(self._chunks):
+            self.compact()
+
+    def compact(self):
+        """Copy the live rows into the next data directory and switch to it."""
+        with self._lock:
+            keep = np.flatnonzero(self._alive)
+            old = self._chunks.view()
+            target = self.path / f"data-{int(self._data.name.split('-')[1]) + 1:06d}"
+            for stale in self.path.glob("data-*"):
+                if stale != self._data:
+                    shutil.rmtree(stale)   # left by a compaction that died before switching
+
+            chunks = ChunkStore(target)
+            chunks.append([old.ids[r] for r in keep], [old.text(r) for r in keep], [old.metadata(r) for r in keep])
+            with open(target / VECTORS_FILE, "wb") as f:
+                for start in range(0, len(keep), ROW_BLOCK):
+                    f.write(np.asarray(self._matrix[keep[start:start + ROW_BLOCK]]).tobytes())
+            (target / DELETED_FILE).write_text("[]", encoding="utf-8")
+
+            previous = self._data
+            self._data, self._chunks, self._deleted = target, chunks, set()
+            self._row_of = {cid: row for row, cid in enumerate(chunks.ids)}
+            self._write_meta()   # the switch
+            self._remap()
+            shutil.rmtree(previous, ignore_errors=True)   # open maps of it stay readable
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    # ── search ─────────────────────────────────
+    def _scores(self, queries: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        if matrix.dtype == np.float32:
+            return queries @ matrix.T
+        sims = np.empty((len(queries), len(matrix)), dtype=np.float32)
+        for start in range(0, len(matrix), ROW_BLOCK):
+            block = np.asarray(matrix[start:start + ROW_BLOCK], dtype=np.float32)
+            sims[:, start:start + ROW_BLOCK] = queries @ block.T
+        return sims
+
+    def search_by_vectors(self, vectors, k: int):
+        """Top-k (chunk_id, Document) pairs for each query vector, scored in one pass."""
+        with self._lock:   # a consistent snapshot; add() only appends, compact() swaps in new objects
+            matrix, alive, chunks = self._matrix, self._alive, self._chunks.view()
+        queries = normalize_rows(np.atleast_2d(vectors))
+        if not len(matrix):
+            return [[] for _ in queries]
+
+        sims = self._scores(queries, matrix)
+        if not alive.all():
+            sims[:, ~alive] = -np.inf
+        indices, scores = select_top_k(sims, k)
+        return [
+            [
+                (chunks.ids[i], chunks.document(i))
+                for i, s in zip(row_idx, row_scores) if np.isfinite(s)
+            ]
+            for row_idx, row_scores in zip(indices, scores)
+        ]
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """Documents of the chunk IDs that are still indexed, in the order asked."""
+        with self._lock:
+            rows = [self._row_of.get(cid) for cid in ids]
+            chunks = self._chunks.view()
+        return [chunks.document(row) for row in rows if row is not None]
+
+    # ── langchain VectorStore interface ────────
+    @classmethod
+    def exists(cls, path: Path) -> bool:
+        return (Path(path) / META_FILE).exists()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if ids is None:
+            import uuid
+            ids = [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        return self.add_vectors(ids, self._embedding.embed_documents(texts), texts, metadatas)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for _, doc in self.search_by_vectors([embedding], k)[0]]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        path: Optional[Path] = None,
+        dtype: str = "float32",
+        **kwargs: Any,
+    ) -> "FlatVectorStore":
+        store = cls(path, embedding, dtype=dtype, recover=True)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,83 @@
+"""
+index_versions.py - Versioned index directories with an atomic active pointer
+
+    chroma_db/
+        CURRENT        <- name of the active version, swapped with os.replace
+        gen-000001/
+        gen-000002/
+
+Rebuilds write into a fresh gen-NNNNNN directory while queries keep using the
+active one; only a complete build is activated. Superseded versions are
+removed later by collect_garbage, keeping the most recent ones around so
+workers still reading them are not cut off mid-query.
+"""
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+POINTER = "CURRENT"
+PREFIX  = "gen-"
+
+
+class IndexVersions:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _versions(self):
+        if not self.root.exists():
+            return []
+        return sorted(p for p in self.root.iterdir() if p.is_dir() and p.name.startswith(PREFIX))
+
+    def active_dir(self) -> Optional[Path]:
+        pointer = self.root / POINTER
+        try:
+            name = pointer.read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+        path = self.root / name
+        return path if path.is_dir() else None
+
+    def new_dir(self) -> Path:
+        """An empty directory for the next version. Call with the write lock held."""
+        versions = self._versions()
+        number = int(versions[-1].name[len(PREFIX):]) + 1 if versions else 1
+        path = self.root / f"{PREFIX}{number:06d}"
+        path.mkdir(parents=True)
+        return path
+
+    def activate(self, path: Path):
+        """Point CURRENT at `path`. Readers see either the old or the new name, never a partial write."""
+        tmp = self.root / f"{POINTER}.tmp"
+        tmp.write_text(Path(path).name, encoding="utf-8")
+        os.replace(tmp, self.root / POINTER)
+
+    def collect_garbage(self, keep_previous: int = 1):
+        """Delete superseded versions, sparing the active one and the `keep_previous` newest others."""
+        active = self.active_dir()
+        inactive = [p for p in self._versions() if p != active]
+        doomed = inactive[:-keep_previous] if keep_previous else inactive
+        for path in doomed:
+            try:
+                shutil.rmtree(path)
+                print(f"  Removed superseded index {path.name}")
+            except OSError as e:
+                # Usually a Windows file lock held by a reader; retried on the next collection.
+                print(f"Warning: Could not remove {path}: {e}")
+
+    def discard(self, path: Path):
+        shutil.rmtree(path, ignore_errors=True)
+
+    def migrate_legacy(self) -> Optional[Path]:
+        """
+        Move a pre-versioning store (chroma.sqlite3 directly under the root)
+        into the first version directory and activate it.
+        """
+        if (self.root / POINTER).exists() or not (self.root / "chroma.sqlite3").exists():
+            return None
+        target = self.new_dir()
+        for entry in list(self.root.iterdir()):
+            if entry != target and not entry.name.startswith(PREFIX):
+                os.replace(entry, target / entry.name)
+        self.activate(target)
+        return target
@@ -0,0 +1,499 @@
+"""
+ingest.py - Ingestion pipeline: parse, classify, chunk, embed, index
+
+Every path that changes a tenant's index lives here: single-file ingest
+(uploads and `main.py ingest`), directory sync, full rebuilds and removals.
+Each keeps the catalog, vector store and side indexes (rate tables,
+identifiers, parent sections) in step, under the tenant's write lock.
+"""
+import hashlib
+import json
+import os
+import re
+from dataclasses import replace
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from .catalog import DocumentRecord
+from .chunking import split_pages
+from .clients import invoke_llm
+from .config import (
+    CHILD_CHUNK_OVERLAP, CHILD_CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_SIZE, CHUNKING, OCR_PAGE_TIMEOUT, OCR_WORKERS,
+    PARENT_CHUNK_SIZE, PDF_PARSERS, SYNC_REASON,
+)
+from .dir_sync import plan_sync
+from .entity_index import extract_entities
+from .pdf_parsing import ParserChain
+from .rate_tables import extract_rate_rows
+from .store import (
+    build_vectorstore, count_vectors, current_vectorstore, delete_where_source, forget_chroma_client,
+    index_writer, refresh_stats,
+)
+from .tenants import Tenant
+
+LOGISTICS_KEYWORDS = [
+    "shipment", "freight", "cargo", "transport", "delivery", "logistics",
+    "warehouse", "inventory", "supply chain", "shipping", "dispatch",
+    "consignment", "bill of lading", "customs", "import", "export",
+    "carrier", "route", "fleet", "tracking", "order fulfillment",
+    "distribution", "container", "pallets", "last mile", "3pl", "forwarder"
+]
+
+MAX_FILENAME_BYTES = 240   # filesystems allow 255; the staging copy adds ".<name>.part"
+
+pdf_parser = ParserChain([p.strip() for p in PDF_PARSERS.split(",") if p.strip()], OCR_WORKERS, OCR_PAGE_TIMEOUT)
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_ids(filename: str, sha256: str, count: int) -> List[str]:
+    # Keyed on name + content so identical files under two names never collide.
+    key = hashlib.sha256(f"{filename}\0{sha256}".encode()).hexdigest()[:16]
+    return [f"{key}-{i:05d}" for i in range(count)]
+
+
+def backfill_catalog(tenant: Tenant):
+    """One-time import of PDFs that were ingested before the catalog existed."""
+    if tenant.catalog.count():
+        return
+    for pdf_path in tenant.raw_dir.glob("*.pdf"):
+        st = pdf_path.stat()
+        tenant.catalog.upsert(DocumentRecord(
+            filename=pdf_path.name,
+            sha256=file_sha256(pdf_path),
+            size_bytes=st.st_size,
+            mtime_ns=st.st_mtime_ns,
+            ingested_at=datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat(timespec="seconds"),
+            is_logistics=True,
+            classifier_reason="Indexed before the document catalog existed.",
+        ))
+        print(f"  Catalogued existing document {pdf_path.name}")
+
+
+def prepare_tenant(tenant: Tenant):
+    """Move a pre-versioning store into place and catalogue the PDFs it was built from."""
+    with tenant.write_lock:
+        if tenant.versions.migrate_legacy():
+            print("Moved the existing vector store into a versioned index directory")
+            tenant.catalog.bump_generation()
+        if tenant.versions.active_dir() is not None:
+            backfill_catalog(tenant)   # without an index, data/raw is left to /sync
+
+
+def load_pdf_pages(pdf_path: Path):
+    """One Document per page through the parser chain (text layer first, OCR for pages without one)."""
+    return pdf_parser.parse(pdf_path)
+
+
+def is_logistics_document(pdf_path: Path, pages=None):
+    """
+    Classify whether a PDF is logistics/transport related.
+    Returns (is_logistics: bool, reason: str).
+    """
+    try:
+        pages = pages if pages is not None else load_pdf_pages(pdf_path)
+
+        sample_text = "\n\n".join(
+            p.page_content for p in pages[:3] if p.page_content.strip()
+        )[:3000]
+
+        if not sample_text.strip():
+            return False, "The PDF appears to be empty or unreadable."
+
+        lowered = sample_text.lower()
+        keyword_hits = [kw for kw in LOGISTICS_KEYWORDS if kw in lowered]
+
+        classification_prompt = f"""You are a document classifier. Analyze the following text from a PDF and determine if it is related to logistics, transportation, supply chain, shipping, freight, or related domains.
+
+Text sample:
+\"\"\"
+{sample_text}
+\"\"\"
+
+Keyword hints found: {keyword_hits if keyword_hits else 'none'}
+
+Respond with ONLY a JSON object in this exact format (no markdown, no explanation):
+{{"is_logistics": true, "confidence": "high", "reason": "one sentence explanation"}}
+
+Be strict: only return true if the document is genuinely about logistics/transport/supply chain operations."""
+
+        response = invoke_llm([("human", classification_prompt)])
+        content  = response.content.strip()
+
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if json_match:
+            result = json.loads(json_match.group())
+            return result.get("is_logistics", False), result.get("reason", "Classification complete.")
+
+        return len(keyword_hits) >= 2, f"Keyword-based detection: {keyword_hits}"
+
+    except Exception as e:
+        print(f"Classification error: {e}")
+        return True, "Classification service unavailable, document accepted."
+
+
+def load_pdf_chunks(pdf_path: Path, pages=None, filename: Optional[str] = None):
+    """(chunks to embed, page count, parent sections); parents are only produced with CHUNKING=parent."""
+    filename = filename or pdf_path.name
+    pages = pages if pages is not None else load_pdf_pages(pdf_path)
+    for page in pages:
+        page.metadata["source"] = filename
+    chunks, parents = split_pages(
+        pages, CHUNKING, CHUNK_SIZE, CHUNK_OVERLAP, PARENT_CHUNK_SIZE, CHILD_CHUNK_SIZE, CHILD_CHUNK_OVERLAP
+    )
+    detail = f" in {len(parents)} sections" if parents else ""
+    print(f"  ✓ {filename}: {len(pages)} pages -> {len(chunks)} chunks{detail}")
+    return chunks, len(pages), parents
+
+
+def load_pdf_rate_rows(pdf_path: Path):
+    """Rate table rows of a PDF; a layout we cannot parse just means no table answers for it."""
+    try:
+        rows = extract_rate_rows(pdf_path)
+    except Exception as e:
+        print(f"  Could not extract tables from {pdf_path.name}: {e}")
+        return []
+    if rows:
+        print(f"  ✓ {pdf_path.name}: {len(rows)} rate table rows")
+    return rows
+
+
+def rebuild_vectorstore(tenant: Tenant):
+    with index_writer(tenant):
+        return _rebuild_vectorstore(tenant)
+
+
+def _rebuild_vectorstore(tenant: Tenant):
+    """
+    Blue/green rebuild: build into a new version directory while queries keep
+    hitting the active one, then swap the CURRENT pointer. A failed build is
+    discarded and leaves the active index untouched.
+    """
+    records = tenant.catalog.list()
+    if not records:
+        raise ValueError("No documents in the catalog")
+
+    print("\nRebuilding vector store from all catalogued PDFs...")
+    target = tenant.versions.new_dir()
+    try:
+        all_chunks, all_ids, updated, missing = [], [], [], []
+        tables, entities, parents = {}, {}, {}
+        for record in records:
+            pdf_path = tenant.raw_dir / record.filename
+            if not pdf_path.exists():
+                print(f"  Skipping {record.filename}: file is missing, dropping it from the catalog")
+                missing.append(record.filename)
+                continue
+            chunks, page_count, parents[record.filename] = load_pdf_chunks(pdf_path)
+            ids = make_chunk_ids(record.filename, record.sha256, len(chunks))
+            all_chunks.extend(chunks)
+            all_ids.extend(ids)
+            tables[record.filename] = load_pdf_rate_rows(pdf_path)
+            entities[record.filename] = extract_entities(chunks, ids)
+            updated.append(replace(record, page_count=page_count, chunk_count=len(chunks), chunk_ids=ids))
+        if not all_chunks:
+            raise ValueError("None of the catalogued PDFs produced any chunks")
+        new_store = build_vectorstore(all_chunks, all_ids, target)
+    except Exception:
+        forget_chroma_client(target)
+        tenant.versions.discard(target)
+        raise
+
+    for record in updated:
+        tenant.catalog.upsert(record)
+    for filename in missing:
+        forget_document(tenant, filename)
+    for filename, rows in tables.items():
+        tenant.tables.put(filename, rows)
+    for filename, postings in entities.items():
+        tenant.entities.put(filename, postings)
+    for filename, sections in parents.items():
+        tenant.parents.put(filename, sections)
+    tenant.versions.activate(target)
+    with tenant.lock:
+        tenant.vectorstore, tenant.loaded_dir = new_store, target
+    tenant.versions.collect_garbage()
+    refresh_stats(
+        tenant,
+        vector_count=len(all_chunks),
+        document_count=tenant.catalog.count(),
+        last_ingest_at=utc_now(),
+    )
+    print(f"Vector store built with {len(all_chunks)} chunks from {len(records)} file(s)")
+    return len(all_chunks)
+
+
+def add_pdf_to_vectorstore(tenant: Tenant, pdf_path: Path, sha256: Optional[str] = None,
+                           reason: Optional[str] = None, pages=None, filename: Optional[str] = None,
+                           chunked=None):
+    """
+    Index a PDF as `filename` (default: its own name), replacing the indexed
+    version of it, if any. `chunked` is load_pdf_chunks' result when the caller
+    already split it. Parsing and embedding happen before the previous
+    version is touched: its vectors are deleted only once the new ones are in
+    and the catalog points at them, so a failure leaves it as it was.
+    """
+    filename = filename or pdf_path.name
+    sha256 = sha256 or file_sha256(pdf_path)
+    chunks, page_count, parents = chunked or load_pdf_chunks(pdf_path, pages, filename)
+    ids = make_chunk_ids(filename, sha256, len(chunks))
+    rate_rows = load_pdf_rate_rows(pdf_path)
+    postings = extract_entities(chunks, ids)
+
+    st = pdf_path.stat()
+    record = DocumentRecord(
+        filename=filename,
+        sha256=sha256,
+        size_bytes=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        page_count=page_count,
+        chunk_count=len(chunks),
+        chunk_ids=ids,
+        ingested_at=utc_now(),
+        is_logistics=True,
+        classifier_reason=reason,
+    )
+
+    vs = current_vectorstore(tenant)
+    if vs is None and tenant.versions.active_dir() is not None and tenant.catalog.count():
+        # The active version was built for another VECTOR_BACKEND: rebuild the
+        # catalogued documents for this one rather than start an index holding only this file.
+        _rebuild_vectorstore(tenant)
+        vs = current_vectorstore(tenant)
+
+    previous = tenant.catalog.get(filename)
+    if previous and not previous.chunk_ids and vs is not None:
+        # Catalogued before chunk IDs were recorded: only a source filter finds
+        # its vectors, and it would find the new ones too, so they go first.
+        remove_document_vectors(tenant, previous)
+        previous = None
+
+    if vs is None:
+        target = tenant.versions.new_dir()
+        new_store = build_vectorstore(chunks, ids, target)
+        tenant.versions.activate(target)
+        with tenant.lock:
+            tenant.vectorstore, tenant.loaded_dir = new_store, target
+    else:
+        try:
+            vs.add_documents(chunks, ids=ids)
+        except Exception:
+            vs.delete(ids=ids)   # whichever batches did go in
+            raise
+
+    tenant.catalog.upsert(record)
+    tenant.tables.put(filename, rate_rows)
+    tenant.entities.put(filename, postings)
+    tenant.parents.put(filename, parents)
+    refresh_stats(
+        tenant,
+        vector_count=tenant.stats.vector_count + len(chunks),
+        document_count=tenant.catalog.count(),
+        last_ingest_at=utc_now(),
+    )
+    if previous and vs is not None:
+        current = set(ids)
+        stale = [cid for cid in previous.chunk_ids if cid not in current]
+        if stale:
+            remove_document_vectors(tenant, replace(previous, chunk_ids=stale))
+    print(f"Added {len(chunks)} chunks from {filename}")
+    return len(chunks)
+
+
+def remove_document_vectors(tenant: Tenant, record: DocumentRecord) -> int:
+    """Delete one document's vectors by chunk ID; backfilled entries fall back to a source filter."""
+    vs = current_vectorstore(tenant)
+    if vs is None:
+        return 0
+    if record.chunk_ids:
+        vs.delete(ids=record.chunk_ids)
+        removed = len(record.chunk_ids)
+    else:
+        before = count_vectors(vs)
+        delete_where_source(vs, record.filename)
+        removed = before - count_vectors(vs)
+    refresh_stats(tenant, vector_count=max(tenant.stats.vector_count - removed, 0))
+    return removed
+
+
+def forget_document(tenant: Tenant, filename: str):
+    """Drop a document's catalog row and side indexes (rate tables, identifiers, parent sections)."""
+    tenant.catalog.remove(filename)
+    tenant.tables.remove(filename)
+    tenant.entities.remove(filename)
+    tenant.parents.remove(filename)
+    refresh_stats(tenant, document_count=tenant.catalog.count())
+
+
+def remove_document(tenant: Tenant, record: DocumentRecord) -> int:
+    """Drop a document's vectors, catalog row and side indexes. Callers hold the write lock."""
+    removed = remove_document_vectors(tenant, record)
+    forget_document(tenant, record.filename)
+    return removed
+
+
+def quota_error(tenant: Tenant, replacing: Optional[DocumentRecord], new_chunks: int = 0) -> Optional[str]:
+    """Why one more document of `new_chunks` chunks would exceed the tenant's quotas, or None."""
+    limits = tenant.limits
+    if limits.max_documents and not replacing and tenant.catalog.count() >= limits.max_documents:
+        return f"Tenant quota exceeded: at most {limits.max_documents} documents."
+    if limits.max_chunks:
+        current = tenant.stats.vector_count - (replacing.chunk_count if replacing else 0)
+        if current + new_chunks > limits.max_chunks:
+            return f"Tenant quota exceeded: at most {limits.max_chunks} indexed chunks."
+    return None
+
+
+def upload_name(filename: str) -> Optional[str]:
+    """
+    The name to store an upload under: the last component of what the client
+    sent, so "../acme/raw/x.pdf" cannot write outside the tenant's raw
+    directory. None for names that are empty, hidden (dot-files are staging
+    copies, and sync would drop them) or too long for the staging copy's name.
+    """
+    name = Path(filename.replace("\\", "/")).name
+    if not name or name.startswith(".") or "\0" in name or len(name.encode("utf-8")) > MAX_FILENAME_BYTES:
+        return None
+    return name
+
+
+def ingest_upload(tenant: Tenant, filename: str, content: bytes, classify: bool = True):
+    """
+    Classify and index one uploaded PDF. Returns (accepted_entry, None) or
+    (None, rejected_entry). Runs in the threadpool; only the index mutation
+    itself holds the write lock, classification does not. classify=False
+    accepts the file as logistics without asking Gemini.
+    """
+    name = upload_name(filename)
+    if name is None:
+        return None, {"filename": filename, "reason": "Invalid file name."}
+    filename  = name
+    file_path = tenant.raw_dir / filename
+    digest    = hashlib.sha256(content).hexdigest()
+    existing  = tenant.catalog.get(filename)
+
+    if existing and existing.sha256 == digest:
+        print(f"\nUnchanged: {filename} is already indexed")
+        return {"filename": filename, "chunks": existing.chunk_count}, None
+
+    current_vectorstore(tenant)   # loads the stats the quota check reads
+    over_quota = quota_error(tenant, existing)   # early out; the chunk count is checked once split
+    if over_quota:
+        return None, {"filename": filename, "reason": over_quota}
+
+    # Classify and index a staging copy so a rejected or failed re-upload never clobbers the indexed file.
+    staging_path = tenant.raw_dir / f".{filename}.part"
+    try:
+        with open(staging_path, "wb") as f:
+            f.write(content)
+    except OSError as e:
+        staging_path.unlink(missing_ok=True)
+        return None, {"filename": filename, "reason": f"Could not store the upload: {e}"}
+
+    # Parse once, outside the write lock: OCR of a scanned file can take a while.
+    try:
+        pages = load_pdf_pages(staging_path)
+    except Exception as e:
+        staging_path.unlink(missing_ok=True)
+        return None, {"filename": filename, "reason": f"Could not read PDF: {e}"}
+
+    if classify:
+        print(f"\nClassifying: {filename}")
+        is_logistics, reason = is_logistics_document(staging_path, pages)
+    else:
+        is_logistics, reason = True, "Accepted without classification."
+
+    if not is_logistics:
+        print(f"  Rejected: {reason}")
+        staging_path.unlink(missing_ok=True)
+        return None, {"filename": filename, "reason": f"Not a logistics document: {reason}"}
+
+    print(f"  Accepted: {reason}")
+    try:
+        chunked = load_pdf_chunks(staging_path, pages, filename)
+    except Exception as e:
+        staging_path.unlink(missing_ok=True)
+        return None, {"filename": filename, "reason": f"Processing error: {str(e)}"}
+    with index_writer(tenant):
+        existing = tenant.catalog.get(filename)
+        over_quota = quota_error(tenant, existing, len(chunked[0]))
+        if over_quota:
+            staging_path.unlink(missing_ok=True)
+            return None, {"filename": filename, "reason": over_quota}
+        try:
+            chunks = add_pdf_to_vectorstore(tenant, staging_path, digest, reason, pages, filename, chunked)
+            os.replace(staging_path, file_path)
+        except Exception as e:
+            staging_path.unlink(missing_ok=True)
+            if existing is None:
+                forget_document(tenant, filename)
+            return None, {"filename": filename, "reason": f"Processing error: {str(e)}"}
+    return {"filename": filename, "chunks": chunks}, None
+
+
+def sync_tenant(tenant: Tenant) -> dict:
+    """
+    Bring the index in line with the tenant's raw directory: ingest new and
+    changed PDFs, drop documents whose file is gone. Files put there by an
+    operator are trusted, so they skip the logistics classifier. Each file is
+    parsed outside the write lock and applied under it, after checking that
+    an upload or another worker's sync has not indexed it meanwhile.
+    """
+    plan = plan_sync(tenant.raw_dir, tenant.catalog.list(), file_sha256)
+    result = {"added": [], "updated": [], "removed": [], "failed": [], "unchanged": plan.unchanged}
+    if not plan:
+        return result
+    print(f"\nSyncing {tenant.raw_dir}: {len(plan.added)} new, {len(plan.changed)} changed, "
+          f"{len(plan.removed)} removed")
+
+    for pdf_path, digest in plan.added + plan.changed:
+        try:
+            pages = load_pdf_pages(pdf_path)
+        except Exception as e:
+            result["failed"].append({"filename": pdf_path.name, "reason": f"Could not read PDF: {e}"})
+            continue
+        try:
+            chunked = load_pdf_chunks(pdf_path, pages)
+        except Exception as e:
+            result["failed"].append({"filename": pdf_path.name, "reason": f"Processing error: {e}"})
+            continue
+        with index_writer(tenant):
+            existing = tenant.catalog.get(pdf_path.name)
+            if existing and existing.sha256 == digest:
+                continue
+            error = quota_error(tenant, existing, len(chunked[0]))
+            if error:
+                result["failed"].append({"filename": pdf_path.name, "reason": error})
+                continue
+            try:
+                chunks = add_pdf_to_vectorstore(tenant, pdf_path, digest, SYNC_REASON, pages, chunked=chunked)
+            except Exception as e:
+                if existing is None:
+                    forget_document(tenant, pdf_path.name)
+                result["failed"].append({"filename": pdf_path.name, "reason": f"Processing error: {e}"})
+                continue
+            result["updated" if existing else "added"].append({"filename": pdf_path.name, "chunks": chunks})
+
+    if plan.touched or plan.removed:
+        with index_writer(tenant):
+            for pdf_path, mtime_ns in plan.touched:
+                record = tenant.catalog.get(pdf_path.name)
+                if record:
+                    tenant.catalog.upsert(replace(record, mtime_ns=mtime_ns))
+            for filename in plan.removed:
+                record = tenant.catalog.get(filename)
+                if record is None or (tenant.raw_dir / filename).exists():
+                    continue
+                result["removed"].append({"filename": filename, "chunks": remove_document(tenant, record)})
+    return result
@@ -0,0 +1,234 @@
+"""
+pdf_parsing.py - Pluggable PDF parser chain with an OCR fallback
+
+A ParserChain runs parsers in order: the first extracts every page, and each
+later one is tried only on pages that are still (nearly) empty. Scanned
+delivery notes and customs forms have no text layer, so with the default
+"pypdf,ocr" chain digital PDFs never touch OCR and scanned pages get it.
+
+    pypdf     text layer via pypdf (fast, in-process)
+    pymupdf   text layer via PyMuPDF in reading order, better for multi-column layouts
+    ocr       PyMuPDF renders the page, Tesseract reads it (pip install pytesseract
+              pillow, plus the tesseract binary)
+
+Slow parsers (`pooled = True`) run page by page in a separate process pool
+with a per-page timeout, so OCR work never holds up the request threads that
+parse digital PDFs. A parser whose dependencies are missing is skipped with
+one warning. New parsers subclass Parser, implement page_count and
+extract_page, and go through register_parser; a pooled one must live in an
+importable module, because pool workers look it up by name.
+"""
+import importlib
+import importlib.util
+from abc import ABC, abstractmethod
+import math
+import multiprocessing
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MIN_PAGE_CHARS = 20    # less text than this counts as "no text layer"
+OCR_DPI        = 200
+
+
+class Parser(ABC):
+    name   = ""
+    pooled = False   # True: run page by page in the worker pool
+
+    def unavailable(self) -> Optional[str]:
+        """Why this parser cannot run here (missing dependency), or None."""
+        return None
+
+    @abstractmethod
+    def page_count(self, path: Path) -> int:
+        ...
+
+    @abstractmethod
+    def extract_page(self, path: Path, page: int, timeout: float) -> str:
+        """Text of one 0-based page; `timeout` (seconds, 0 = none) bounds pooled parsers."""
+
+    def extract_pages(self, path: Path, pages: List[int]) -> Dict[int, str]:
+        """Text of several pages; override when opening the file once per call is cheaper."""
+        return {page: self.extract_page(path, page, 0) for page in pages}
+
+
+class PypdfParser(Parser):
+    name = "pypdf"
+
+    def page_count(self, path: Path) -> int:
+        from pypdf import PdfReader
+        return len(PdfReader(str(path)).pages)
+
+    def extract_page(self, path: Path, page: int, timeout: float) -> str:
+        return self.extract_pages(path, [page])[page]
+
+    def extract_pages(self, path: Path, pages: List[int]) -> Dict[int, str]:
+        from pypdf import PdfReader
+        reader = PdfReader(str(path))
+        return {page: reader.pages[page].extract_text() or "" for page in pages}
+
+
+class PyMuPDFParser(Parser):
+    name = "pymupdf"
+
+    def unavailable(self) -> Optional[str]:
+        if importlib.util.find_spec("fitz") is None:
+            return "PyMuPDF is not installed (pip install pymupdf)"
+        return None
+
+    def page_count(self, path: Path) -> int:
+        import fitz
+        with fitz.open(str(path)) as doc:
+            return doc.page_count
+
+    def extract_page(self, path: Path, page: int, timeout: float) -> str:
+        return self.extract_pages(path, [page])[page]
+
+    def extract_pages(self, path: Path, pages: List[int]) -> Dict[int, str]:
+        import fitz
+        with fitz.open(str(path)) as doc:
+            return {page: doc[page].get_text("text", sort=True) for page in pages}
+
+
+class OcrParser(Parser):
+    name   = "ocr"
+    pooled = True
+
+    def unavailable(self) -> Optional[str]:
+        missing = [m for m in ("fitz", "pytesseract", "PIL") if importlib.util.find_spec(m) is None]
+        if missing:
+            return f"{', '.join(missing)} not installed (pip install pymupdf pytesseract pillow)"
+        if shutil.which("tesseract") is None:
+            return "the tesseract binary is not on PATH"
+        return None
+
+    def page_count(self, path: Path) -> int:
+        return PyMuPDFParser().page_count(path)
+
+    def extract_page(self, path: Path, page: int, timeout: float) -> str:
+        import fitz
+        import pytesseract
+        from PIL import Image
+
+        with fitz.open(str(path)) as doc:
+            pixmap = doc[page].get_pixmap(dpi=OCR_DPI)
+        mode = "RGBA" if pixmap.alpha else "RGB"
+        image = Image.frombytes(mode, (pixmap.width, pixmap.height), pixmap.samples)
+        return pytesseract.image_to_string(image, timeout=timeout)   # kills tesseract on timeout
+
+
+PARSERS: Dict[str, Parser] = {}
+
+
+def register_parser(parser: Parser):
+    PARSERS[parser.name] = parser
+
+
+for _parser in (PypdfParser(), PyMuPDFParser(), OcrParser()):
+    register_parser(_parser)
+
+
+def _pooled_page(module: str, name: str, path: str, page: int, timeout: float) -> str:
+    """Runs in a pool worker; importing the parser's module registers it there too."""
+    importlib.import_module(module)
+    return PARSERS[name].extract_page(Path(path), page, timeout)
+
+
+class ParserChain:
+    def __init__(self, names: List[str], workers: int, page_timeout: float):
+        unknown = [n for n in names if n not in PARSERS]
+        if unknown:
+            raise ValueError(f"Unknown PDF parser(s) {unknown}; available: {sorted(PARSERS)}")
+        self.names        = names
+        self.workers      = max(1, workers)
+        self.page_timeout = page_timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._warned = set()
+
+    def _available(self) -> List[Parser]:
+        parsers = []
+        for name in self.names:
+            reason = PARSERS[name].unavailable()
+            if reason:
+                if name not in self._warned:
+                    self._warned.add(name)
+                    print(f"Warning: PDF parser '{name}' disabled: {reason}")
+                continue
+            parsers.append(PARSERS[name])
+        return parsers
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: workers start clean instead of forking a threaded server
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _reset_pool(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run_pooled(self, parser: Parser, path: Path, pages: List[int]) -> Dict[int, str]:
+        futures = {
+            page: self._executor().submit(
+                _pooled_page, type(parser).__module__, parser.name, str(path), page, self.page_timeout
+            )
+            for page in pages
+        }
+        # Every page gets page_timeout once a worker picks it up.
+        deadline = time.monotonic() + self.page_timeout * (math.ceil(len(pages) / self.workers) + 1)
+        texts = {}
+        for page, future in futures.items():
+            try:
+                texts[page] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                # The worker's own per-page timeout frees it; just stop waiting for this file.
+                for pending in futures.values():
+                    pending.cancel()
+                print(f"  {parser.name} timed out on {path.name}; {len(pages) - len(texts)} page(s) left unread")
+                break
+            except BrokenProcessPool:
+                print(f"  {parser.name} worker crashed on {path.name}")
+                self._reset_pool()
+                break
+            except Exception as e:
+                print(f"  {parser.name} failed on {path.name} page {page + 1}: {e}")
+        return texts
+
+    def parse(self, path: Path):
+        """One Document per page, metadata {"source", "page", "parser"}; unreadable pages have empty text."""
+        from langchain_core.documents import Document
+
+        parsers = self._available()
+        if not parsers:
+            raise RuntimeError("No PDF parser is available")
+        count = parsers[0].page_count(path)
+        texts: Dict[int, str] = {}
+        used: Dict[int, str] = {}
+        for parser in parsers:
+            pending = [p for p in range(count) if len(texts.get(p, "").strip()) < MIN_PAGE_CHARS]
+            if not pending:
+                break
+            if parser.pooled:
+                found = self._run_pooled(parser, path, pending)
+                if found:
+                    print(f"  {parser.name}: read {len(found)} page(s) of {path.name} without a text layer")
+            else:
+                found = parser.extract_pages(path, pending)
+            for page, text in found.items():
+                if len(text.strip()) > len(texts.get(page, "").strip()):
+                    texts[page], used[page] = text, parser.name
+        return [
+            Document(
+                page_content=texts.get(page, ""),
+                metadata={"source": path.name, "page": page, "parser": used.get(page, "")},
+            )
+            for page in range(count)
+        ]
@@ -0,0 +1,373 @@
+"""
+rate_tables.py - Rate sheet and tariff tables as structured rows
+
+The text splitter shreds rate cards into 1,000-character fragments, so a
+numeric lookup ("rate Shanghai to Rotterdam for 300 kg?") needed many chunks
+in context and an LLM to read them back. At ingest, extract_rate_rows reads
+each page with pypdf's layout mode, finds runs of lines that split into the
+same columns, and keeps tables that have a lane and a rate:
+
+    page, origin, destination, lane, equipment, weight_break, break_kg, rate, rate_text, currency, text
+
+Wide rate cards (one column per weight break) are unpivoted to one row per
+break. Container rates keep their equipment type ("40HC") in its own column
+and no weight break, so "rate for a 40HC" is matched on the type and never
+read as a 40 kg break. RateTableStore keeps one columnar .npz file per
+document and answers lookup-style questions from those columns directly.
+Anything it cannot pin to concrete rows falls through to retrieval + Gemini.
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+CELL_SPLIT = re.compile(r"\s*\|\s*|\t+|\s{2,}")
+NUMBER_RE  = re.compile(r"\d[\d,]*(?:\.\d+)?")
+CURRENCIES = ("USD", "EUR", "GBP", "CNY", "RMB", "INR", "JPY", "SGD", "AED", "HKD", "AUD", "CAD", "CHF")
+CURRENCY_RE      = re.compile(r"\b(" + "|".join(CURRENCIES) + r")\b", re.IGNORECASE)
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "₹": "INR"}
+CURRENCY_ALIASES = {"RMB": "CNY"}
+CURRENCY_WORDS   = re.compile(r"\b(yuan|renminbi|euros?|yen|rupees?|us\s*dollars?)\b", re.IGNORECASE)
+CURRENCY_NAMES   = {"yuan": "CNY", "renminbi": "CNY", "euro": "EUR", "yen": "JPY", "rupee": "INR", "usdollar": "USD"}
+
+# Header cell -> field, checked in this order (so "Rate per kg" is a rate, not a weight).
+HEADER_FIELDS = [
+    ("currency", re.compile(r"\b(currency|curr|ccy)\b", re.IGNORECASE)),
+    ("rate", re.compile(r"\b(rates?|price|tariff|charges?|cost|amount|freight)\b", re.IGNORECASE)),
+    ("weight_break", re.compile(r"\b(weight|break|kgs?|lbs?)\b", re.IGNORECASE)),
+    ("origin", re.compile(r"\b(origin|from|pol|port of loading|loading port)\b", re.IGNORECASE)),
+    ("destination", re.compile(r"\b(destination|dest|to|pod|port of discharge|discharge port)\b", re.IGNORECASE)),
+    ("lane", re.compile(r"\b(lane|route|corridor)\b", re.IGNORECASE)),
+    ("equipment", re.compile(r"\b(container|equipment|cntr|eqp)\b", re.IGNORECASE)),
+]
+BREAK_HEADER = re.compile(
+    r"^(m|min|minimum|n|[<>+\-]?\s*\d+(\.\d+)?\s*(kgs?)?\s*\+?|\d+\s*-\s*\d+\s*(kgs?)?)$", re.IGNORECASE
+)
+LANE_SPLIT = re.compile(r"\s*(?:→|->|–|—|\s-\s|\bto\b)\s*", re.IGNORECASE)
+
+RATE_QUESTION = re.compile(r"\b(rates?|price|pricing|cost|tariff|charges?|how much)\b", re.IGNORECASE)
+LOOKUP_FORM   = re.compile(r"^\s*(what(\s+is|\s+are|'s)|how\s+much|give\s+me|quote|show\s+me|list)\b", re.IGNORECASE)
+NOT_LOOKUP    = re.compile(
+    r"\b(why|compare[sd]?|comparison|versus|vs|differen(ce|t)|trend|chang(e[sd]?|ing)|increase[sd]?|"
+    r"decrease[sd]?|went|go(es|ne)?\s+(up|down)|rise|drop(ped)?|history|historical|when|valid(ity)?|expir(e[sd]?|y)|"
+    r"effective|until|surcharges?|explain)\b",
+    re.IGNORECASE,
+)
+MINIMUM_RE    = re.compile(r"\b(min|minimum)\b", re.IGNORECASE)
+MINIMUM_BREAKS = ("m", "min", "minimum")
+WEIGHT_RE     = re.compile(
+    r"(\d[\d,]*(?:\.\d+)?)\s*(kg|kgs|kilos?|kilograms?|t|tons?|tonnes?|lbs?)\b", re.IGNORECASE
+)
+WEIGHT_UNITS  = {"t": 1000.0, "ton": 1000.0, "tons": 1000.0, "tonne": 1000.0, "tonnes": 1000.0,
+                 "lb": 0.4536, "lbs": 0.4536}
+EQUIPMENT_RE  = re.compile(r"\b(20|40|45)\s*(?:'|ft|foot)?\s*(GP|DV|DC|ST|HC|HQ|RF|RH|OT|FR)\b", re.IGNORECASE)
+EQUIPMENT_ALIASES = {"DV": "GP", "DC": "GP", "ST": "GP", "HQ": "HC"}
+MAX_ANSWER_ROWS = 20   # more matches than this is not a lookup; let the LLM handle it
+
+COLUMNS = {
+    "page": np.int32, "origin": str, "destination": str, "lane": str, "equipment": str, "weight_break": str,
+    "break_kg": np.float64, "rate": np.float64, "rate_text": str, "currency": str, "text": str,
+}
+
+
+# ─────────────────────────────────────────────
+# EXTRACTION
+# ─────────────────────────────────────────────
+def _cells(line: str) -> List[str]:
+    return [c for c in CELL_SPLIT.split(line.strip()) if c]
+
+
+def _number(text: str) -> Optional[str]:
+    match = NUMBER_RE.search(text)
+    return match.group() if match else None
+
+
+def _currency(*texts: str) -> str:
+    for text in texts:
+        match = CURRENCY_RE.search(text)
+        if match:
+            code = match.group(1).upper()
+            return CURRENCY_ALIASES.get(code, code)
+        for symbol, code in CURRENCY_SYMBOLS.items():
+            if symbol in text:
+                return code
+    return ""
+
+
+def parse_break(label: str) -> float:
+    """Lower bound in kg of a weight break label ("+45", "45-99", "<45", "100 kg"); NaN for minimums."""
+    text = label.strip().lower()
+    if text in MINIMUM_BREAKS:
+        return math.nan
+    if text == "n" or text.startswith(("<", "-", "under", "up to")):
+        return 0.0
+    number = _number(text)
+    return float(number.replace(",", "")) if number else math.nan
+
+
+def equipment_codes(text: str) -> List[str]:
+    """ISO-style container types in `text`, normalised: "40' HQ" and "40HC" are both 40HC."""
+    return [m.group(1) + EQUIPMENT_ALIASES.get(m.group(2).upper(), m.group(2).upper())
+            for m in EQUIPMENT_RE.finditer(text)]
+
+
+def _split_lane(lane: str):
+    parts = [p for p in LANE_SPLIT.split(lane) if p.strip()]
+    return (parts[0], parts[1]) if len(parts) == 2 else ("", "")
+
+
+def _table_rows(header: List[str], body: List[List[str]], page: int) -> List[dict]:
+    fields: Dict[str, int] = {}
+    breaks: Dict[int, str] = {}
+    for i, cell in enumerate(header):
+        if BREAK_HEADER.match(cell):
+            breaks[i] = cell
+            continue
+        for name, pattern in HEADER_FIELDS:
+            if name not in fields and pattern.search(cell):
+                fields[name] = i
+                break
+
+    wide = len(breaks) >= 2 and "rate" not in fields
+    has_lane = "lane" in fields or ("origin" in fields and "destination" in fields)
+    if not has_lane or not (wide or "rate" in fields):
+        return []
+
+    def cell(cells, name):
+        return cells[fields[name]] if name in fields else ""
+
+    rows = []
+    for cells in body:
+        origin, destination = cell(cells, "origin"), cell(cells, "destination")
+        lane = cell(cells, "lane")
+        if lane and not (origin and destination):
+            origin, destination = _split_lane(lane)
+        if not lane:
+            lane = f"{origin} → {destination}"
+        line = " | ".join(cells)
+        equipment = cell(cells, "equipment")
+        codes = equipment_codes(equipment)
+        equipment = codes[0] if codes else equipment.strip()
+
+        if wide:
+            prices = [(label, cells[i]) for i, label in breaks.items()]
+        else:
+            prices = [(cell(cells, "weight_break"), cell(cells, "rate"))]
+        rate_header = header[fields["rate"]] if "rate" in fields else ""
+        for label, price in prices:
+            number = _number(price)
+            if number is None:
+                continue
+            rows.append({
+                "page": page,
+                "origin": origin,
+                "destination": destination,
+                "lane": lane,
+                "equipment": equipment,
+                "weight_break": label,
+                "break_kg": parse_break(label) if label else math.nan,
+                "rate": float(number.replace(",", "")),
+                "rate_text": number,
+                "currency": _currency(cell(cells, "currency"), price, rate_header, line),
+                "text": line,
+            })
+    return rows
+
+
+def rows_from_text(text: str, page: int) -> List[dict]:
+    """Rate rows of every table in one page of layout-preserving text."""
+    rows = []
+    run: List[List[str]] = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue   # layout mode pads rows with blank lines
+        cells = _cells(line)
+        if len(cells) >= 2 and (not run or len(cells) == len(run[0])):
+            run.append(cells)
+            continue
+        rows.extend(_run_rows(run, page))
+        run = [cells] if len(cells) >= 2 else []
+    rows.extend(_run_rows(run, page))
+    return rows
+
+
+def _run_rows(run: List[List[str]], page: int) -> List[dict]:
+    """The header is the first line of the run that makes it a rate table (titles may precede it)."""
+    for start in range(len(run) - 1):
+        rows = _table_rows(run[start], run[start + 1:], page)
+        if rows:
+            return rows
+    return []
+
+
+def extract_rate_rows(pdf_path: Path) -> List[dict]:
+    from pypdf import PdfReader
+
+    rows = []
+    for number, page in enumerate(PdfReader(str(pdf_path)).pages):
+        try:
+            text = page.extract_text(extraction_mode="layout")
+        except Exception as e:
+            print(f"  Could not read the layout of {pdf_path.name} page {number + 1}: {e}")
+            continue
+        rows.extend(rows_from_text(text, number))
+    return rows
+
+
+# ─────────────────────────────────────────────
+# STORE + LOOKUP
+# ─────────────────────────────────────────────
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _position(place: str, question_tokens: List[str]) -> Optional[int]:
+    """Where every word of `place` appears in the question (its first word's index), or None."""
+    words = [w for w in _tokens(re.sub(r"\(.*?\)", "", place) or place) if len(w) > 1]
+    if not words or any(w not in question_tokens for w in words):
+        return None
+    return question_tokens.index(words[0])
+
+
+def question_currencies(question: str) -> List[str]:
+    """Currency codes a question names, by code, symbol or name ("RMB" and "yuan" are both CNY)."""
+    codes = {CURRENCY_ALIASES.get(c.upper(), c.upper()) for c in CURRENCY_RE.findall(question)}
+    codes.update(code for symbol, code in CURRENCY_SYMBOLS.items() if symbol in question)
+    codes.update(CURRENCY_NAMES[re.sub(r"\s+|s$", "", m.lower())] for m in CURRENCY_WORDS.findall(question))
+    return sorted(codes)
+
+
+def _weight_kg(question: str) -> Optional[float]:
+    match = WEIGHT_RE.search(question)
+    if not match:
+        return None
+    return float(match.group(1).replace(",", "")) * WEIGHT_UNITS.get(match.group(2).lower(), 1.0)
+
+
+class RateTableStore:
+    """One <key>.npz of columns per source document, concatenated in memory for lookups."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._columns: Dict[str, np.ndarray] = {}
+        self._sources = np.empty(0, dtype=str)
+
+    def _file(self, source: str) -> Path:
+        return self.path / (hashlib.sha1(source.encode("utf-8")).hexdigest()[:20] + ".npz")
+
+    def put(self, source: str, rows: List[dict]):
+        """Replace `source`'s rows. Callers hold the tenant's write lock."""
+        if not rows:
+            self.remove(source)
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        columns = {name: np.array([row[name] for row in rows], dtype=dtype) for name, dtype in COLUMNS.items()}
+        columns["source"] = np.array([source] * len(rows), dtype=str)
+        target = self._file(source)
+        tmp = target.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, **columns)
+        os.replace(tmp, target)
+        self._stamp = None
+
+    def remove(self, source: str):
+        self._file(source).unlink(missing_ok=True)
+        self._stamp = None
+
+    def _load(self) -> Dict[str, np.ndarray]:
+        """Current columns; re-read only when another write changed the directory."""
+        try:
+            stamp = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if stamp != self._stamp:
+                parts = []
+                for path in sorted(self.path.glob("*.npz")):
+                    with np.load(path, allow_pickle=False) as data:
+                        parts.append({name: data[name] for name in data.files})
+                for part in parts:
+                    # Tables written before a column existed read it as empty.
+                    size = len(part["rate"])
+                    for name, dtype in COLUMNS.items():
+                        if name not in part:
+                            part[name] = np.full(size, math.nan) if dtype is np.float64 else np.full(size, "")
+                self._columns = {
+                    name: np.concatenate([p[name] for p in parts]) for name in parts[0]
+                } if parts else {}
+                self._stamp = stamp
+            return self._columns
+
+    def __len__(self) -> int:
+        columns = self._load()
+        return len(columns["rate"]) if columns else 0
+
+    def lookup(self, question: str) -> Optional[List[dict]]:
+        """
+        The rows that answer a rate question, or None when it is not a lookup
+        this store can settle: no rate wording; a question about why, when or
+        how rates changed or compare; no weight, container type or minimum to
+        pick rows by and not phrased as "what is / how much"; no lane fully
+        named in the question; or too many candidate rows.
+        """
+        if not RATE_QUESTION.search(question) or NOT_LOOKUP.search(question):
+            return None
+        equipment = equipment_codes(question)
+        weight = _weight_kg(question)
+        minimum = bool(MINIMUM_RE.search(question))
+        if not (equipment or weight is not None or minimum or LOOKUP_FORM.search(question)):
+            return None
+        columns = self._load()
+        if not columns:
+            return None
+
+        question_tokens = _tokens(question)
+        lanes, inverse = np.unique(columns["lane"], return_inverse=True)
+        matched = []
+        for i, lane in enumerate(lanes):
+            first = np.flatnonzero(inverse == i)[0]
+            origin, destination = columns["origin"][first], columns["destination"][first]
+            if origin and destination:
+                start, end = _position(origin, question_tokens), _position(destination, question_tokens)
+                if start is None or end is None or start > end:
+                    continue
+            elif _position(lane, question_tokens) is None:
+                continue
+            matched.append(i)
+        if not matched:
+            return None
+        mask = np.isin(inverse, matched)
+
+        currencies = question_currencies(question)
+        if currencies and np.any(mask & np.isin(columns["currency"], currencies)):
+            mask &= np.isin(columns["currency"], currencies)
+
+        if minimum:
+            mask &= np.isin(np.char.lower(columns["weight_break"]), MINIMUM_BREAKS)
+        elif equipment:
+            # Container rates are per unit: select by type, not by weight break.
+            mask &= np.isin(columns["equipment"], equipment)
+        elif weight is not None:
+            # Per lane, document and currency: the highest weight break at or below the weight.
+            eligible = mask & (columns["break_kg"] <= weight)
+            picked = np.zeros_like(mask)
+            groups = {}
+            for row in np.flatnonzero(eligible):
+                key = (columns["source"][row], columns["lane"][row], columns["currency"][row])
+                if key not in groups or columns["break_kg"][row] > columns["break_kg"][groups[key]]:
+                    groups[key] = row
+            picked[list(groups.values())] = True
+            if picked.any():
+                mask = picked
+
+        rows = np.flatnonzero(mask)
+        if len(rows) > MAX_ANSWER_ROWS:
+            return None
+        return [{name: columns[name][row].item() for name in columns} for row in rows]
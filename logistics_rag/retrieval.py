@@ -0,0 +1,107 @@
+"""
+retrieval.py - Context for a question
+
+A question naming an indexed container, B/L, AWB or HS code gets exactly the
+chunks that mention it; any other question gets a dense search. Either way
+`candidates` chunks are fetched, then narrowed to the prompt context:
+
+    chunking=parent    hits are swapped for their parent sections, each once
+    chunking=standard  hits with the same text (one file under two names) are kept once
+    then               the best k, compressed to their best sentences when compression < 1
+                       (compression.py), cut to the context token budget if one is set
+
+RetrievalParams carries k, candidates, compression and the budget from the
+tunable settings, with a request's overrides applied.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from .clients import get_embeddings
+from .compression import compress_docs
+from .config import CHUNKING, current
+from .store import count_vectors, current_vectorstore, documents_by_ids
+from .tenants import Tenant
+
+CHARS_PER_TOKEN = 4   # rough, for the context budget; Gemini counts about this on English text
+
+
+class NoDocuments(Exception):
+    """The tenant has nothing indexed yet."""
+
+
+@dataclass(frozen=True)
+class RetrievalParams:
+    k: int                # excerpts (parent sections: at most max_parents) in the prompt
+    candidates: int       # chunks fetched, at least k
+    context_tokens: int   # 0 = no budget
+    max_parents: int
+    compression: float    # share of the excerpts' characters kept; 1 = off
+    compression_weight: float
+
+
+def retrieval_params(k: Optional[int] = None, candidates: Optional[int] = None,
+                     context_tokens: Optional[int] = None, compression: Optional[float] = None) -> RetrievalParams:
+    """The current settings, overridden by whichever values a request sets."""
+    settings = current()
+    k = k or settings.top_k
+    return RetrievalParams(
+        k=k,
+        candidates=max(k, candidates or settings.candidates),
+        context_tokens=settings.context_tokens if context_tokens is None else context_tokens,
+        max_parents=settings.max_parents,
+        compression=compression or settings.compression,
+        compression_weight=settings.compression_weight,
+    )
+
+
+def require_vectorstore(tenant: Tenant):
+    vectorstore = current_vectorstore(tenant)
+    if vectorstore is None or count_vectors(vectorstore) == 0:
+        raise NoDocuments("No documents uploaded yet. Please upload a logistics PDF first.")
+    return vectorstore
+
+
+def entity_docs(tenant: Tenant, question: str, limit: int):
+    """Chunks that mention the container / BOL / AWB / HS identifiers in the question, if any are indexed."""
+    ids = tenant.entities.lookup(question, limit)
+    if not ids:
+        return []
+    return documents_by_ids(require_vectorstore(tenant), ids)
+
+
+def fit_budget(docs, tokens: int):
+    """The leading docs that fit in `tokens`; the first is cut to size rather than dropped."""
+    if not tokens:
+        return docs
+    from langchain_core.documents import Document
+
+    kept, used = [], 0
+    for doc in docs:
+        cost = len(doc.page_content) // CHARS_PER_TOKEN + 1
+        if kept and used + cost > tokens:
+            break
+        if not kept and cost > tokens:
+            doc = Document(page_content=doc.page_content[:tokens * CHARS_PER_TOKEN], metadata=doc.metadata)
+            cost = tokens
+        kept.append(doc)
+        used += cost
+    return kept
+
+
+def prompt_context(tenant: Tenant, question: str, docs, params: RetrievalParams):
+    """Narrow fetched hits (best first) to what goes in the prompt."""
+    if CHUNKING == "parent":
+        docs = tenant.parents.expand(docs, min(params.k, params.max_parents))
+    else:
+        seen = set()
+        docs = [d for d in docs if not (d.page_content in seen or seen.add(d.page_content))][:params.k]
+    if params.compression < 1:
+        docs = compress_docs(question, docs, params.compression, params.compression_weight, get_embeddings())
+    return fit_budget(docs, params.context_tokens)
+
+
+def retrieve(tenant: Tenant, question: str, params: RetrievalParams):
+    """The excerpts a question is answered from."""
+    docs = (entity_docs(tenant, question, params.candidates)
+            or require_vectorstore(tenant).similarity_search(question, k=params.candidates))
+    return prompt_context(tenant, question, docs, params)
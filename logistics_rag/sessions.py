@@ -0,0 +1,77 @@
+"""
+sessions.py - Server-side conversation memory for /chat
+
+A session keeps a rolling summary of older turns plus the last few turns
+verbatim, so the context sent to Gemini stays bounded however long the
+conversation runs. Answers are stored truncated; the store only needs
+enough of them to resolve follow-up questions.
+
+Sessions are keyed by (tenant, session_id), expire after `ttl` seconds
+idle, and the store never holds more than `max_sessions` (least recently
+used go first), so memory stays flat under thousands of clients.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple
+
+ANSWER_CHARS = 600   # stored per answer; enough to resolve "and for reefers?"
+
+
+class Session:
+    __slots__ = ("summary", "turns", "last_used", "lock")
+
+    def __init__(self):
+        self.summary: str = ""
+        self.turns: List[Tuple[str, str]] = []   # (question, truncated answer), oldest first
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()             # one question at a time per session
+
+    def add_turn(self, question: str, answer: str):
+        self.turns.append((question, answer[:ANSWER_CHARS]))
+
+    @staticmethod
+    def format_turns(turns: List[Tuple[str, str]]) -> str:
+        return "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in turns)
+
+    def transcript(self) -> str:
+        """The summary, then the recent turns, as prompt text."""
+        parts = [f"Summary of earlier conversation: {self.summary}"] if self.summary else []
+        if self.turns:
+            parts.append(self.format_turns(self.turns))
+        return "\n".join(parts)
+
+
+class SessionStore:
+    def __init__(self, ttl: float, max_sessions: int):
+        self.ttl          = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[Tuple[str, str], Session]" = OrderedDict()   # least recent first
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: str, session_id: str) -> Session:
+        """The live session for this key, starting an empty one if it is new or expired."""
+        key = (tenant_id, session_id)
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = Session()
+            self._sessions.move_to_end(key)
+            session.last_used = now
+            return session
+
+    def drop(self, tenant_id: str, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop((tenant_id, session_id), None) is not None
+
+    def _evict(self, now: float):
+        while self._sessions:
+            key, oldest = next(iter(self._sessions.items()))
+            if now - oldest.last_used < self.ttl and len(self._sessions) < self.max_sessions:
+                break
+            del self._sessions[key]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
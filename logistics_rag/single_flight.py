@@ -0,0 +1,66 @@
+"""
+single_flight.py - Coalesce identical concurrent calls
+
+When many callers ask for the same key at once, only the first (the leader)
+runs the function; the others wait for it and receive the same result, or
+the same exception unless the caller marked it as the leader's own. The key
+is forgotten as soon as the call finishes, so results are never cached
+beyond the calls that overlapped it.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done   = threading.Event()
+        self.result = None
+        self.error  = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock  = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed  = 0   # calls that ran the function
+        self.coalesced = 0   # calls answered by another caller's run
+
+    def do(self, key: Hashable, fn: Callable[[], Any], retry_on: Tuple[type, ...] = ()) -> Any:
+        """
+        Errors in `retry_on` belong to the leader alone (such as its own
+        admission being refused): followers run the call again instead of
+        receiving them, each becoming a leader or joining a newer call.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.executed += 1
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                break
+            call.done.wait()
+            if call.error is None:
+                return call.result
+            if not isinstance(call.error, retry_on):
+                raise call.error
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def snapshot(self) -> dict:
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
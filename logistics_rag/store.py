@@ -0,0 +1,205 @@
+"""
+store.py - Tenant registry and vector store lifecycle
+
+Opens, builds and reloads each tenant's vector store for the configured
+VECTOR_BACKEND, keeps its cached stats, and serializes index writes across
+worker processes with index_writer.
+"""
+from contextlib import contextmanager
+from dataclasses import replace
+from pathlib import Path
+from typing import List
+
+from filelock import Timeout
+
+from .clients import get_embeddings
+from .config import (
+    CATALOG_PATH, CHROMA_DB_DIR, COLLECTION, ENTITIES_DIR, FLAT_DTYPE, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH,
+    HNSW_M, MAX_LOADED_TENANTS, PARENTS_DIR, RAW_DATA_DIR, TABLES_DIR, TENANT_LIMITS, TENANTS_DIR,
+    VECTOR_BACKEND, WRITE_LOCK, current,
+)
+from .tenants import Tenant, TenantRegistry
+
+
+class IndexBusy(Exception):
+    """Another worker held the tenant's write lock for longer than the write_timeout setting."""
+
+
+tenants = TenantRegistry(
+    TENANTS_DIR,
+    default_paths={
+        "raw_dir": RAW_DATA_DIR,
+        "index_root": CHROMA_DB_DIR,
+        "catalog_path": CATALOG_PATH,
+        "lock_path": WRITE_LOCK,
+        "tables_dir": TABLES_DIR,
+        "entities_dir": ENTITIES_DIR,
+        "parents_dir": PARENTS_DIR,
+    },
+    defaults=TENANT_LIMITS,
+    max_loaded=MAX_LOADED_TENANTS,
+    unload=lambda tenant: unload_tenant(tenant),
+)
+
+
+def forget_chroma_client(path: Path):
+    """Drop chromadb's cached client for `path` so the next open re-reads it from disk.
+
+    The old client is not stopped: requests still holding it finish normally.
+    """
+    if VECTOR_BACKEND != "chroma":
+        return
+    try:
+        from chromadb.api.shared_system_client import SharedSystemClient
+    except ImportError:
+        from chromadb.api.client import SharedSystemClient
+    SharedSystemClient._identifier_to_system.pop(str(path), None)
+
+
+def local_index():
+    """(store class, options) for the in-process VECTOR_BACKENDs."""
+    if VECTOR_BACKEND == "flat":
+        from .flat_index import FlatVectorStore
+        return FlatVectorStore, {"dtype": FLAT_DTYPE}
+    if VECTOR_BACKEND == "hnsw":
+        from .ann_index import HnswVectorStore
+        return HnswVectorStore, {
+            "m": HNSW_M, "ef_construction": HNSW_EF_CONSTRUCTION, "ef_search": HNSW_EF_SEARCH,
+        }
+    raise ValueError(f"Unknown VECTOR_BACKEND {VECTOR_BACKEND!r}")
+
+
+def open_vectorstore(path: Path, fresh: bool = False):
+    if VECTOR_BACKEND != "chroma":
+        store_cls, options = local_index()
+        if not store_cls.exists(path):
+            print(f"Warning: {path.name} holds no {VECTOR_BACKEND} index; rebuild to build one")
+            return None
+        return store_cls(path, get_embeddings(), **options)
+
+    from langchain_community.vectorstores import Chroma
+    if fresh:
+        forget_chroma_client(path)
+    return Chroma(
+        collection_name=COLLECTION,
+        embedding_function=get_embeddings(),
+        persist_directory=str(path)
+    )
+
+
+def build_vectorstore(chunks, ids, path: Path):
+    if VECTOR_BACKEND != "chroma":
+        store_cls, options = local_index()
+        return store_cls.from_documents(chunks, get_embeddings(), ids=ids, path=path, **options)
+
+    from langchain_community.vectorstores import Chroma
+    return Chroma.from_documents(
+        documents=chunks,
+        embedding=get_embeddings(),
+        ids=ids,
+        collection_name=COLLECTION,
+        persist_directory=str(path)
+    )
+
+
+def count_vectors(vs) -> int:
+    return vs._collection.count() if VECTOR_BACKEND == "chroma" else len(vs)
+
+
+def documents_by_ids(vs, ids: List[str]):
+    """The indexed chunks with these IDs, in the order given."""
+    if VECTOR_BACKEND != "chroma":
+        return vs.get_documents(ids)
+    from langchain_core.documents import Document
+    got = vs._collection.get(ids=ids, include=["documents", "metadatas"])
+    found = {cid: Document(page_content=text, metadata=meta or {})
+             for cid, text, meta in zip(got["ids"], got["documents"], got["metadatas"])}
+    return [found[cid] for cid in ids if cid in found]
+
+
+def delete_where_source(vs, source: str):
+    if VECTOR_BACKEND == "chroma":
+        vs._collection.delete(where={"source": source})
+    else:
+        vs.delete_where({"source": source})
+
+
+def dir_size(path: Path) -> int:
+    if not path.exists():
+        return 0
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def refresh_stats(tenant: Tenant, **changes):
+    """Recompute the tenant's cached stats after a write. Only write paths call this."""
+    size = dir_size(tenant.loaded_dir) if tenant.loaded_dir else 0
+    tenant.stats = replace(tenant.stats, index_size_bytes=size, **changes)
+
+
+def load_initial_stats(tenant: Tenant, vector_count: int):
+    refresh_stats(
+        tenant,
+        vector_count=vector_count,
+        document_count=tenant.catalog.count(),
+        last_ingest_at=tenant.catalog.last_ingest_at(),
+    )
+
+
+def current_vectorstore(tenant: Tenant):
+    """
+    The tenant's store for its latest index generation (None if nothing is
+    indexed). Opens it on first use or after an unload, and reopens it when
+    another worker has written since this one last loaded it.
+    """
+    generation = tenant.catalog.generation()
+    if generation != tenant.loaded_generation:
+        with tenant.lock:
+            if generation != tenant.loaded_generation:
+                stale  = tenant.loaded_generation is not None
+                active = tenant.versions.active_dir()
+                if tenant.loaded_dir is not None and active != tenant.loaded_dir:
+                    forget_chroma_client(tenant.loaded_dir)   # superseded by a rebuild
+                tenant.vectorstore = (
+                    open_vectorstore(active, fresh=stale and active == tenant.loaded_dir)
+                    if active else None
+                )
+                tenant.loaded_generation, tenant.loaded_dir = generation, active
+                if stale:
+                    print(f"Index generation {generation} of tenant {tenant.id} published by another worker, reloaded")
+                load_initial_stats(tenant, count_vectors(tenant.vectorstore) if tenant.vectorstore else 0)
+    tenants.touch(tenant)
+    return tenant.vectorstore
+
+
+def unload_tenant(tenant: Tenant):
+    """Close a cold tenant's index; requests still holding it finish normally."""
+    with tenant.lock:
+        if tenant.loaded_dir is not None:
+            forget_chroma_client(tenant.loaded_dir)
+        tenant.vectorstore, tenant.loaded_generation = None, None
+
+
+@contextmanager
+def index_writer(tenant: Tenant):
+    """
+    Hold the tenant's host-wide write lock for the duration of an index
+    mutation. The writer starts from the latest generation and publishes a
+    new one when done, which every other worker picks up on its next read.
+    """
+    try:
+        tenant.write_lock.acquire(timeout=current().write_timeout)
+    except Timeout:
+        raise IndexBusy("The index is busy with another write. Please retry shortly.")
+    tenants.begin_write(tenant)
+    try:
+        vs = current_vectorstore(tenant)
+        if vs is not None and VECTOR_BACKEND != "chroma":
+            vs.recover()   # readers never touch the files; only the lock holder cuts off a dead write
+        yield
+    finally:
+        generation = tenant.catalog.bump_generation()
+        with tenant.lock:
+            # Without a loaded store the next read has to open the new generation itself.
+            tenant.loaded_generation = generation if tenant.vectorstore is not None else None
+        tenants.end_write(tenant)
+        tenant.write_lock.release()
@@ -0,0 +1,188 @@
+"""
+tenants.py - Per-tenant storage, index residency and rate limits
+
+Each tenant (selected by the X-Tenant-ID header) has its own raw PDF
+directory, document catalog, versioned index root and write lock, so a
+query only ever searches that tenant's documents:
+
+    data/tenants/<id>/raw/          uploaded PDFs
+    data/tenants/<id>/catalog.db    document catalog
+    data/tenants/<id>/index/        versioned vector index (CURRENT + gen-NNNNNN)
+    data/tenants/<id>/index.lock
+    data/tenants/<id>/tables/       rate table rows extracted at ingest
+    data/tenants/<id>/entities/     identifier -> chunk ID postings
+    data/tenants/<id>/parents/      parent sections (CHUNKING=parent)
+
+The "default" tenant (no header) keeps the single-tenant paths, so existing
+deployments carry on unchanged.
+
+Opening a tenant is cheap; only its vector index is heavy. TenantRegistry
+keeps the most recently used `max_loaded` indexes open and unloads the rest,
+which reopen from disk on their next request. Quotas and request rates come
+from env defaults, overridable per tenant in data/tenants.json:
+
+    {"acme": {"max_chunks": 500000, "requests_per_minute": 600}}
+"""
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from filelock import FileLock
+
+from .catalog import DocumentCatalog
+from .chunking import ParentStore
+from .entity_index import EntityIndex
+from .index_versions import IndexVersions
+from .rate_tables import RateTableStore
+
+TENANT_HEADER  = "X-Tenant-ID"
+DEFAULT_TENANT = "default"
+TENANT_ID_RE   = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+@dataclass(frozen=True)
+class IndexStats:
+    vector_count: int = 0
+    document_count: int = 0
+    index_size_bytes: int = 0
+    last_ingest_at: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class TenantLimits:
+    max_documents: Optional[int] = None     # None = unlimited
+    max_chunks: Optional[int] = None
+    requests_per_minute: float = 120
+    burst: int = 20
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `capacity`; each request takes one."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate     = rate
+        self.capacity = capacity
+        self._tokens  = float(capacity)
+        self._stamp   = time.monotonic()
+        self._lock    = threading.Lock()
+
+    def take(self) -> float:
+        """0 if the request may proceed, otherwise seconds until a token is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class Tenant:
+    def __init__(self, tenant_id: str, raw_dir: Path, index_root: Path, catalog_path: Path,
+                 lock_path: Path, tables_dir: Path, entities_dir: Path, parents_dir: Path, limits: TenantLimits):
+        self.id         = tenant_id
+        self.raw_dir    = raw_dir
+        self.raw_dir.mkdir(parents=True, exist_ok=True)
+        self.catalog    = DocumentCatalog(catalog_path)
+        self.versions   = IndexVersions(index_root)
+        self.write_lock = FileLock(str(lock_path))   # shared by every worker on the host
+        self.tables     = RateTableStore(tables_dir)
+        self.entities   = EntityIndex(entities_dir)
+        self.parents    = ParentStore(parents_dir)
+        self.limits     = limits
+        self.bucket     = TokenBucket(limits.requests_per_minute / 60, limits.burst)
+        self.lock       = threading.RLock()
+
+        # Index state, owned by app.current_vectorstore / index_writer.
+        self.vectorstore       = None
+        self.loaded_generation = None   # index generation `vectorstore` reflects
+        self.loaded_dir        = None   # version directory `vectorstore` reads
+        self.writers           = 0      # index_writer blocks in this process, counted under the registry lock
+        self.stats             = IndexStats()   # replaced wholesale, read without locking
+
+
+class TenantRegistry:
+    def __init__(self, root: Path, default_paths: Dict[str, Path], defaults: TenantLimits,
+                 max_loaded: int, unload: Callable[[Tenant], None]):
+        self.root          = root
+        self.default_paths = default_paths
+        self.defaults      = defaults
+        self.max_loaded    = max(1, max_loaded)
+        self._unload       = unload
+        self._tenants: Dict[str, Tenant] = {}
+        self._loaded: "OrderedDict[str, Tenant]" = OrderedDict()   # open indexes, least recent first
+        self._lock = threading.Lock()
+        self._overrides = self._read_overrides(root.parent / "tenants.json")
+
+    @staticmethod
+    def _read_overrides(path: Path) -> Dict[str, Dict[str, Any]]:
+        if not path.exists():
+            return {}
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read {path}: {e}")
+            return {}
+
+    def limits_for(self, tenant_id: str) -> TenantLimits:
+        known = {f.name for f in fields(TenantLimits)}
+        override = {k: v for k, v in self._overrides.get(tenant_id, {}).items() if k in known}
+        return TenantLimits(**{**self.defaults.__dict__, **override})
+
+    def get(self, tenant_id: str) -> Tenant:
+        tenant = self._tenants.get(tenant_id)
+        if tenant is not None:
+            return tenant
+        with self._lock:
+            if tenant_id not in self._tenants:
+                if tenant_id == DEFAULT_TENANT:
+                    paths = self.default_paths
+                else:
+                    base = self.root / tenant_id
+                    paths = {
+                        "raw_dir": base / "raw",
+                        "index_root": base / "index",
+                        "catalog_path": base / "catalog.db",
+                        "lock_path": base / "index.lock",
+                        "tables_dir": base / "tables",
+                        "entities_dir": base / "entities",
+                        "parents_dir": base / "parents",
+                    }
+                self._tenants[tenant_id] = Tenant(tenant_id, limits=self.limits_for(tenant_id), **paths)
+            return self._tenants[tenant_id]
+
+    def touch(self, tenant: Tenant):
+        """Mark `tenant`'s index as just used and unload the coldest ones over the limit."""
+        with self._lock:
+            self._loaded[tenant.id] = tenant
+            self._loaded.move_to_end(tenant.id)
+            cold = []
+            for tenant_id, candidate in list(self._loaded.items()):
+                if len(self._loaded) - len(cold) <= self.max_loaded:
+                    break
+                # Never unload the caller's tenant or one this process is writing to.
+                if candidate is not tenant and not candidate.writers:
+                    cold.append(candidate)
+            for candidate in cold:
+                del self._loaded[candidate.id]
+        for candidate in cold:
+            self._unload(candidate)
+            print(f"Unloaded index of idle tenant {candidate.id}")
+
+    def begin_write(self, tenant: Tenant):
+        """Keep `tenant` loaded until the matching end_write."""
+        with self._lock:
+            tenant.writers += 1
+
+    def end_write(self, tenant: Tenant):
+        with self._lock:
+            tenant.writers -= 1
+
+    def loaded(self):
+        return list(self._loaded.values())
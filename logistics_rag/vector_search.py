@@ -0,0 +1,70 @@
+"""
+vector_search.py - Batched multi-query retrieval primitives
+
+top_k scores a whole matrix of query vectors against a matrix of stored
+vectors with one BLAS matrix product per block of queries, instead of one
+similarity_search per question. search_by_vectors is the same operation
+against the Chroma collection, which accepts many query embeddings per call.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+QUERY_BLOCK = 256   # queries scored per matmul; bounds the (block x n) score matrix
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def select_top_k(sims: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best-first (indices, scores) of the k largest entries in each row of `sims`."""
+    n = sims.shape[1]
+    k = min(k, n)
+    if k < n:
+        idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.broadcast_to(np.arange(n), sims.shape).copy()
+    part  = np.take_along_axis(sims, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def top_k(queries, matrix: np.ndarray, k: int, block: int = QUERY_BLOCK) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k rows of `matrix` by dot product for every row of `queries`.
+    Returns (indices, scores), both shaped (len(queries), k), best first.
+    Normalize both sides first for cosine similarity.
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    k = min(k, matrix.shape[0])
+    indices = np.empty((len(queries), k), dtype=np.int64)
+    scores  = np.empty((len(queries), k), dtype=np.float32)
+    if k == 0:
+        return indices, scores
+
+    for start in range(0, len(queries), block):
+        sims = queries[start:start + block] @ matrix.T
+        indices[start:start + block], scores[start:start + block] = select_top_k(sims, k)
+    return indices, scores
+
+
+def search_by_vectors(vectorstore, vectors: List[List[float]], k: int):
+    """Top-k (chunk_id, Document) pairs for every query vector, in one store query."""
+    from langchain_core.documents import Document
+
+    if hasattr(vectorstore, "search_by_vectors"):   # in-process indexes batch natively
+        return vectorstore.search_by_vectors(vectors, k)
+
+    result = vectorstore._collection.query(
+        query_embeddings=[list(map(float, v)) for v in vectors],
+        n_results=k,
+        include=["documents", "metadatas"],
+    )
+    return [
+        [(cid, Document(page_content=text, metadata=meta or {})) for cid, text, meta in zip(ids, texts, metas)]
+        for ids, texts, metas in zip(result["ids"], result["documents"], result["metadatas"])
+    ]
@@ -1,11 +1,25 @@
 """
-main.py - Gemini-powered RAG system (FIXED)
-Run from project root: python src/main.py
+main.py - Command-line frontend for the Logistics RAG system
+Run from project root:
+
+    python src/main.py                            interactive chat
+    python src/main.py ingest a.pdf docs/ -w 4    index PDFs (files or folders of PDFs)
+    python src/main.py query questions.txt --out answers.jsonl
+    python src/main.py sync | rebuild | stats
+
+Like the FastAPI backend (app.py), this is a thin frontend over the
+logistics_rag package: the same catalog, index versions, write lock, retrieval
+and prompts. The CLI can therefore run next to a live server, and a running
+backend picks up its writes.
+Logs go to stderr, so `query` and `stats` output can be piped.
 """
 import os
 import sys
-import shutil
-import time
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from dataclasses import asdict
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -13,202 +27,151 @@ from dotenv import load_dotenv
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
+from logistics_rag.answering import answer_planned, get_answer
+from logistics_rag.batch_qa import plan_batch, run_batch
+from logistics_rag.clients import get_query_embeddings
+from logistics_rag.config import VECTOR_BACKEND, current
+from logistics_rag.ingest import ingest_upload, prepare_tenant, rebuild_vectorstore, sync_tenant
+from logistics_rag.retrieval import NoDocuments, require_vectorstore, retrieval_params
+from logistics_rag.store import IndexBusy, current_vectorstore, tenants
+from logistics_rag.tenants import DEFAULT_TENANT, TENANT_ID_RE
 
 
-# ─────────────────────────────────────────────
-# CONFIG
-# ─────────────────────────────────────────────
-RAW_DATA_DIR   = PROJECT_ROOT / "data" / "raw"
-CHROMA_DB_DIR  = PROJECT_ROOT / "chroma_db"
-COLLECTION     = "logistics_docs"
-CHUNK_SIZE     = 1000
-CHUNK_OVERLAP  = 200
-TOP_K          = 5
-GEMINI_MODEL   = "gemini-2.5-flash"  # Change to gemini-1.5-pro if needed
+INGEST_WORKERS = 4   # PDFs parsed and classified at once; indexing itself is serialized by the write lock
 
 
-# ─────────────────────────────────────────────
-# HELPER: Safe delete ChromaDB
-# ─────────────────────────────────────────────
-def safe_delete_chromadb(path: Path, max_retries: int = 3):
-    """Delete ChromaDB directory with retry logic for Windows file locks"""
-    if not path.exists():
-        return
-    
-    for attempt in range(max_retries):
-        try:
-            shutil.rmtree(path)
-            print(f"  ✓ Deleted old vector store")
-            return
-        except PermissionError as e:
-            if attempt < max_retries - 1:
-                print(f"  ⚠️  File locked, retrying in 2 seconds... (attempt {attempt + 1}/{max_retries})")
-                time.sleep(2)
-            else:
-                print(f"  ❌ Could not delete {path}")
-                print(f"     Error: {e}")
-                print(f"     Solution: Close any programs using the database, or manually delete:")
-                print(f"     rmdir /s /q {path}")
-                sys.exit(1)
+def open_tenant(tenant_id: str):
+    if not TENANT_ID_RE.match(tenant_id):
+        raise SystemExit(f"❌ Invalid tenant id: {tenant_id}")
+    tenant = tenants.get(tenant_id)
+    prepare_tenant(tenant)
+    return tenant
 
 
-# ─────────────────────────────────────────────
-# 1. LOAD & CHUNK DOCUMENTS
-# ─────────────────────────────────────────────
-def load_documents():
-    pdf_files = list(RAW_DATA_DIR.glob("*.pdf"))
-    if not pdf_files:
-        raise FileNotFoundError(f"No PDFs found in {RAW_DATA_DIR}")
-
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        separators=["\n\n", "\n", ".", " ", ""]
-    )
-
-    all_chunks = []
-    for pdf_path in pdf_files:
-        loader = PyPDFLoader(str(pdf_path))
-        pages  = loader.load()
-        chunks = splitter.split_documents(pages)
-
-        # Stamp metadata on every chunk
-        for chunk in chunks:
-            chunk.metadata["source"] = pdf_path.name
-
-        all_chunks.extend(chunks)
-        print(f"  ✓ {pdf_path.name}: {len(pages)} pages → {len(chunks)} chunks")
-
-    print(f"\n  📚 Total: {len(all_chunks)} chunks from {len(pdf_files)} file(s)")
-    return all_chunks
+def ensure_index(tenant):
+    """Index data/raw on first use, like the old CLI did when no store existed."""
+    if current_vectorstore(tenant) is None:
+        print("📂 No index yet, syncing the raw folder...")
+        report_sync(sync_tenant(tenant))
 
 
 # ─────────────────────────────────────────────
-# 2. GET EMBEDDINGS (with fallback options)
+# 1. INGEST
 # ─────────────────────────────────────────────
-def get_embeddings():
-    """Get Gemini embeddings"""
-    print("  Using embedding model: models/gemini-embedding-001")
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-    return embeddings
+def pdf_paths(paths):
+    found = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            found.extend(sorted(p for p in path.glob("*.pdf") if not p.name.startswith(".")))
+        elif path.suffix.lower() == ".pdf" and path.is_file():
+            found.append(path)
+        else:
+            print(f"  ⚠️  Skipping {raw}: not a PDF or folder")
+    return found
+
+
+def upload_file(tenant, path: Path, classify: bool):
+    """Read and ingest one PDF; runs on a worker so only `workers` files are in memory at once."""
+    return ingest_upload(tenant, path.name, path.read_bytes(), classify)
+
+
+def ingest(tenant, paths, workers: int, classify: bool) -> int:
+    """Upload each PDF through the backend's ingest path; returns the number rejected."""
+    files = pdf_paths(paths)
+    if not files:
+        print("❌ No PDFs to ingest")
+        return 1
+
+    # Uploads are stored under their base name: two files sharing one would overwrite each other.
+    by_name, indexed, rejected = {}, 0, 0
+    for path in files:
+        first = by_name.setdefault(path.name, path)
+        if first is not path and first.resolve() != path.resolve():
+            rejected += 1
+            print(f"  ✗ {path}: same file name as {first}")
+    files = list(by_name.values())
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(upload_file, tenant, path, classify): path for path in files}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                ok, failed = future.result()
+            except (IndexBusy, OSError) as e:
+                ok, failed = None, {"reason": str(e)}
+            if ok:
+                indexed += 1
+                print(f"[{done}/{len(files)}] ✓ {path.name}: {ok['chunks']} chunks")
+            else:
+                rejected += 1
+                print(f"[{done}/{len(files)}] ✗ {path.name}: {failed['reason']}")
+    print(f"\n  📚 {indexed} indexed, {rejected} rejected")
+    return rejected
 
 
 # ─────────────────────────────────────────────
-# 3. BUILD OR LOAD VECTOR STORE
+# 2. QUERY (BATCH)
 # ─────────────────────────────────────────────
-def get_vectorstore(force_rebuild: bool = False):
-    embeddings = get_embeddings()
-    
-    db_exists = CHROMA_DB_DIR.exists() and any(CHROMA_DB_DIR.iterdir())
+def query(tenant, questions_path: str, out_path: str, workers: int, include_sources: bool, params, stdout=None):
+    """Answer one question per line of `questions_path` ('-' = stdin), writing JSONL to `out_path` ('-' = stdout)."""
+    source = sys.stdin if questions_path == "-" else open(questions_path, encoding="utf-8")
+    with source:
+        questions = [line.strip() for line in source if line.strip()]
+    if not questions:
+        print("❌ No questions given")
+        return
 
-    if db_exists and not force_rebuild:
-        print("📂 Loading existing vector store...")
-        try:
-            vs = Chroma(
-                collection_name=COLLECTION,
-                embedding_function=embeddings,
-                persist_directory=str(CHROMA_DB_DIR)
-            )
-            count = vs._collection.count()
-            print(f"  ✓ Loaded {count} vectors")
-
-            # If the store is empty, rebuild automatically
-            if count == 0:
-                print("  ⚠️  Store is empty – rebuilding...")
-                return get_vectorstore(force_rebuild=True)
-
-            return vs
-        except Exception as e:
-            print(f"  ⚠️  Error loading vector store: {e}")
-            print("  ⚠️  Will rebuild from scratch...")
-            return get_vectorstore(force_rebuild=True)
-
-    # Rebuild
-    print("🔨 Building vector store from scratch...")
-    safe_delete_chromadb(CHROMA_DB_DIR)
-    
-    chunks = load_documents()
-
-    print(f"  🔄 Creating embeddings (this may take 1-2 minutes)...")
-    vs = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        collection_name=COLLECTION,
-        persist_directory=str(CHROMA_DB_DIR)
-    )
-    print(f"  ✓ Saved {len(chunks)} vectors to {CHROMA_DB_DIR}")
-    return vs
+    ensure_index(tenant)
+    print(f"📋 {len(questions)} questions, embedding and searching in batches...")
+    plan = plan_batch(questions, require_vectorstore(tenant), get_query_embeddings(), params.candidates)
+    print(f"   {len(plan.groups)} unique, answering with {workers} workers")
+
+    def answer(question, docs):
+        return answer_planned(tenant, question, docs, include_sources, params)
+
+    out = (stdout or sys.stdout) if out_path == "-" else open(out_path, "w", encoding="utf-8")
+    try:
+        for done, result in enumerate(run_batch(plan, answer, workers), 1):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"\r   {done}/{len(questions)} answered", end="")
+        print()
+    finally:
+        if out_path != "-":
+            out.close()
 
 
 # ─────────────────────────────────────────────
-# 4. RAG CHAIN
+# 3. SYNC / REBUILD / STATS
 # ─────────────────────────────────────────────
-SYSTEM_PROMPT = """\
-You are a helpful logistics assistant. Use the document excerpts below to answer the question.
-
-Rules:
-- Answer using ONLY the information in the excerpts.
-- Quote exact numbers, names, and codes where possible.
-- If the excerpts do not contain the answer, say exactly:
-  "I could not find that information in the provided documents."
-- Always end your answer with a "Sources:" line listing the filenames and pages used.
-
-Document excerpts:
-----------------
-{context}
-----------------
-"""
-
-def build_answer(vectorstore, question: str, verbose: bool = False) -> str:
-    # Retrieve top-k relevant chunks
-    docs = vectorstore.similarity_search(question, k=TOP_K)
-
-    if not docs:
-        return "⚠️  No relevant documents found. Is your vector store populated?"
-
-    # Build context string
-    context_parts = []
-    for i, doc in enumerate(docs, 1):
-        src  = doc.metadata.get("source", "unknown")
-        page = doc.metadata.get("page", "?")
-        context_parts.append(f"[Excerpt {i} | {src} | page {page}]\n{doc.page_content}")
-    context = "\n\n".join(context_parts)
-
-    if verbose:
-        print("\n" + "="*60)
-        print("📄 RETRIEVED CHUNKS:")
-        print("="*60)
-        for i, doc in enumerate(docs, 1):
-            print(f"\n[Chunk {i}] {doc.metadata.get('source')} | Page {doc.metadata.get('page')}")
-            print("-" * 60)
-            print(doc.page_content[:300] + "...")
-        print("="*60 + "\n")
-
-    # Call Gemini LLM
-    llm = ChatGoogleGenerativeAI(
-        model=GEMINI_MODEL,
-        temperature=0,
-        convert_system_message_to_human=True
-    )
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("human", SYSTEM_PROMPT + "\n\nQuestion: {question}")
-    ])
-    
-    messages = prompt.format_messages(context=context, question=question)
-    response = llm.invoke(messages)
-    return response.content
+def report_sync(result: dict):
+    for key in ("added", "updated", "removed"):
+        for entry in result[key]:
+            print(f"  {key:<8} {entry['filename']} ({entry['chunks']} chunks)")
+    for entry in result["failed"]:
+        print(f"  failed   {entry['filename']}: {entry['reason']}")
+    print(f"  {result['unchanged']} unchanged")
+
+
+def stats(tenant) -> dict:
+    current_vectorstore(tenant)   # loads the cached stats
+    return {
+        "tenant": tenant.id,
+        "vector_backend": VECTOR_BACKEND,
+        "index_dir": str(tenant.loaded_dir) if tenant.loaded_dir else None,
+        "index_generation": tenant.catalog.generation(),
+        "rate_table_rows": len(tenant.tables),
+        "identifiers": len(tenant.entities),
+        **asdict(tenant.stats),
+    }
 
 
 # ─────────────────────────────────────────────
-# 5. INTERACTIVE CHAT LOOP
+# 4. INTERACTIVE CHAT LOOP
 # ─────────────────────────────────────────────
-def chat(vectorstore):
+def chat(tenant):
+    ensure_index(tenant)
     print("\n" + "="*60)
     print("🤖  Logistics RAG Assistant (Powered by Gemini)")
     print("="*60)
@@ -236,18 +199,57 @@ def chat(vectorstore):
 
         print("\n🤖 Thinking...\n")
         try:
-            answer = build_answer(vectorstore, question, verbose=verbose)
-            print(f"Assistant:\n{answer}\n")
+            result = get_answer(tenant, question)
+            if verbose:
+                print("="*60)
+                print("📄 RETRIEVED CHUNKS:")
+                print("="*60)
+                for i, source in enumerate(result["sources"], 1):
+                    print(f"\n[Chunk {i}] {source['filename']} | Page {source['page']}")
+                    print("-" * 60)
+                    print(source["content"])
+                print("="*60 + "\n")
+            print(f"Assistant:\n{result['answer']}\n")
         except Exception as e:
             print(f"❌ Error: {e}\n")
-        
+
         print("-" * 60 + "\n")
 
 
 # ─────────────────────────────────────────────
 # MAIN
 # ─────────────────────────────────────────────
+def build_parser():
+    parser = argparse.ArgumentParser(description="Logistics RAG assistant")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="tenant to work on (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    commands.add_parser("chat", help="interactive chat (the default)")
+
+    p = commands.add_parser("ingest", help="classify and index PDFs, in parallel")
+    p.add_argument("paths", nargs="+", help="PDF files or folders of PDFs")
+    p.add_argument("-w", "--workers", type=int, default=INGEST_WORKERS, help="PDFs processed at once")
+    p.add_argument("--no-classify", action="store_true", help="skip the logistics classifier")
+
+    p = commands.add_parser("query", help="answer questions (one per line) as JSONL")
+    p.add_argument("questions", nargs="?", default="-", help="question file, '-' for stdin (default)")
+    p.add_argument("--out", default="-", help="JSONL output file (default: stdout)")
+    p.add_argument("-w", "--workers", type=int, default=current().batch_workers, help="concurrent LLM calls")
+    p.add_argument("--no-sources", action="store_true", help="leave source excerpts out of the output")
+    p.add_argument("-k", type=int, help="excerpts per prompt (default: the top_k setting)")
+    p.add_argument("--candidates", type=int, help="chunks fetched per question (default: the candidates setting)")
+    p.add_argument("--context-tokens", type=int, help="prompt context budget, 0 = none (default: the setting)")
+    p.add_argument("--compression", type=float, help="share of the excerpts kept, 1 = whole (default: the setting)")
+
+    commands.add_parser("sync", help="index new/changed PDFs in the raw folder, drop deleted ones")
+    commands.add_parser("rebuild", help="re-embed every catalogued PDF into a fresh index")
+    commands.add_parser("stats", help="print index statistics as JSON")
+    return parser
+
+
 def main():
+    args = build_parser().parse_args()
+
     load_dotenv()
 
     if not os.getenv("GOOGLE_API_KEY"):
@@ -256,16 +258,35 @@ def main():
         print("   GOOGLE_API_KEY=your_gemini_api_key_here")
         sys.exit(1)
 
+    stdout = sys.stdout
+    try:
+        # The backend logs with print(); keep stdout for the command's own output.
+        with redirect_stdout(sys.stderr):
+            tenant = open_tenant(args.tenant)
+            if args.command == "ingest":
+                sys.exit(1 if ingest(tenant, args.paths, args.workers, not args.no_classify) else 0)
+            if args.command == "query":
+                params = retrieval_params(args.k, args.candidates, args.context_tokens, args.compression)
+                query(tenant, args.questions, args.out, args.workers, not args.no_sources, params, stdout)
+                return
+            if args.command == "sync":
+                report_sync(sync_tenant(tenant))
+                return
+            if args.command == "rebuild":
+                print(f"  ✓ Rebuilt with {rebuild_vectorstore(tenant)} chunks")
+                return
+            if args.command == "stats":
+                print(json.dumps(stats(tenant), indent=2), file=stdout)
+                return
+    except (IndexBusy, NoDocuments, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
     print("\n" + "="*60)
     print("🚀  LOGISTICS RAG SYSTEM (Gemini Edition)")
     print("="*60 + "\n")
-
-    # Get vector store (will rebuild if needed)
-    vectorstore = get_vectorstore(force_rebuild=False)
-    
-    # Start chat
-    chat(vectorstore)
+    chat(tenant)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
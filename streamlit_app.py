@@ -3,11 +3,25 @@ streamlit_app.py — Logistics RAG Assistant
 Run: streamlit run streamlit_app.py
 Requires FastAPI backend at http://localhost:8000
 """
+import os
+import uuid
 import streamlit as st
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 
 API_BASE = "http://localhost:8000"
+TENANT_ID = os.getenv("TENANT_ID")   # sent as X-Tenant-ID; unset = the default tenant
+HEADERS   = {"X-Tenant-ID": TENANT_ID} if TENANT_ID else {}
+
+HEALTH_TTL = 5     # seconds the status pill may lag the backend
+DOCS_TTL   = 15    # uploads and deletes made here refresh the list at once; others show within this
+POOL_SIZE  = 16    # keep-alive connections to the backend, shared by all browser sessions
+CHAT_POLL  = 0.5   # seconds between checks for a pending answer
+
+# st.fragment is stable from Streamlit 1.37; older releases only have the experimental name.
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
 
 st.set_page_config(
     page_title="LogiRAG — Logistics Intelligence",
@@ -20,8 +34,10 @@ st.set_page_config(
 for k, v in {
     "dark_mode": True,
     "chat_history": [],
+    "chat_session": uuid.uuid4().hex,   # backend keeps this conversation's history for follow-ups
     "docs_ready": False,
     "ingest_log": [],
+    "pending_chat": None,               # {"future", "session"} of the question being answered
 }.items():
     if k not in st.session_state:
         st.session_state[k] = v
@@ -959,35 +975,70 @@ MSG_ICON   = """<svg viewBox="0 0 24 24"><path d="M21 15a2 2 0 0 1-2 2H7l-4 4V5a
 
 
 # ── API helpers ────────────────────────────────────────────────────────────────
+@st.cache_resource
+def http() -> requests.Session:
+    """One keep-alive connection pool per Streamlit server instead of a new connection per call."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(HEADERS)
+    return session
+
+@st.cache_resource
+def chat_pool() -> ThreadPoolExecutor:
+    """Chat calls run here, so a slow answer never holds up the rest of the page."""
+    return ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="chat")
+
+# Every rerun (each click) reads health and documents; the cached reads below
+# only reach the backend once per TTL. Failures raise, and Streamlit does not
+# cache exceptions, so a backend coming back online shows up on the next rerun.
+@st.cache_data(ttl=HEALTH_TTL, show_spinner=False)
+def fetch_health():
+    r = http().get(f"{API_BASE}/health", timeout=3)
+    r.raise_for_status()
+    return r.json()
+
+@st.cache_data(ttl=DOCS_TTL, show_spinner=False)
+def fetch_documents():
+    r = http().get(f"{API_BASE}/documents", timeout=5)
+    r.raise_for_status()
+    return r.json().get("documents", [])
+
+def backend_changed():
+    """Drop the cached reads after an upload or delete, so the next render shows the change."""
+    fetch_health.clear()
+    fetch_documents.clear()
+
 def api_health():
     try:
-        r = requests.get(f"{API_BASE}/health", timeout=3)
-        return r.json() if r.status_code == 200 else None
+        return fetch_health()
     except Exception:
         return None
 
 def api_documents():
     try:
-        r = requests.get(f"{API_BASE}/documents", timeout=5)
-        return r.json().get("documents", []) if r.status_code == 200 else []
+        return fetch_documents()
     except Exception:
         return []
 
 def api_upload(files):
     try:
         file_tuples = [("files", (f.name, f.getvalue(), "application/pdf")) for f in files]
-        r = requests.post(f"{API_BASE}/upload", files=file_tuples, timeout=180)
+        r = http().post(f"{API_BASE}/upload", files=file_tuples, timeout=180)
+        backend_changed()
         return r.status_code, r.json()
     except requests.exceptions.ConnectionError:
         return 503, {"detail": "Cannot connect to backend."}
     except Exception as e:
         return 500, {"detail": str(e)}
 
-def api_chat(question: str):
+def api_chat(question: str, session_id: str):
+    # Runs on chat_pool: no st.* calls in here.
     try:
-        r = requests.post(
+        r = http().post(
             f"{API_BASE}/chat",
-            json={"question": question, "include_sources": True},
+            json={"question": question, "include_sources": True, "session_id": session_id},
             timeout=60,
         )
         return r.json() if r.status_code == 200 else {"answer": r.json().get("detail", "Error"), "sources": []}
@@ -996,9 +1047,18 @@ def api_chat(question: str):
     except Exception as e:
         return {"answer": f"Request failed: {e}", "sources": []}
 
+def api_clear_session():
+    try:
+        http().delete(f"{API_BASE}/sessions/{st.session_state.chat_session}", timeout=5)
+    except Exception:
+        pass   # the backend drops idle sessions on its own
+    st.session_state.chat_session = uuid.uuid4().hex
+    st.session_state.pending_chat = None   # an answer still on its way belongs to the old conversation
+
 def api_delete(filename: str):
     try:
-        r = requests.delete(f"{API_BASE}/documents/{filename}", timeout=60)
+        r = http().delete(f"{API_BASE}/documents/{filename}", timeout=60)
+        backend_changed()
         return r.status_code, r.json()
     except Exception as e:
         return 500, {"detail": str(e)}
@@ -1077,6 +1137,7 @@ with st.sidebar:
                         if not remaining:
                             st.session_state.docs_ready = False
                             st.session_state.chat_history = []
+                            api_clear_session()
                             st.session_state.ingest_log = []
                         st.rerun()
                 st.markdown('</div>', unsafe_allow_html=True)
@@ -1092,6 +1153,7 @@ with st.sidebar:
         st.markdown('<div class="btn-ghost">', unsafe_allow_html=True)
         if st.button("Clear conversation", key="clear_chat"):
             st.session_state.chat_history = []
+            api_clear_session()
             st.rerun()
         st.markdown('</div>', unsafe_allow_html=True)
 
@@ -1240,6 +1302,7 @@ with tab_chat:
         # ── Build messages HTML ──────────────────────────────────────────────
         msgs_html = '<div class="chat-messages" id="chat-scroll">'
 
+        pending = st.session_state.pending_chat
         if not st.session_state.chat_history:
             msgs_html += f"""
             <div class="empty-state">
@@ -1289,6 +1352,14 @@ with tab_chat:
                 if i < len(st.session_state.chat_history) - 1:
                     msgs_html += '<div class="msg-divider"></div>'
 
+            if pending:
+                msgs_html += f"""
+                <div class="msg-divider"></div>
+                <div class="msg-row">
+                    <div class="msg-sender">LogiRAG</div>
+                    <div class="msg-body" style="color:{t['muted']};">Searching documents…</div>
+                </div>"""
+
         msgs_html += "</div>"
         msgs_html += """<script>
             (function(){
@@ -1312,11 +1383,34 @@ with tab_chat:
             )
         with col_btn:
             st.markdown('<div class="btn-send">', unsafe_allow_html=True)
-            send = st.button("Send", key="send_btn")
+            send = st.button("Send", key="send_btn", disabled=pending is not None)
             st.markdown('</div>', unsafe_allow_html=True)
 
         st.markdown('</div>', unsafe_allow_html=True)
 
+        # ── Pending answer ─────────────────────────────────────────────────
+        # Only this fragment reruns while the backend works, so the sidebar,
+        # tabs and buttons keep responding; a click just reruns the page and
+        # the call carries on in chat_pool.
+        @fragment(run_every=CHAT_POLL)
+        def await_answer():
+            pending = st.session_state.pending_chat
+            if pending is None or not pending["future"].done():
+                return
+            st.session_state.pending_chat = None
+            if pending["session"] == st.session_state.chat_session:
+                result = pending["future"].result()
+                st.session_state.chat_history.append({
+                    "role": "assistant",
+                    "content": result.get("answer", "No answer returned."),
+                    "sources": result.get("sources", []),
+                    "time": datetime.now().strftime("%H:%M"),
+                })
+            st.rerun()
+
+        if pending:
+            await_answer()
+
         # ── Handle submission ──────────────────────────────────────────────
         if send and question.strip():
             st.session_state.chat_history.append({
@@ -1324,14 +1418,11 @@ with tab_chat:
                 "content": question.strip(),
                 "time": datetime.now().strftime("%H:%M"),
             })
-            with st.spinner("Searching documents…"):
-                result = api_chat(question.strip())
-            st.session_state.chat_history.append({
-                "role": "assistant",
-                "content": result.get("answer", "No answer returned."),
-                "sources": result.get("sources", []),
-                "time": datetime.now().strftime("%H:%M"),
-            })
+            session_id = st.session_state.chat_session
+            st.session_state.pending_chat = {
+                "future": chat_pool().submit(api_chat, question.strip(), session_id),
+                "session": session_id,
+            }
             st.rerun()
         elif send and not question.strip():
             st.markdown(
@@ -1468,6 +1559,7 @@ with tab_docs:
                             if not remaining:
                                 st.session_state.docs_ready = False
                                 st.session_state.chat_history = []
+                                api_clear_session()
                                 st.session_state.ingest_log = []
                             st.rerun()
                     st.markdown('</div>', unsafe_allow_html=True)
@@ -1503,7 +1595,7 @@ with tab_docs:
                 <div class="upload-instr-title">About the Index</div>
                 <div class="upload-instr-item"><div class="upload-instr-dot"></div>Documents are split into 1,000-token chunks with 200-token overlap.</div>
                 <div class="upload-instr-item"><div class="upload-instr-dot"></div>Embeddings are stored in ChromaDB for fast semantic retrieval.</div>
-                <div class="upload-instr-item"><div class="upload-instr-dot"></div>Removing a document rebuilds the entire index automatically.</div>
+                <div class="upload-instr-item"><div class="upload-instr-dot"></div>Removing a document deletes only its vectors from the index.</div>
                 <div class="upload-instr-item"><div class="upload-instr-dot"></div>Top-5 most relevant chunks are sent to the AI for every answer.</div>
             </div>
         </div>""", unsafe_allow_html=True)
\ No newline at end of file